@@ -1,270 +1,382 @@
 # requirements
 from __future__ import print_function
-from dash.dependencies import Input, Output
-import plotly.graph_objs as go
+import os
+import uuid
+from collections import OrderedDict, namedtuple
+
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 from dash import html
 from dash import dcc
+from dash import Patch
 import dash
-import pandas as pd
+import numpy as np
+
+from budgets import allocation, api, clientside, engine, figures, httpcache, metrics, nowcast, pathways, uncertainty
+from budgets.cache import FileBackend, LRUCache
+from budgets.coalesce import Coalescer
+from budgets.dataset import dataset_version, load_store
+from budgets.reload import DatasetWatcher
+from budgets.table import BudgetTable
 
 ###############
 # Import data #
 ###############
 
-df_budget = pd.read_csv("data.csv")
+# country index + numpy arrays used by the callbacks, read from data.npz when it is up to date with data.csv
+# (python -m budgets.dataset data.csv data.npz), otherwise parsed from data.csv
+# NOWCAST=linear or NOWCAST=growth : the 2018 and 2019 emissions are estimated from the trend of every country
+#                                    when the dataset is loaded, instead of copied from 2017 (budgets/nowcast.py)
 
-# App interface : https://dash.plot.ly/getting-started
-external_stylesheets = [
-    'https://codepen.io/chriddyp/pen/bWLwgP.css']  # select stylesheet
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
-app.title = 'Carbon Emission Budget Calculator'
-server = app.server
+def load_dataset(csv_path):
+    return nowcast.apply(load_store(csv_path))
 
-# define variables
 
-global_budget_2016 = 580 + 80,
-global_emissions = 40,
-global_per_capita_emissions = 5.4,
+def data_version():
+    # cached outputs depend on the nowcast as well as on data.csv
+    return dataset_version("data.csv") + nowcast.tag()
 
-# create app layout
 
-app.layout = html.Div(children=[
-    dcc.Markdown(
-        dangerously_allow_html=True, children=['''
-        # Carbon Emission Budget Calculator
-        ## How much CO<sub>2</sub> can your country still emit to stay below **1.5** or **2** °C warming ?
-        ''']),
-    html.Div([  # start interactive inputs
-
-        ##################
-        # Select country # id : country-dropdown
-        ##################
-
-        html.P([  # country selection button
-            html.Label('Select your country'),
-            # dcc.Input(id='mother_birth', value=1952, type='number'),
-            dcc.Dropdown(
-                id='country-dropdown',  # name country
-                options=[{'label': i, 'value': i} for i in df_budget.country],
-                value='Belgium',  # initial value
-            )
-        ]),
+store = load_dataset("data.csv")
 
-        ########################
-        # Select Carbon Budget # id : carbon-budget
-        ########################
+# optional precomputed country x budget table (python -m budgets.table data.csv budget_table),
+# memory-mapped so the callbacks look budgets up instead of computing them
 
-        dcc.Markdown(
-            dangerously_allow_html=True, children=['''
-            ### A brief introduction to carbon budgets
-            Global carbon budgets are expressed in *gigatonnes* (Gt, 1.000.000.000 t) CO<sub>2</sub>,
-            and are used to estimate the amount of carbon dioxide we can still emit before reaching
-            a certain level of warming.
-            For example, for a 50 % chance to stay below **1.5** °C we could still emit around **580** Gt CO<sub>2</sub> from \
-            january 2018 onwards. Knowing that we currently emit around  42 ± 3 Gt CO<sub>2</sub> per year,
-            this budget already decreased with amost 80 Gt CO<sub>2</sub>. Greta Thunberg thus rightly made this the central \
-            issue in her [July speech to the French National Assembly](https://www.youtube.com/watch?v=J1yimNdqhqE).
-            However, as with any serious science, some uncertainties remain on this amount. If earth system \
-            feedbacks are taken into account, this budget could further decrease with 100 Gt CO<sub>2</sub>. Other factors not \
-            related to CO<sub>2</sub> emissions, uncertainties about the temperature response to other greenhouse gasses,
-            the distribution of the temperature response to changes in carbon dioxide, \
-            historical emissions uncertainty and recent emissions uncertainty can alter this budget with \
-            respectively ±250, -400 to +200, +100 to +200, ±250 and ±20 Gt. Following a precautionary \
-            principle, a large part of this budget could thus already be depleted. These uncertainties - as [noted by Stefan Rahmstorf](https://hyp.is/ub38EuV2Eem6qrNqE5h7TA/www.realclimate.org/index.php/archives/2019/08/how-much-co2-your-country-can-still-emit-in-three-simple-steps/) \
-            - should therefore not be used to argue against strong measures. Only a better guidance providing less uncertainty can improve \
-            policy guidance.
-            ''']),
-            html.P(['See the ',
-            html.A("IPCC's latest report on 1.5 °C warming (Table 2.2)",
-            href='https://hyp.is/LwH2ROKyEem027sdvofrBw/www.ipcc.ch/sr15/chapter/chapter-2/', target='_blank'),
-            ' for a range of possible values which assume the start of the budget in 2018.'
-            ]),
-        html.P([  # country selection button
-            html.Label(['Enter a ',
-            html.Span('2018 carbon budget', style={'font-weight': 'bold'}),
-            ' in Gt CO2 :']),
-            # dcc.Input(id='mother_birth', value=1952, type='number'),
-            dcc.Input(
-                id='carbon-budget',
-                value=580,
-                type="number",
-                min=50,
-                step=1,
-                max=2500,
-            )
-        ]),
+def load_table(store):
+    return BudgetTable.load(os.environ['BUDGET_TABLE'], store) if os.environ.get('BUDGET_TABLE') else None
 
-        #######################
-        # Explain calculation #
-        #######################
-
-        html.P([
-            html.H3('What is the remaining carbon emission budget for my country?'),
-            html.P(['Below figure displays the ',
-            html.Span('historical', style={'color': '#1f76b4', 'font-weight': 'bold'}),
-            ' and ',
-            html.Span('recent', style={'color': '#ff7f0f', 'font-weight': 'bold'}),
-            ' emissions in your country, and a linear decrease in ',
-            html.Span('future', style={'color': '#2ba02b', 'font-weight': 'bold'}),
-            ' emissions from 2020 onwards compatible with the given global carbon budget. The global budget has been divided between countries, \
-            starting from the premise that the remaining budget was equally shared per capita in 2016 - the year of the Paris agreement. \
-            The emissions in your country in 2018 and 2019 are assumed to have stayed at the same level as in 2017, as this is the latest data available on a global level. \
-            The remaining national shares of the global budget from 2019 have been calculated backwards from the given global 2018-budget, by adding 80 Gt to the global budget \
-            for two years of emissions since 2016 (2017 and 2018), multiplying with the relative share of the population of your country in the world and substracting two years of emissions \
-            in your country since 2016.\
-             \
-              ']),
-        ]),
 
-        ################
-        # Global reach #
-        ################
+table = load_table(store)
 
-        html.P(id='worldwide-reach'),  # create div for variable output with adapted worldwide reach (id: worldwide reach)
+# global variables (global emissions, per capita emissions) are defined in budgets/engine.py
 
-        ###############################
-        # Country budget and timeline #
-        ###############################
+# national budgets of every allocation scheme must add up to the global budget (budgets/allocation.py)
 
-        html.P(id='country-carbon-budget'),  # create div for variable output with adapted country carbon budget
+def check_allocations(store):
+    for scheme in allocation.SCHEMES.values():
+        scheme.check(store)
 
-    ]),
 
+check_allocations(store)
 
-    #####################
-    # Country bar chart #
-    #####################
+# the store, table and version (SHA-1 of data.csv and the nowcast) the callbacks read, replaced as a whole on reload
+Dataset = namedtuple('Dataset', ['store', 'table', 'version'])
+dataset = Dataset(store, table, data_version())
 
-    dcc.Graph(
-        id='emissions-graph',  # Name graph
-        figure={
-            'data': [
+# DATA_RELOAD_INTERVAL=<seconds> : every worker checks data.csv and data.npz for changes that often, loads and
+#                                  validates a changed dataset in the background and swaps it in (budgets/reload.py)
 
-                ###################
-                # Historical data # : from imported EDGAR dataset
-                ###################
-                go.Bar(
-                    name='Historical',
-                    x=list(range(1970, 2018)),  # create list from 1970 to 2017
-                    y=df_budget.loc[df_budget['country'] == 'Belgium',       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
-                                    '1970':'2017'].values.flatten().tolist(),
-                ),
+DATA_RELOAD_INTERVAL = float(os.environ.get('DATA_RELOAD_INTERVAL', 0))
+
+# CALLBACK_MODE=combined (default) : a single callback computes the budget once and returns all outputs,
+#                                    so one country or budget change costs one request instead of four
+# CALLBACK_MODE=separate           : one callback (and one request) per output
+# CALLBACK_MODE=clientside         : the dataset is sent once in a dcc.Store and all outputs are computed
+#                                    in the browser by assets/budgets.js, without requests to the server
+
+CALLBACK_MODE = os.environ.get('CALLBACK_MODE', 'combined')
+
+# BUDGET_DEBOUNCE=submit    : the carbon budget is only sent on Enter (n_submit) or when the input loses focus,
+#                             instead of on every keystroke or step click
+# BUDGET_DEBOUNCE=<seconds> : sent once typing pauses for that many seconds
+# REQUEST_COALESCING=1      : server side, only the newest of a burst of requests from the same page is
+#                             computed; each request waits COALESCE_WINDOW_MS (default 150) for a newer one
+
+BUDGET_DEBOUNCE = os.environ.get('BUDGET_DEBOUNCE', '')
+
+request_coalescer = Coalescer(
+    window=float(os.environ.get('COALESCE_WINDOW_MS', 150)) / 1000,
+) if os.environ.get('REQUEST_COALESCING', '0') == '1' else None
+
+
+def budget_debounce(setting):
+    # value of the dcc.Input debounce property for a BUDGET_DEBOUNCE setting
+    if not setting:
+        return False
+    if setting == 'submit':
+        return True
+    return float(setting)
+
+# App interface : https://dash.plot.ly/getting-started
+external_stylesheets = [
+    'https://codepen.io/chriddyp/pen/bWLwgP.css']  # select stylesheet
+
+# create app layout
 
-                ###############
-                # Recent data # : 2018 and 2019 assumed to have same emissions as 2017 (latest EDGAR data available)
-                ###############
-                go.Bar(
-                    name='Recent',
-                    x=list(range(2018, 2020)),  # create list from 2018 to 2019
-                    y=df_budget.loc[df_budget['country'] == 'Belgium',       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
-                                    ['2018', '2019']].values.flatten().tolist(),
+def build_layout(callback_mode, debounce=BUDGET_DEBOUNCE):
+    # 2018 and 2019 emissions : copied from 2017, or estimated from the trend with NOWCAST
+    recent_text = ('are estimated from the trend of the emissions up to 2017' if store.nowcast
+                   else 'are assumed to have stayed at the same level as in 2017')
+    return html.Div(children=[
+        dcc.Markdown(
+            dangerously_allow_html=True, children=['''
+            # Carbon Emission Budget Calculator
+            ## How much CO<sub>2</sub> can your country still emit to stay below **1.5** or **2** °C warming ?
+            ''']),
+        html.Div([  # start interactive inputs
+
+            ##################
+            # Select country # id : country-dropdown
+            ##################
+
+            html.P([  # country selection button
+                html.Label('Select your country'),
+                # dcc.Input(id='mother_birth', value=1952, type='number'),
+                dcc.Dropdown(
+                    id='country-dropdown',  # name country
+                    options=[{'label': i, 'value': i} for i in store.countries],
+                    value='Belgium',  # initial value
+                )
+            ]),
+
+            #####################
+            # Compare countries # id : compare-countries (server side callbacks only)
+            #####################
+
+            html.P([
+                html.Label('Compare with'),
+                dcc.Dropdown(
+                    id='compare-countries',
+                    options=[{'label': i, 'value': i} for i in store.countries],
+                    value=[],
+                    multi=True,
+                    placeholder='Select countries to overlay on the graphs',
+                )
+            ], style={'display': 'none'} if callback_mode == 'clientside' else {}),
+
+            ########################
+            # Select Carbon Budget # id : carbon-budget
+            ########################
+
+            dcc.Markdown(
+                dangerously_allow_html=True, children=['''
+                ### A brief introduction to carbon budgets
+                Global carbon budgets are expressed in *gigatonnes* (Gt, 1.000.000.000 t) CO<sub>2</sub>,
+                and are used to estimate the amount of carbon dioxide we can still emit before reaching
+                a certain level of warming.
+                For example, for a 50 % chance to stay below **1.5** °C we could still emit around **580** Gt CO<sub>2</sub> from \
+                january 2018 onwards. Knowing that we currently emit around  42 ± 3 Gt CO<sub>2</sub> per year,
+                this budget already decreased with amost 80 Gt CO<sub>2</sub>. Greta Thunberg thus rightly made this the central \
+                issue in her [July speech to the French National Assembly](https://www.youtube.com/watch?v=J1yimNdqhqE).
+                However, as with any serious science, some uncertainties remain on this amount. If earth system \
+                feedbacks are taken into account, this budget could further decrease with 100 Gt CO<sub>2</sub>. Other factors not \
+                related to CO<sub>2</sub> emissions, uncertainties about the temperature response to other greenhouse gasses,
+                the distribution of the temperature response to changes in carbon dioxide, \
+                historical emissions uncertainty and recent emissions uncertainty can alter this budget with \
+                respectively ±250, -400 to +200, +100 to +200, ±250 and ±20 Gt. Following a precautionary \
+                principle, a large part of this budget could thus already be depleted. These uncertainties - as [noted by Stefan Rahmstorf](https://hyp.is/ub38EuV2Eem6qrNqE5h7TA/www.realclimate.org/index.php/archives/2019/08/how-much-co2-your-country-can-still-emit-in-three-simple-steps/) \
+                - should therefore not be used to argue against strong measures. Only a better guidance providing less uncertainty can improve \
+                policy guidance.
+                ''']),
+                html.P(['See the ',
+                html.A("IPCC's latest report on 1.5 °C warming (Table 2.2)",
+                href='https://hyp.is/LwH2ROKyEem027sdvofrBw/www.ipcc.ch/sr15/chapter/chapter-2/', target='_blank'),
+                ' for a range of possible values which assume the start of the budget in 2018.'
+                ]),
+            html.P([  # country selection button
+                html.Label(['Enter a ',
+                html.Span('2018 carbon budget', style={'font-weight': 'bold'}),
+                ' in Gt CO2 :']),
+                # dcc.Input(id='mother_birth', value=1952, type='number'),
+                dcc.Input(
+                    id='carbon-budget',
+                    value=580,
+                    type="number",
+                    min=50,
+                    step=1,
+                    max=2500,
+                    debounce=budget_debounce(debounce),
+                )
+            ]),
+
+            ##############
+            # Allocation # : id : allocation (server side callbacks only)
+            ##############
+
+            html.P([
+                html.Label('Share the global budget between countries by'),
+                dcc.Dropdown(
+                    id='allocation',
+                    options=[{'label': scheme.label, 'value': name} for name, scheme in allocation.SCHEMES.items()],
+                    value=allocation.DEFAULT,
+                    clearable=False,
+                ),
+            ], style={'display': 'none'} if callback_mode == 'clientside' else {}),
+
+            ###########
+            # Pathway # : id : pathway (server side callbacks only)
+            ###########
+
+            html.P([
+                html.Label('Shape of the future emissions'),
+                dcc.RadioItems(
+                    id='pathway',
+                    options=[{'label': ' ' + pathway.label, 'value': name} for name, pathway in pathways.PATHWAYS.items()],
+                    value=pathways.DEFAULT,
+                    labelStyle={'display': 'inline-block', 'margin-right': '1em'},
                 ),
+            ], style={'display': 'none'} if callback_mode == 'clientside' else {}),
+
+            ###############
+            # Uncertainty # : id : uncertainty (server side callbacks only)
+            ###############
 
-                ###############
-                # Future data # : compute linear decrease in emissions with given country carbon budget, until zero
-                ###############
-                go.Bar(
-                    name='Future',
-                    x=list(range(2020, 3000)),  # create list from 2020 to 3000
-                    y=df_budget.loc[df_budget['country'] == 'Belgium',       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
-                                    '2020':'2100'].values.flatten().tolist(),
+            html.P([
+                dcc.Checklist(
+                    id='uncertainty',
+                    options=[{'label': ' Show the uncertainty of the global budget and recent emissions', 'value': 'on'}],
+                    value=[],
                 ),
-            ],
+            ], style={'display': 'none'} if callback_mode == 'clientside' else {}),
+
+            #######################
+            # Explain calculation #
+            #######################
+
+            html.P([
+                html.H3('What is the remaining carbon emission budget for my country?'),
+                html.P(['Below figure displays the ',
+                html.Span('historical', style={'color': '#1f76b4', 'font-weight': 'bold'}),
+                ' and ',
+                html.Span('recent', style={'color': '#ff7f0f', 'font-weight': 'bold'}),
+                ' emissions in your country, and a linear decrease in ',
+                html.Span('future', style={'color': '#2ba02b', 'font-weight': 'bold'}),
+                ' emissions from 2020 onwards compatible with the given global carbon budget. The global budget has been divided between countries, \
+                starting from the premise that the remaining budget was equally shared per capita in 2016 - the year of the Paris agreement. \
+                The emissions in your country in 2018 and 2019 {}, as this is the latest data available on a global level. \
+                The remaining national shares of the global budget from 2019 have been calculated backwards from the given global 2018-budget, by adding 80 Gt to the global budget \
+                for two years of emissions since 2016 (2017 and 2018), multiplying with the relative share of the population of your country in the world and substracting two years of emissions \
+                in your country since 2016.\
+                 \
+                  '.format(recent_text)]),
+            ]),
 
-            'layout': {
-                'title': 'Historical Emissions and Future National Emission Budget',
-                'xaxis': {
-                    'title': 'Year'
-                },
-                'yaxis': {
-                    'title': 'Emissions (Megatons CO2)'
-                },
+            ################
+            # Global reach #
+            ################
+
+            html.P(id='worldwide-reach'),  # create div for variable output with adapted worldwide reach (id: worldwide reach)
+
+            ###############################
+            # Country budget and timeline #
+            ###############################
+
+            html.P(id='country-carbon-budget'),  # create div for variable output with adapted country carbon budget
 
-            }
-        }
-    ),
-
-        html.P([
-            html.H3('What does this mean for my personal carbon footprint?'),
-            html.P(['Below figure translates your national carbon budget to personal carbon footprints in tonnes CO2.\
-             \
-              ']),
         ]),
 
 
-    ######################
-    # Personal bar chart #
-    ######################
+        #####################
+        # Country bar chart #
+        #####################
 
-    dcc.Graph(
-        id='emissions-graph-personal',  # Name graph
-        figure={
-            'data': [
+        dcc.Graph(
+            id='emissions-graph',  # Name graph
+            figure={
+                # historical, recent and future emissions are filled in by the callbacks on page load
+                'data': [],
 
-                ###############
-                # Future data # : compute linear decrease in emissions with given country carbon budget, until zero
-                ###############
-                go.Bar(
-                    name='Future',
-                    x=list(range(2020, 3000)),  # create list from 2020 to 3000
-                    # y=[((df_budget.loc[df_budget['country'] == 'Belgium',       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
-                    #                 '2020':'2100'].values.flatten() / (df_budget.loc[df_budget['country'] == 'Belgium', 'population'].values.flatten().tolist()))).tolist())]       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
+                'layout': {
+                    'title': 'Historical Emissions and Future National Emission Budget',
+                    'xaxis': {
+                        'title': 'Year'
+                    },
+                    'yaxis': {
+                        'title': 'Emissions (Megatons CO2)'
+                    },
 
-                    y=df_budget.loc[df_budget['country'] == 'Belgium',       # Select country + Select row based on column value, example : df.loc[df['favorite_color'] == 'yellow']
-                                    '2020':'2100'].values.flatten().tolist(),
+                }
+            }
+        ),
 
+            html.P([
+                html.H3('What does this mean for my personal carbon footprint?'),
+                html.P(['Below figure translates your national carbon budget to personal carbon footprints in tonnes CO2.\
+                 \
+                  ']),
+            ]),
 
-                ),
-            ],
 
-            'layout': {
-                'title': 'Future Personal Emission Budget',
-                'xaxis': {
-                    'title': 'Year'
-                },
-                'yaxis': {
-                    'title': 'Emissions (Megatons CO2)'
-                },
+        ######################
+        # Personal bar chart #
+        ######################
+
+        dcc.Graph(
+            id='emissions-graph-personal',  # Name graph
+            figure={
+                # future emissions are filled in by the callbacks on page load
+                'data': [],
+
+                'layout': {
+                    'title': 'Future Personal Emission Budget',
+                    'xaxis': {
+                        'title': 'Year'
+                    },
+                    'yaxis': {
+                        'title': 'Emissions (Megatons CO2)'
+                    },
 
+                }
             }
-        }
-    ),
-
-    ###################
-    # Background info #
-    ###################
-
-    html.H3('Credits and Data'),
-    html.P(['Created by ',  # acknowledgement
-            html.A("Florian Dierickx",
-                   href='https://floriandierickx.github.io/', target='_blank'),
-            ' based on the ',
-            html.A("idea", href='http://www.realclimate.org/index.php/archives/2019/08/how-much-co2-your-country-can-still-emit-in-three-simple-steps/', target='_blank'),
-            ' and ',
-            html.A("original data", href='www.pik-potsdam.de/~stefan/Country%20CO2%20emissions%202016%20calculator.xlsx', target='_blank'),
-            ' from ',
-            html.A("Stefan Rahmstorf",
-                   href='https://twitter.com/rahmstorf', target="_blank"),
-            ', completemented with ',
-            html.A("historical carbon emission data (EDGAR) from the EU Joint Research Centre",
-                   href='https://edgar.jrc.ec.europa.eu/overview.php?v=booklet2018', target="_blank"),
-            ' and ',
-            html.A("2016 population data from the World Bank",
-                   href='https://databank.worldbank.org/reports.aspx?source=2&series=SP.POP.TOTL&country=#', target="_blank"),
-            ]),
-    html.P(['Find out more about the data on ',
-            html.A("Google Sheets", href='https://docs.google.com/spreadsheets/d/1R1U8iwlf2NdHDj6ykzgUqocQDfpbVB6i8lsStN3eNlo/edit?usp=sharing', target='_blank'),
-            ', get the code, or help improve the application on ',
-            html.A(
-                "GitHub", href='https://github.com/floriandierickx/emission-budgets', target='_blank'),
-            '.',
-            dcc.Markdown(
-                dangerously_allow_html=True, children=['''
-                If you use the application in a scientific work, please use <a href="https://www.zenodo.org/badge/latestdoi/211486285" target="_blank"><img src="https://www.zenodo.org/badge/211486285.svg"></a>
-                ''']),
-            html.A(''),
-            ]),
-])
+        ),
+
+        #############
+        # World map # : id : world-map (server side callbacks only)
+        #############
+
+        html.Div([
+            html.H3('Which countries run out of their budget first?'),
+            dcc.RadioItems(
+                id='map-field',
+                options=[{'label': ' ' + label.capitalize(), 'value': field} for field, label in figures.MAP_FIELDS.items()],
+                value='years_constant',
+                labelStyle={'display': 'inline-block', 'margin-right': '1em'},
+            ),
+            # the countries and colors are sent once with the layout, the callback only updates the values
+            dcc.Graph(id='world-map', figure=figures.world_map_figure(
+                store.countries, map_values(580, allocation.DEFAULT, 'years_constant'), 580, 'years_constant')),
+        ], style={'display': 'none'} if callback_mode == 'clientside' else {}),
+
+        ###################
+        # Background info #
+        ###################
+
+        html.H3('Credits and Data'),
+        html.P(['Created by ',  # acknowledgement
+                html.A("Florian Dierickx",
+                       href='https://floriandierickx.github.io/', target='_blank'),
+                ' based on the ',
+                html.A("idea", href='http://www.realclimate.org/index.php/archives/2019/08/how-much-co2-your-country-can-still-emit-in-three-simple-steps/', target='_blank'),
+                ' and ',
+                html.A("original data", href='www.pik-potsdam.de/~stefan/Country%20CO2%20emissions%202016%20calculator.xlsx', target='_blank'),
+                ' from ',
+                html.A("Stefan Rahmstorf",
+                       href='https://twitter.com/rahmstorf', target="_blank"),
+                ', completemented with ',
+                html.A("historical carbon emission data (EDGAR) from the EU Joint Research Centre",
+                       href='https://edgar.jrc.ec.europa.eu/overview.php?v=booklet2018', target="_blank"),
+                ' and ',
+                html.A("2016 population data from the World Bank",
+                       href='https://databank.worldbank.org/reports.aspx?source=2&series=SP.POP.TOTL&country=#', target="_blank"),
+                ]),
+        html.P(['Find out more about the data on ',
+                html.A("Google Sheets", href='https://docs.google.com/spreadsheets/d/1R1U8iwlf2NdHDj6ykzgUqocQDfpbVB6i8lsStN3eNlo/edit?usp=sharing', target='_blank'),
+                ', get the code, or help improve the application on ',
+                html.A(
+                    "GitHub", href='https://github.com/floriandierickx/emission-budgets', target='_blank'),
+                '.',
+                dcc.Markdown(
+                    dangerously_allow_html=True, children=['''
+                    If you use the application in a scientific work, please use <a href="https://www.zenodo.org/badge/latestdoi/211486285" target="_blank"><img src="https://www.zenodo.org/badge/211486285.svg"></a>
+                    ''']),
+                html.A(''),
+                ]),
+
+        #############################
+        # Country data (clientside) # : id : country-data
+        #############################
+
+    ] + ([dcc.Store(id='country-data', data=clientside.store_data(store))] if callback_mode == 'clientside' else []))
 
 dcc.Markdown(
     dangerously_allow_html=True, children=['''
@@ -272,260 +384,281 @@ dcc.Markdown(
     ## How much CO<sub>2</sub> can your country still emit to stay below **1.5** or **2** °C warming ?
     ''']),
 
-#################################
-# UPDATE COUNTRY BAR PLOT BASED #
-#################################
+#############
+# CALLBACKS #
+#############
 
+budget_inputs = [Input(component_id='country-dropdown', component_property='value'),
+                 Input(component_id='carbon-budget', component_property='value')]
 
-@app.callback(
-    Output('emissions-graph', 'figure'),   # insert graph name
-    [Input(component_id='country-dropdown', component_property='value'),
-     Input(component_id='carbon-budget', component_property='value')],)  # country selection
-
-def update_figure(selected_country, carbon_budget):
-
-    # define variables to be used for future emissions
-    # emissions in 2019
-
-    emissions_2019 = round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2),
-
-    # time until depletion of budget (round to 0 numbers after the comma)
-
-    t_depletion = (round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2)
-                  /
-                  ((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2) ** 2)
-                   /
-                   (2 * round(((carbon_budget + 80)  # carbon budget country
-                                             * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                                             / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                                             / global_emissions[0]
-                                             * global_per_capita_emissions[0]
-                                             / 1000 - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (2 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2)
-                   )
-                  )),
-
-    # yearly rate of decrease
-    slope = ((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2) ** 2)
-             /
-             (2 * round(((carbon_budget + 80)  # carbon budget country
-                                           * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                                           / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                                           / global_emissions[0]
-                                           * global_per_capita_emissions[0]
-                                           / 1000 - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (2 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2)
-             )
-            ),
+# allocation scheme, pathway shape, display options and compared countries
+option_inputs = [Input(component_id='uncertainty', component_property='value'),
+                 Input(component_id='allocation', component_property='value'),
+                 Input(component_id='pathway', component_property='value'),
+                 Input(component_id='compare-countries', component_property='value')]
 
-    # for loop to create list with decreasing emission values
-    t_depletion_int = int(t_depletion[0]) # create integer value of year to go to zero (remove numbers after the comma: transform from float to int)
-    future = [] # create empty list
-    for t in range(1, t_depletion_int): # fill list with decreasing emission values
-        future.append(round(emissions_2019[0], 2) - round(slope[0], 2) * t)
-
-    # update figures
-    return {
-        'data': [go.Bar(
-
-            ###################
-            # Historical data # : from imported EDGAR dataset
-            ###################
-            name='Historical',
-            x=list(range(1970, 2018)),
-            y=df_budget.loc[df_budget['country'] == selected_country,  # Select country + Select row based on column value,
-                                                                       # example : df.loc[df['favorite_color'] == 'yellow']
-                            '1970':'2017'].values.flatten().tolist(),
-        ),
+# countries overlaid on the graphs at most, the selected one included
+MAX_COMPARED_COUNTRIES = int(os.environ.get('MAX_COMPARED_COUNTRIES', 50))
 
-            ###############
-            # Recent data # : 2018 and 2019 assumed to have same emissions as 2017 (latest EDGAR data available)
-            ###############
-            go.Bar(
-            name='Recent',
-            x=list(range(2018, 2020)),
-            y=df_budget.loc[df_budget['country'] == selected_country,
-                            '2018':'2019'].values.flatten().tolist(),
-        ),
+# Monte Carlo samples of the global budget and 2018 / 2019 emissions when the uncertainty is shown
+UNCERTAINTY_SAMPLES = int(os.environ.get('UNCERTAINTY_SAMPLES', uncertainty.SAMPLES))
+
+
+# outputs are memoized per (country, carbon budget) : FIGURE_CACHE_SIZE entries per worker,
+# optionally shared between gunicorn workers through FIGURE_CACHE_DIR (e.g. /dev/shm/emission-budgets),
+# which keeps at most FIGURE_CACHE_DIR_FILES files and FIGURE_CACHE_DIR_MB megabytes
+
+figure_cache = LRUCache(
+    maxsize=int(os.environ.get('FIGURE_CACHE_SIZE', 4096)),
+    backend=FileBackend(
+        os.environ['FIGURE_CACHE_DIR'],
+        max_files=int(os.environ.get('FIGURE_CACHE_DIR_FILES', 20000)),
+        max_bytes=int(float(os.environ.get('FIGURE_CACHE_DIR_MB', 256)) * 1024 * 1024),
+    ) if os.environ.get('FIGURE_CACHE_DIR') else None,
+)
+
+# CALLBACK_METRICS=1 : duration, errors, cache hits and response bytes per callback, served at /metrics
+# (CALLBACK_METRICS_LOG=1 also logs them as JSON lines)
+
+callback_metrics = metrics.CallbackMetrics(get_cache=lambda: figure_cache, get_reloads=lambda: dataset_watcher)
+
+# HTTP_CACHE=1 : ETags, Cache-Control, 304 responses and gzip / brotli compression of the callback, page and API
+# responses (budgets/httpcache.py)
+
+http_cache = httpcache.HTTPCache(get_version=lambda: dataset.version)
+
+
+##################
+# RELOAD DATASET #
+##################
+
+def verify_table(store):
+    # a configured table must be rebuilt for the new dataset, otherwise the reload is refused
+    new_table = load_table(store)
+    if new_table is not None:
+        new_table.verify()
+
+
+def swap_dataset(new_store):
+    # called from the watcher thread with a validated store : requests in progress keep the dataset they started
+    # with, the next ones use the new store, and outputs cached for the old version are dropped
+    global dataset, store, table
+    dataset = Dataset(new_store, load_table(new_store), data_version())
+    store, table = dataset.store, dataset.table
+    figure_cache.clear()
+
+
+dataset_watcher = DatasetWatcher("data.csv", swap_dataset, DATA_RELOAD_INTERVAL, load=load_dataset,
+                                 checks=[check_allocations, verify_table]) if DATA_RELOAD_INTERVAL > 0 else None
+
+
+def budget_outputs(selected_country, carbon_budget, show_uncertainty=False, allocation_name=None, pathway_name=None,
+                   compare_countries=None):
+    # national figure, personal figure, worldwide reach and country text, computed once per (country, budget, options)
+    if selected_country is None or carbon_budget is None:  # cleared dropdown or empty input
+        raise PreventUpdate
+    allocation_name = allocation_name or allocation.DEFAULT
+    pathway_name = pathway_name or pathways.DEFAULT
+    # selected country first, without duplicates
+    compared = tuple(OrderedDict.fromkeys([selected_country] + list(compare_countries or [])))[:MAX_COMPARED_COUNTRIES]
+    current = dataset  # the same dataset for the whole request, even when it is reloaded meanwhile
+
+    def build():
+        store, table = current.store, current.table
+        i = store.row(selected_country)
+        scheme = allocation.get(allocation_name)
+        # the linear pathway keeps the original figure code
+        pathway = pathways.get(pathway_name) if pathway_name != pathways.DEFAULT else None
+        # the precomputed table holds the default allocation only
+        budget = table.lookup(i, carbon_budget) if table is not None and allocation_name == allocation.DEFAULT else None
+        if budget is None:  # no table, a budget outside of it or another allocation
+            budget = engine.compute(store, i, carbon_budget, scheme)
+        spread = uncertainty.analyze(store, i, carbon_budget, UNCERTAINTY_SAMPLES,
+                                     allocation=scheme) if show_uncertainty else None
+        if len(compared) > 1:
+            # every compared country in one engine pass and one pathway matrix
+            rows = store.rows(compared)
+            budgets = engine.compute(store, rows, carbon_budget, scheme)
+            graphs = figures.comparison_figures(store, rows, budgets, compared, pathway or pathways.get(pathway_name))
+        else:
+            graphs = (figures.national_figure(store, i, budget, selected_country, spread, pathway),
+                      figures.personal_figure(store, i, budget, selected_country, pathway))
+        return graphs + (figures.worldwide_reach_text(carbon_budget),
+                         figures.country_text(budget, spread, store.recent[i] if store.nowcast else None))
+
+    return figure_cache.get_or_compute(
+        (selected_country, float(carbon_budget), bool(show_uncertainty), allocation_name, pathway_name,
+         compared[1:], current.version),
+        build)
+
+
+######################################
+# UPDATE ALL OUTPUTS (combined mode) #
+######################################
+
+def update_all(selected_country, carbon_budget, show_uncertainty=None, allocation_name=None, pathway_name=None,
+               compare_countries=None):
+    return budget_outputs(selected_country, carbon_budget, bool(show_uncertainty), allocation_name, pathway_name,
+                          compare_countries)
+
+
+#################################
+# UPDATE COUNTRY BAR PLOT BASED #
+#################################
+
+def update_figure(selected_country, carbon_budget, show_uncertainty=None, allocation_name=None, pathway_name=None,
+                  compare_countries=None):
+    return budget_outputs(selected_country, carbon_budget, bool(show_uncertainty), allocation_name, pathway_name,
+                          compare_countries)[0]
 
-            ###############
-            # Future data # : compute linear decrease in emissions with given country carbon budget until zero
-            ############### with function describing emission value for years from 2020
-            go.Bar(
-            name='Future',
-            x=list(range(2020, 3000)),
-            y=future,
-        ),
-        ],
-        'layout': {
-            'title': 'Historical Emissions and Future Emission Budget for {} <br><sub>Source: @FlorianDRX</sub>'.format(selected_country) ,
-            'xaxis': {
-                'title': 'Year'
-            },
-            'yaxis': {
-                'title': 'National Emissions (Megatons CO2)'
-            },
-        },
-    }
 
 ############################
 # UPDATE PERSONAL BAR PLOT #
 ############################
 
-@app.callback(
-    Output('emissions-graph-personal', 'figure'),   # insert graph name
-    [Input(component_id='country-dropdown', component_property='value'),
-     Input(component_id='carbon-budget', component_property='value')],)  # country selection
-
-def update_figure(selected_country, carbon_budget):
-
-    # define variables to be used for future emissions
-
-    # emissions in 2019
-    emissions_2019 = round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2),
-
-    # time until depletion of budget (round to 0 numbers after the comma)
-    t_depletion = (round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2)
-                  /
-                  ((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2) ** 2)
-                   /
-                   (2 * round(((carbon_budget + 80)  # carbon budget country
-                              * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                              / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                              / global_emissions[0]
-                              * global_per_capita_emissions[0]
-                              / 1000
-                              - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (2 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2))
-                   )
-                  ),
-
-    # yearly rate of decrease
-    slope = ((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2) ** 2)
-            /
-            (2 * round(((carbon_budget + 80)  # carbon budget country
-                       * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                       / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                       / global_emissions[0]
-                       * global_per_capita_emissions[0]
-                       / 1000
-                       - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (2 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2))),
-
-    # country population
-    population = round(df_budget.loc[df_budget['country'] == selected_country, 'population'].values.flatten().tolist()[0], 2),
-
-
-
-    # for loop to create list with decreasing emission values
-    t_depletion_int = int(t_depletion[0]) # create integer value of year to go to zero (remove numbers after the comma: transform from float to int)
-    future = [] # create empty list
-    for t in range(1, t_depletion_int): # fill list with decreasing emission values
-        future.append((1000000 * (round(emissions_2019[0], 2) / round(population[0], 2))) - (1000000 * ((round(slope[0], 2) / round(population[0], 2)) * t)))
-
-    # update figures
-    return {
-        'data': [
+def update_personal_figure(selected_country, carbon_budget, show_uncertainty=None, allocation_name=None, pathway_name=None,
+                           compare_countries=None):
+    return budget_outputs(selected_country, carbon_budget, bool(show_uncertainty), allocation_name, pathway_name,
+                          compare_countries)[1]
 
-            ###############
-            # Recent data #
-            ###############
 
-        #     go.Bar(
-        #     name='Recent',
-        #     x=list(range(2018, 2020)),
-        #     y=df_budget.loc[df_budget['country'] == selected_country,
-        #                     '2018':'2019'].values.flatten().tolist(),
-        # ),
-
-            go.Bar(
-            name='Recent',
-            marker_color='rgb(255,127,15)',
-            x=list(range(2019, 2020)),
-            y=(1000000 * (df_budget.loc[df_budget['country'] == selected_country,
-                            '2018'].values.flatten() / (round(population[0], 2)))).tolist(),
-        ),
+#############
+# WORLD MAP # : id : world-map
+#############
+
+def map_values(carbon_budget, allocation_name, field):
+    # years left of every country for one budget : a slice of the precomputed table, or one engine pass over all rows
+    current = dataset
+
+    def build():
+        values = None
+        if current.table is not None and allocation_name == allocation.DEFAULT:
+            values = current.table.layer(field, carbon_budget)
+        if values is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = getattr(engine.compute(current.store, np.arange(len(current.store)), carbon_budget,
+                                                allocation.get(allocation_name)), field)
+        return figures.world_map_values(values, current.store.countries)
+
+    return figure_cache.get_or_compute(('world-map', float(carbon_budget), allocation_name, field, current.version), build)
+
+
+def update_world_map(carbon_budget, allocation_name=None, field=None):
+    if carbon_budget is None or field is None:
+        raise PreventUpdate
+    allocation_name = allocation_name or allocation.DEFAULT
+    figure = Patch()  # only the values and the title, the map itself stays in the browser
+    figure['data'][0]['z'] = map_values(carbon_budget, allocation_name, field)
+    figure['layout']['title'] = figures.world_map_title(carbon_budget, field)
+    return figure
 
-            ###############
-            # Future data # : compute linear decrease in emissions with given country carbon budget until zero
-            ############### with function describing emission value for years from 2020
-            go.Bar(
-            name='Future',
-            marker_color='rgb(106,187,104)',
-            x=list(range(2020, 3000)),
-            # y=future_personal,
-            y = future,
-        ),
 
-        ],
-        'layout': {
-            'title': 'Personal Future Emission Budget in {} <br><sub>Source: @FlorianDRX</sub>'.format(selected_country),
-            'xaxis': {
-                'title': 'Year'
-            },
-            'yaxis': {
-                'title': 'Personal Emissions (tons CO2)'
-            },
-        },
-    }
+##########################
+# UPDATE WORLDWIDE REACH # : id : worldwide-reach
+##########################
+
+def update_worldwide_reach(carbon_budget):
+    if carbon_budget is None:
+        raise PreventUpdate
+    return figures.worldwide_reach_text(carbon_budget)
 
 
 ############################
 # CALCULATE COUNTRY BUDGET # : id : country-carbon-budget
 ############################
 
+def update_country_div(selected_country, carbon_budget, show_uncertainty=None, allocation_name=None, pathway_name=None,
+                       compare_countries=None):
+    return budget_outputs(selected_country, carbon_budget, bool(show_uncertainty), allocation_name, pathway_name,
+                          compare_countries)[3]
+
+
+def add_callback(app, outputs, inputs, func, coalescer=None):
+    # every server side callback goes through the (optional) coalescing and metrics wrappers
+    name = metrics.callback_id(outputs)
+    if coalescer is not None:
+        inputs = inputs + [State('session-id', 'data')]
+        func = coalescer.wrap(name, func)
+    app.callback(outputs, inputs)(callback_metrics.instrument(name, func))
+
+
+def register_callbacks(app, callback_mode, coalescer=None):
+    if callback_mode == 'clientside':
+        app.clientside_callback(
+            ClientsideFunction(namespace='budgets', function_name='update'),
+            [Output('emissions-graph', 'figure'),
+             Output('emissions-graph-personal', 'figure'),
+             Output('worldwide-reach', 'children'),
+             Output('country-carbon-budget', 'children')],
+            budget_inputs + [State('country-data', 'data')])
+    elif callback_mode == 'combined':
+        add_callback(app,
+                     [Output('emissions-graph', 'figure'),
+                      Output('emissions-graph-personal', 'figure'),
+                      Output('worldwide-reach', 'children'),
+                      Output('country-carbon-budget', 'children')],
+                     budget_inputs + option_inputs, update_all, coalescer)
+    else:
+        add_callback(app, Output('emissions-graph', 'figure'), budget_inputs + option_inputs, update_figure, coalescer)
+        add_callback(app, Output('emissions-graph-personal', 'figure'), budget_inputs + option_inputs, update_personal_figure, coalescer)
+        add_callback(app, Output('worldwide-reach', 'children'),
+                     [Input(component_id='carbon-budget', component_property='value')], update_worldwide_reach, coalescer)
+        add_callback(app, Output('country-carbon-budget', 'children'), budget_inputs + option_inputs, update_country_div, coalescer)
+    if callback_mode != 'clientside':
+        add_callback(app, Output('world-map', 'figure'),
+                     [Input(component_id='carbon-budget', component_property='value'),
+                      Input(component_id='allocation', component_property='value'),
+                      Input(component_id='map-field', component_property='value')], update_world_map, coalescer)
 
-@app.callback(
-    Output(component_id='country-carbon-budget',
-           component_property='children'),
-    [Input(component_id='country-dropdown', component_property='value'),
-     Input(component_id='carbon-budget', component_property='value')]
-)
 
-def update_country_div(selected_country, carbon_budget):
-    style = {'font-weight': 'bold'}
-    return ['At the start of 2016, it would have taken ',
-    html.Span('{}'.format((carbon_budget + 80) / 40,), style=style), # Global reach from 2016 onwards
-    ' years of constant worldwide emissions before the carbon budget was depleted. \
-    From 2020 onwards, this will be reduced to ',
-    html.Span('{}'.format(((carbon_budget + 80) / 40) - 4,), style=style), # Global reach from 2020 onwards
-    ' years. At the start of 2016, the remaining carbon budget for your country was ',
-    html.Span('{}'.format(round(((carbon_budget + 80)  # country carbon budget from 2016 onwards
-                               * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                              / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                              / global_emissions[0]
-                              * global_per_capita_emissions[0]
-                              / 1000, 2),), style=style),
-    ' Mton CO2. \
-    Assuming that the 2018 and 2019-emissions in your country stayed at the level of ',
-    html.Span('{}'.format(round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2),), style=style), # country emissions 2017
-    ' Mton CO2 (last available data from 2017), the remaining national carbon\
-    budget from 2020 onwards is ',
-    html.Span('{}'.format(round(((carbon_budget + 80)  # carbon budget country
-                              * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                              / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                              / global_emissions[0]
-                              * global_per_capita_emissions[0]
-                              / 1000 - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (3 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2),), style=style), # country carbon budget from 2019 onwards
-    ' Mton CO2. This is equal to ',
-    html.Span('{}'.format(round((((carbon_budget + 80)  # carbon budget country
-          * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-          / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-          / global_emissions[0]
-          * global_per_capita_emissions[0]
-          / 1000 - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (3 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])))
-          / df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2),), style=style), # years in cte emissions from 2019 onwards
-    ' years of constant emissions, or ',
-    html.Span('{}'.format(round((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2)
-     /
-     ((round(df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0], 2) ** 2)
-        /
-        (2 * round(((carbon_budget + 80)  # carbon budget country
-                    * df_budget.loc[df_budget['country'] == selected_country, 'total_kton_CO2'].values.flatten().tolist()[0])
-                   / df_budget.loc[df_budget['country'] == selected_country, 'per_capita_CO2'].values.flatten().tolist()[0]
-                   / global_emissions[0]
-                   * global_per_capita_emissions[0]
-                   / 1000 - (df_budget.loc[df_budget['country'] == selected_country, '2016'].values.flatten().tolist()[0] + (2 * df_budget.loc[df_budget['country'] == selected_country, '2017'].values.flatten().tolist()[0])), 2)
-                   )
-     )
-    ) - 1, 2),), style=style), # Global reach from 2016 onwards
-    ' years when linearly decreasing emissions.',]
+###############
+# APP FACTORY #
+###############
+
+def create_app(callback_mode=CALLBACK_MODE, coalescer=request_coalescer):
+    app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+    app.title = 'Carbon Emission Budget Calculator'
+    if callback_mode == 'clientside':  # no server side callbacks to coalesce
+        coalescer = None
+
+    # the layout is a function : the component tree is built on the first page load instead of
+    # at import time, and reused for every following page load
+    # (the country list and the clientside data come from the dataset, so it is rebuilt after a reload)
+    layout = {}
+
+    def serve_layout():
+        version = dataset.version
+        tree = layout.get(version)
+        if tree is None:
+            layout.clear()
+            tree = layout[version] = build_layout(callback_mode)
+        if coalescer is None:
+            return tree
+        # a new session id for every page load, used to coalesce its requests
+        return html.Div([tree, dcc.Store(id='session-id', data=uuid.uuid4().hex)])
+
+    app.layout = serve_layout
+    register_callbacks(app, callback_mode, coalescer)
+
+    # batch JSON API on the Flask server : /api/budgets
+    app.server.register_blueprint(api.create_blueprint(lambda: dataset.store))
+
+    # one watcher thread per worker, started by its first request (threads do not survive the gunicorn fork)
+    if dataset_watcher is not None:
+        app.server.before_request(dataset_watcher.start)
+
+    # HTTP_CACHE=1, registered first so its hook runs last and /metrics records the uncompressed sizes
+    http_cache.register(app.server)
+
+    # /metrics (CALLBACK_METRICS=1)
+    callback_metrics.register(app.server)
+    return app
+
+
+# the dataset above is loaded at import, so with `gunicorn --preload app:server` (Procfile) it is
+# read once in the master process and shared copy-on-write by all workers
+app = create_app()
+server = app.server
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,190 @@
+// Clientside version of budgets/engine.py and budgets/figures.py, used with CALLBACK_MODE=clientside.
+//
+// The per country data is shipped once in the `country-data` dcc.Store, after which changing the
+// country or the carbon budget is computed in the browser without a request to the server.
+// The Python engine stays the reference implementation: `python -m budgets.clientside` checks that
+// both give the same outputs for every country.
+
+(function () {
+    var STYLE_BOLD = {'font-weight': 'bold'};
+    var MAX_FUTURE_YEARS = 980;  // future pathways are displayed from 2020 up to 2999
+
+    // json null (missing value in data.csv) -> NaN, like pandas
+    function num(x) {
+        return x === null || x === undefined ? NaN : x;
+    }
+
+    // numpy.round : round half to even after scaling
+    function round(x, decimals) {
+        var scale = Math.pow(10, decimals);
+        var y = x * scale;
+        var r = Math.round(y);
+        if (Math.abs(y % 1) === 0.5) {
+            r = 2 * Math.round(y / 2);
+        }
+        return r / scale;
+    }
+
+    // '{}'.format(float) in Python
+    function pyStr(x) {
+        if (isNaN(x)) {
+            return 'nan';
+        }
+        if (!isFinite(x)) {
+            return x > 0 ? 'inf' : '-inf';
+        }
+        return Number.isInteger(x) ? x.toFixed(1) : String(x);
+    }
+
+    function span(value) {
+        return {type: 'Span', namespace: 'dash_html_components', props: {children: value, style: STYLE_BOLD}};
+    }
+
+    // figures.bar : one bar per year from firstYear onwards
+    function bar(name, firstYear, values, marker) {
+        var trace = {type: 'bar', name: name, x0: firstYear, dx: 1, y: values};
+        if (marker) {
+            trace.marker = marker;
+        }
+        return trace;
+    }
+
+    // engine.compute for a single country and budget
+    function compute(data, row, carbonBudget) {
+        var c = data.constants;
+        var historical = data.historical[row];
+        var emissions2016 = num(historical[historical.length - 2]);
+        var emissions2017 = num(historical[historical.length - 1]);
+        var emissions2018 = num(data.recent[row][0]);
+        var emissions2019 = num(data.recent[row][1]);
+
+        var budget2016 = (carbonBudget + c.EMISSIONS_2016_2017)
+            * num(data.total_kton_CO2[row])
+            / num(data.per_capita_CO2[row])
+            / c.GLOBAL_EMISSIONS
+            * c.GLOBAL_PER_CAPITA_EMISSIONS
+            / 1000;
+        var remaining2019 = round(budget2016 - (emissions2016 + emissions2017 + emissions2018), 2);
+        var remaining2020 = budget2016 - (emissions2016 + emissions2017 + emissions2018 + emissions2019);
+        var start = round(emissions2019, 2);
+        var slope = start * start / (2 * remaining2019);
+        var tDepletion = start / slope;
+
+        return {
+            country_budget_2016: budget2016,
+            emissions_2017: emissions2017,
+            emissions_2019: start,
+            remaining_2019: remaining2019,
+            remaining_2020: remaining2020,
+            years_constant: remaining2020 / emissions2019,
+            slope: slope,
+            t_depletion: tDepletion,
+            years_linear: tDepletion - 1
+        };
+    }
+
+    // engine.linear_pathway / engine.personal_pathway, per person when population is given
+    function pathway(budget, population) {
+        var future = [];
+        if (!isFinite(budget.t_depletion)) {
+            return future;
+        }
+        var start = round(budget.emissions_2019, 2);
+        var slope = round(budget.slope, 2);
+        var end = Math.min(Math.trunc(budget.t_depletion), MAX_FUTURE_YEARS + 1);
+        for (var t = 1; t < end; t++) {
+            if (population === undefined) {
+                future.push(start - slope * t);
+            } else {
+                future.push((1000000 * (start / population)) - (1000000 * ((slope / population) * t)));
+            }
+        }
+        return future;
+    }
+
+    function nationalFigure(data, row, budget, selectedCountry) {
+        return {
+            data: [
+                bar('Historical', 1970, data.historical[row]),
+                bar('Recent', 2018, data.recent[row]),
+                bar('Future', 2020, pathway(budget))
+            ],
+            layout: {
+                title: 'Historical Emissions and Future Emission Budget for ' + selectedCountry + ' <br><sub>Source: @FlorianDRX</sub>',
+                xaxis: {title: 'Year'},
+                yaxis: {title: 'National Emissions (Megatons CO2)'}
+            }
+        };
+    }
+
+    function personalFigure(data, row, budget, selectedCountry) {
+        var population = round(num(data.population[row]), 2);
+        return {
+            data: [
+                bar('Recent', 2019, [1000000 * (num(data.recent[row][0]) / population)], {color: 'rgb(255,127,15)'}),
+                bar('Future', 2020, pathway(budget, population), {color: 'rgb(106,187,104)'})
+            ],
+            layout: {
+                title: 'Personal Future Emission Budget in ' + selectedCountry + ' <br><sub>Source: @FlorianDRX</sub>',
+                xaxis: {title: 'Year'},
+                yaxis: {title: 'Personal Emissions (tons CO2)'}
+            }
+        };
+    }
+
+    function worldwideReachText(data, carbonBudget) {
+        var c = data.constants;
+        var reach2016 = (carbonBudget + c.EMISSIONS_2016_2017) / c.GLOBAL_EMISSIONS;
+        return ['At the start of 2016, it would have taken ',
+            span(pyStr(reach2016)),
+            ' years of constant worldwide emissions before the carbon budget was depleted. \
+    From 2020 onwards, this will be reduced to ',
+            span(pyStr(reach2016 - 4)),
+            ' years.'];
+    }
+
+    // figures.country_text, with the nowcast sentence when the 2018 and 2019 emissions were estimated
+    function countryText(budget, data, row) {
+        var text = ['At the start of 2016, the remaining carbon budget for your country was ',
+            span(pyStr(round(budget.country_budget_2016, 2)))];
+        if (!data.nowcast) {
+            text.push(' Mton CO2. \
+    Assuming that the 2018 and 2019-emissions in your country stayed at the level of ',
+                span(pyStr(round(budget.emissions_2017, 2))),
+                ' Mton CO2 (last available data from 2017), the remaining national carbon\
+    budget from 2020 onwards is ');
+        } else {
+            text.push(' Mton CO2. Estimating the 2018 and 2019-emissions in your country at ',
+                span(pyStr(round(num(data.recent[row][0]), 2))),
+                ' and ',
+                span(pyStr(round(num(data.recent[row][1]), 2))),
+                ' Mton CO2 from the trend of the emissions up to 2017 (last available data: ',
+                span(pyStr(round(budget.emissions_2017, 2))),
+                ' Mton CO2), the remaining national carbon budget from 2020 onwards is ');
+        }
+        return text.concat([
+            span(pyStr(round(budget.remaining_2020, 2))),
+            ' Mton CO2. This is equal to ',
+            span(pyStr(round(budget.years_constant, 2))),
+            ' years of constant emissions, or ',
+            span(pyStr(round(budget.years_linear, 2))),
+            ' years when linearly decreasing emissions.']);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        budgets: {
+            update: function (selectedCountry, carbonBudget, data) {
+                if (selectedCountry === null || selectedCountry === undefined ||
+                        carbonBudget === null || carbonBudget === undefined || !data) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var row = data.index[selectedCountry];
+                var budget = compute(data, row, carbonBudget);
+                return [nationalFigure(data, row, budget, selectedCountry),
+                        personalFigure(data, row, budget, selectedCountry),
+                        worldwideReachText(data, carbonBudget),
+                        countryText(budget, data, row)];
+            }
+        }
+    });
+})();
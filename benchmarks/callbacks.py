@@ -0,0 +1,199 @@
+# Benchmark suite for the hot path : callbacks, figure serialization and data loading.
+#
+# Every callback is driven through the Flask test client with the same POST
+# to /_dash-update-component the browser sends, for all countries and a sweep
+# of carbon budgets. For each benchmark it reports p50/p95 latency, the peak
+# memory allocated per call (tracemalloc, measured on a separate sample so it
+# does not distort the timings) and the response size.
+#
+#     python benchmarks/callbacks.py                     # run and print
+#     python benchmarks/callbacks.py --save              # store as baseline
+#     python benchmarks/callbacks.py --compare           # fail on a p50 regression against the baseline
+#
+# The figure cache is disabled unless --cache is given, so the timings are the
+# cost of computing the outputs rather than of a cache lookup.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app  # noqa: E402
+from budgets import engine, figures  # noqa: E402
+from budgets.cache import LRUCache  # noqa: E402
+from budgets.dataset import default_npz_path, read_npz  # noqa: E402
+from budgets.store import BudgetStore  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+BUDGETS = [50, 420, 580, 1170, 1500, 2500]
+
+COUNTRY = {'id': 'country-dropdown', 'property': 'value'}
+BUDGET = {'id': 'carbon-budget', 'property': 'value'}
+UNCERTAINTY = {'id': 'uncertainty', 'property': 'value'}
+ALLOCATION = {'id': 'allocation', 'property': 'value'}
+PATHWAY = {'id': 'pathway', 'property': 'value'}
+COMPARE = {'id': 'compare-countries', 'property': 'value'}
+MAP_FIELD = {'id': 'map-field', 'property': 'value'}
+OPTIONS = [UNCERTAINTY, ALLOCATION, PATHWAY, COMPARE]
+
+# callback id -> (outputs, inputs) as registered by app.register_callbacks
+CALLBACKS = {
+    'combined': ([('emissions-graph', 'figure'), ('emissions-graph-personal', 'figure'),
+                  ('worldwide-reach', 'children'), ('country-carbon-budget', 'children')], [COUNTRY, BUDGET] + OPTIONS),
+    'separate/emissions-graph': ([('emissions-graph', 'figure')], [COUNTRY, BUDGET] + OPTIONS),
+    'separate/emissions-graph-personal': ([('emissions-graph-personal', 'figure')], [COUNTRY, BUDGET] + OPTIONS),
+    'separate/worldwide-reach': ([('worldwide-reach', 'children')], [BUDGET]),
+    'separate/country-carbon-budget': ([('country-carbon-budget', 'children')], [COUNTRY, BUDGET] + OPTIONS),
+    'combined/world-map': ([('world-map', 'figure')], [BUDGET, ALLOCATION, MAP_FIELD]),
+    'separate/world-map': ([('world-map', 'figure')], [BUDGET, ALLOCATION, MAP_FIELD]),
+}
+
+
+def request_body(outputs, inputs, country, budget):
+    """JSON body of a Dash 2 callback request."""
+    values = {'country-dropdown': country, 'carbon-budget': budget, 'uncertainty': [], 'allocation': 'equal-per-capita',
+              'pathway': 'linear', 'compare-countries': [], 'map-field': 'years_constant'}
+    specs = [{'id': id_, 'property': prop} for id_, prop in outputs]
+    if len(outputs) > 1:
+        output = '..' + '...'.join('{}.{}'.format(id_, prop) for id_, prop in outputs) + '..'
+    else:
+        output, specs = '{}.{}'.format(*outputs[0]), specs[0]
+    return {
+        'output': output,
+        'outputs': specs,
+        'inputs': [dict(spec, value=values[spec['id']]) for spec in inputs],
+        'changedPropIds': ['carbon-budget.value'],
+        'state': [],
+    }
+
+
+def measure(call, cases, allocation_sample=50):
+    """Latency and size of ``call(case)`` for every case, peak allocations on a sample."""
+    seconds, sizes = [], []
+    for case in cases:
+        start = time.perf_counter()
+        size = call(case)
+        seconds.append(time.perf_counter() - start)
+        sizes.append(size)
+
+    peaks = []
+    tracemalloc.start()
+    for case in cases[::max(1, len(cases) // allocation_sample)]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        call(case)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(seconds, n=20)
+    return {
+        'calls': len(cases),
+        'p50_ms': 1000 * statistics.median(seconds),
+        'p95_ms': 1000 * quantiles[18],
+        'peak_alloc_kb': statistics.median(peaks) / 1024,
+        'bytes': statistics.mean(sizes) if sizes[0] is not None else None,
+    }
+
+
+def callback_benchmarks(budgets):
+    cases = [(country, budget) for country in app.store.countries for budget in budgets]
+    results = {}
+    for mode in ('combined', 'separate'):
+        client = app.create_app(mode, coalescer=None).server.test_client()
+        for name, (outputs, inputs) in CALLBACKS.items():
+            if name.split('/')[0] != mode:
+                continue
+
+            def call(case):
+                response = client.post('/_dash-update-component', json=request_body(outputs, inputs, *case))
+                if response.status_code != 200:
+                    raise RuntimeError('{} {} : {}'.format(name, case, response.status_code))
+                return len(response.data)
+
+            results['callback/' + name] = measure(call, cases)
+    return results
+
+
+def serialization_benchmarks(budgets):
+    cases = [(i, budget) for i in range(len(app.store)) for budget in budgets]
+
+    def call(case):
+        i, budget = case
+        result = engine.compute(app.store, i, budget)
+        country = app.store.countries[i]
+        return sum(len(to_json_plotly(figure)) for figure in (figures.national_figure(app.store, i, result, country),
+                                                                figures.personal_figure(app.store, i, result, country)))
+
+    return {'figures/build+serialize': measure(call, cases)}
+
+
+def loading_benchmarks(repeat=20):
+    csv_path = os.path.join(ROOT, 'data.csv')
+    results = {'load/csv': measure(lambda _: BudgetStore.from_csv(csv_path) and None, range(repeat))}
+    if os.path.exists(default_npz_path(csv_path)):
+        results['load/npz'] = measure(lambda _: read_npz(default_npz_path(csv_path)) and None, range(repeat))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        change = result['p50_ms'] / baseline[name]['p50_ms'] - 1
+        print('{:<45}{:>+9.1%}'.format(name, change))
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark callbacks, figure serialization and data loading.')
+    parser.add_argument('--budgets', type=float, nargs='+', default=BUDGETS)
+    parser.add_argument('--cache', action='store_true', help='keep the figure cache enabled')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare p50 latencies with the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, default 25%%')
+    args = parser.parse_args()
+
+    if not args.cache:
+        app.figure_cache = LRUCache(maxsize=0)
+
+    results = {}
+    results.update(callback_benchmarks(args.budgets))
+    results.update(serialization_benchmarks(args.budgets))
+    results.update(loading_benchmarks())
+
+    print('{:<45}{:>8}{:>10}{:>10}{:>12}{:>10}'.format('benchmark', 'calls', 'p50 ms', 'p95 ms', 'alloc kB', 'bytes'))
+    for name, r in results.items():
+        print('{:<45}{:>8}{:>10.2f}{:>10.2f}{:>12.1f}{:>10}'.format(
+            name, r['calls'], r['p50_ms'], r['p95_ms'], r['peak_alloc_kb'],
+            '' if r['bytes'] is None else '{:.0f}'.format(r['bytes'])))
+
+    if args.save:
+        with open(BASELINE, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('baseline written to {}'.format(BASELINE))
+
+    if args.compare:
+        if not os.path.exists(BASELINE):
+            print('no baseline, run with --save first')
+            return 1
+        with open(BASELINE) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('p50 regressions over {:.0%} : {}'.format(args.tolerance, ', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Load test of the carbon budget input : callback executions per user interaction.
+#
+# Simulated users type a budget ("1500" sends 1, 15, 150 and 1500) or click the
+# step arrows (580 -> 590), with one request per keystroke in flight at the
+# same time like in the browser, against three setups:
+#
+#   live       every value is computed (default app)
+#   coalesced  every value is sent, REQUEST_COALESCING drops the superseded ones
+#   submit     BUDGET_DEBOUNCE=submit : only the final value is sent
+#
+#     python benchmarks/coalescing.py --users 20 --interval-ms 100 --window-ms 150
+#
+# and reports the budget computations and responses per interaction, and the
+# time from the last keystroke until its response.
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from callbacks import CALLBACKS, request_body  # noqa: E402  (also puts the repository on sys.path)
+import app  # noqa: E402
+from budgets.cache import LRUCache  # noqa: E402
+from budgets.coalesce import Coalescer  # noqa: E402
+
+INTERACTIONS = {
+    'typing': [1, 15, 150, 1500],
+    'stepping': list(range(581, 591)),
+}
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.value += 1
+
+
+def interaction(server, session_id, country, values, interval, statuses, finished):
+    # one request per value, sent every `interval` seconds without waiting for the previous response
+    outputs, inputs = CALLBACKS['combined']
+
+    def send(budget, last):
+        body = request_body(outputs, inputs, country, budget)
+        if session_id is not None:
+            body['state'] = [{'id': 'session-id', 'property': 'data', 'value': session_id}]
+        response = server.test_client().post('/_dash-update-component', json=body)
+        statuses.append(response.status_code)
+        if last:
+            finished.append(time.perf_counter())
+
+    threads = []
+    last_sent = None
+    for n, budget in enumerate(values):
+        last = n == len(values) - 1
+        thread = threading.Thread(target=send, args=(budget, last))
+        if last:
+            last_sent = time.perf_counter()  # before the request is sent, so the latency is never negative
+        thread.start()
+        threads.append(thread)
+        if not last:
+            time.sleep(interval)
+    for thread in threads:
+        thread.join()
+    return last_sent
+
+
+def run(setup, values, users, interval, window):
+    coalescer = Coalescer(window=window) if setup == 'coalesced' else None
+    server = app.create_app('combined', coalescer=coalescer).server
+    if setup == 'submit':
+        values = values[-1:]
+
+    computed = Counter()
+    budget_outputs = app.budget_outputs
+
+    def counting_budget_outputs(*args):
+        computed.add()
+        return budget_outputs(*args)
+
+    app.budget_outputs = counting_budget_outputs
+    app.figure_cache = LRUCache(maxsize=0)
+    try:
+        latencies = []
+
+        def user(n):
+            statuses, finished = [], []
+            session_id = uuid.uuid4().hex if coalescer is not None else None
+            last_sent = interaction(server, session_id, app.store.countries[n % len(app.store)],
+                                    values, interval, statuses, finished)
+            results.extend(statuses)
+            latencies.append(finished[0] - last_sent)
+
+        results = []
+        threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        app.budget_outputs = budget_outputs
+
+    return {
+        'computed': computed.value / users,
+        'responses': sum(status == 200 for status in results) / users,
+        'prevented': sum(status == 204 for status in results) / users,
+        'final_ms': 1000 * statistics.median(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Callback executions per interaction with the carbon budget input.')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--interval-ms', type=float, default=100, help='time between keystrokes')
+    parser.add_argument('--window-ms', type=float, default=150, help='coalescing window')
+    args = parser.parse_args()
+
+    print('{:<10}{:<11}{:>10}{:>11}{:>11}{:>10}'.format('input', 'setup', 'computed', 'responses', 'prevented', 'final ms'))
+    for name, values in INTERACTIONS.items():
+        for setup in ('live', 'coalesced', 'submit'):
+            r = run(setup, values, args.users, args.interval_ms / 1000, args.window_ms / 1000)
+            print('{:<10}{:<11}{:>10.1f}{:>11.1f}{:>11.1f}{:>10.1f}'.format(
+                name, setup, r['computed'], r['responses'], r['prevented'], r['final_ms']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Bytes on the wire with HTTP_CACHE=1 : response bodies sent as is, gzip and brotli.
+#
+# Requests the page, the Dash JavaScript bundles, the layout and callback
+# graph (combined and clientside mode), the callbacks for a sample of
+# countries and budgets and /api/budgets through the Flask test client, once
+# per Accept-Encoding, and reports the body bytes, the compression ratio and
+# the time to compress a body the first time (later ones come from the
+# compressed body cache). GET responses are requested again with their ETag
+# to check they are answered with an empty 304.
+#
+#     python benchmarks/compression.py [--countries 20] [--budgets 420 580 1170]
+#
+# brotli is only measured when the brotli package is installed.
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+os.environ['HTTP_CACHE'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from callbacks import CALLBACKS, request_body  # noqa: E402  (also puts the repository on sys.path)
+import app  # noqa: E402
+from budgets import httpcache  # noqa: E402
+
+API_BUDGETS = '420,580,1170'
+
+
+def requests(countries, budgets):
+    """(kind, mode, method, path, body) of every request measured."""
+    yield 'page', 'combined', 'GET', '/', None
+    yield 'layout', 'combined', 'GET', '/_dash-layout', None
+    yield 'layout', 'clientside', 'GET', '/_dash-layout', None
+    yield 'dependencies', 'combined', 'GET', '/_dash-dependencies', None
+    for name in ('combined', 'separate/emissions-graph', 'combined/world-map'):
+        mode = name.split('/')[0]
+        for country in countries:
+            for budget in budgets:
+                yield 'callback ' + name, mode, 'POST', '/_dash-update-component', request_body(
+                    *CALLBACKS[name], country, budget)
+    yield 'api json', 'combined', 'GET', '/api/budgets?budgets=' + API_BUDGETS, None
+    yield 'api csv', 'combined', 'GET', '/api/budgets?format=csv&budgets=' + API_BUDGETS, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response bytes with and without compression.')
+    parser.add_argument('--countries', type=int, default=20, help='countries sampled for the callbacks')
+    parser.add_argument('--budgets', type=float, nargs='+', default=[420, 580, 1170])
+    args = parser.parse_args()
+
+    app.figure_cache.clear()
+    clients = {mode: app.create_app(mode, coalescer=None).server.test_client()
+               for mode in ('combined', 'separate', 'clientside')}
+    step = max(1, len(app.store.countries) // args.countries)
+    cases = list(requests(app.store.countries[::step][:args.countries], args.budgets))
+
+    # the JavaScript bundles of the page, fetched once per page load
+    page = clients['combined'].get('/').get_data(as_text=True)
+    cases.extend(('bundles', 'combined', 'GET', src, None) for src in re.findall(r'src="([^"]+)"', page))
+
+    encodings = httpcache.encodings()
+    totals = {}
+    for kind, mode, method, path, body in cases:
+        client = clients[mode]
+        sizes = {}
+        plain = client.open(path, method=method, json=body).get_data()
+        sizes['identity'] = len(plain)
+        for encoding in encodings:
+            response = client.open(path, method=method, json=body, headers={'Accept-Encoding': encoding})
+            sizes[encoding] = len(response.get_data())
+            etag = response.headers.get('ETag')
+            if method == 'GET' and etag:
+                revalidated = client.open(path, method=method, headers={'Accept-Encoding': encoding,
+                                                                        'If-None-Match': etag})
+                if revalidated.status_code != 304 or revalidated.get_data():
+                    raise AssertionError('{} was not answered with an empty 304'.format(path))
+            start = time.perf_counter()
+            httpcache.compress(plain, encoding)
+            sizes[encoding + ' ms'] = 1000 * (time.perf_counter() - start)
+        total = totals.setdefault(kind, {'requests': 0, 'identity': 0, 'ms': {e: [] for e in encodings},
+                                         'bytes': dict.fromkeys(encodings, 0)})
+        total['requests'] += 1
+        total['identity'] += sizes['identity']
+        for encoding in encodings:
+            total['bytes'][encoding] += sizes[encoding]
+            total['ms'][encoding].append(sizes[encoding + ' ms'])
+
+    header = '{:<36}{:>9}{:>12}'.format('response', 'requests', 'identity')
+    for encoding in encodings:
+        header += '{:>12}{:>8}{:>10}'.format(encoding, 'ratio', 'p50 ms')
+    print(header)
+    for kind, total in totals.items():
+        line = '{:<36}{:>9}{:>12}'.format(kind, total['requests'], total['identity'])
+        for encoding in encodings:
+            line += '{:>12}{:>8.2f}{:>10.2f}'.format(total['bytes'][encoding],
+                                                     total['bytes'][encoding] / max(total['identity'], 1),
+                                                     statistics.median(total['ms'][encoding]))
+        print(line)
+    if 'br' not in encodings:
+        print('brotli not installed : only gzip measured (pip install brotli)')
+
+
+if __name__ == '__main__':
+    main()
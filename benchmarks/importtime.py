@@ -0,0 +1,69 @@
+# Import-time profile of the app, based on `python -X importtime -c "import app"`.
+#
+# Lists the slowest modules (cumulative and self time), reports whether the
+# heavy optional modules were imported and exits with status 1 when importing
+# the app takes longer than --max-ms, so it can guard cold start in CI:
+#
+#     python benchmarks/importtime.py --top 15 --max-ms 1500
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules the app should not need at import in its default configuration
+DEFERRED = ['pandas', 'plotly.graph_objs']
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile(module):
+    """(self us, cumulative us, depth, name) for every module imported by ``import module``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time profile of the app.')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, help='fail when the module takes longer to import')
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    end = next(n for n, row in enumerate(rows) if row[3] == args.module and row[2] == 0)
+    start = max([n + 1 for n, row in enumerate(rows[:end]) if row[2] == 0] or [0])
+    children = [row for row in rows[start:end] if row[2] == 1]  # direct imports of the module
+    total_ms = rows[end][1] / 1000
+
+    print('import {} : {:.1f} ms, {} modules'.format(args.module, total_ms, len(rows)))
+    print('\n{:>10}{:>10}  {}'.format('cumul ms', 'self ms', 'imported by ' + args.module))
+    for self_us, cumulative, depth, name in sorted(children, key=lambda r: -r[1])[:args.top]:
+        print('{:>10.1f}{:>10.1f}  {}'.format(cumulative / 1000, self_us / 1000, name))
+    print('\n{:>10}  {}'.format('self ms', 'slowest modules'))
+    for self_us, cumulative, depth, name in sorted(rows, key=lambda r: -r[0])[:args.top]:
+        print('{:>10.1f}  {}'.format(self_us / 1000, name))
+
+    imported = {name for _, _, _, name in rows}
+    print('\ndeferred modules : {}'.format(', '.join(
+        '{} {}'.format(name, 'IMPORTED' if name in imported else 'not imported') for name in DEFERRED)))
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print('import of {} took {:.1f} ms, more than {:.1f} ms'.format(args.module, total_ms, args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# Load test of the app under gunicorn : worker classes and worker counts.
+#
+# For every combination of worker class (sync, gthread, gevent) and number of
+# workers, starts `gunicorn --preload app:server` locally, replays the
+# requests of simulated users from a pool of threads and reports throughput,
+# latency percentiles, errors and the peak memory (RSS) of all gunicorn
+# processes:
+#
+#     python benchmarks/loadtest.py --worker-class sync gthread gevent --workers 1 2 4 --users 8 32 --duration 20
+#
+# Every user loads the page (/_dash-layout and /_dash-dependencies) and then
+# repeats interactions picked at random, like the browser sends them:
+#
+#   country   select another country : one combined callback
+#   typing    type a budget, "1500" sends 1, 15, 150 and 1500 (the first two are out of range, sent as None) :
+#             a combined and a world map callback per keystroke
+#   stepping  click the step arrows a few times : the same two callbacks per click
+#
+# with --think-ms between interactions (default 0 : every user sends its next
+# request as soon as the previous one is answered, which measures capacity).
+# Needs gunicorn, and gevent for the gevent worker class : without --worker-class
+# it is only measured when gevent is installed.
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from callbacks import CALLBACKS, ROOT, request_body  # noqa: E402  (also puts the repository on sys.path)
+import app  # noqa: E402
+
+WORKER_CLASSES = ['sync', 'gthread', 'gevent']
+STARTUP_TIMEOUT = 60  # seconds for gunicorn to answer its first request
+
+TYPED_BUDGETS = ['420', '580', '1170', '1500', '2500']
+MIN_BUDGET, MAX_BUDGET = 50, 2500  # min and max of the carbon-budget input
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    """Process ids of the direct children of ``pid`` (Linux /proc)."""
+    result = []
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(name)) as f:
+                    # the command name is in parentheses and may contain spaces
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        result.append(int(name))
+            except (OSError, IndexError, ValueError):
+                pass
+    return result
+
+
+def rss_kb(pid):
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Server(object):
+    """gunicorn running app:server in a subprocess, with its memory sampled in the background."""
+
+    def __init__(self, worker_class, workers, threads, env=None):
+        self.port = free_port()
+        command = [sys.executable, '-m', 'gunicorn', '--preload', '--worker-class', worker_class,
+                   '--workers', str(workers), '--bind', '127.0.0.1:{}'.format(self.port), '--log-level', 'warning']
+        if worker_class == 'gthread':
+            command += ['--threads', str(threads)]
+        self.process = subprocess.Popen(command + ['app:server'], cwd=ROOT, env=dict(os.environ, **(env or {})))
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+
+    def wait_ready(self):
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited with code {}'.format(self.process.returncode))
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/_dash-layout')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start within {} s'.format(STARTUP_TIMEOUT))
+
+    def rss_kb(self):
+        """RSS of the master and all workers (shared pages counted in every process)."""
+        return rss_kb(self.process.pid) + sum(rss_kb(pid) for pid in children(self.process.pid))
+
+    def _sample(self):
+        while not self._stop.wait(0.25):
+            self.peak_rss_kb = max(self.peak_rss_kb, self.rss_kb())
+
+    def __enter__(self):
+        self.wait_ready()
+        threading.Thread(target=self._sample, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def interactions(countries, rng):
+    """Generator of request bodies lists, one list per user interaction picked with the random.Random ``rng``."""
+    combined, world_map = CALLBACKS['combined'], CALLBACKS['combined/world-map']
+    country, budget = 'Belgium', 580
+    while True:
+        kind = rng.choice(['country', 'typing', 'stepping'])
+        if kind == 'country':
+            country = rng.choice(countries)
+            yield [request_body(*combined, country, budget)]
+        else:
+            if kind == 'typing':
+                typed = rng.choice(TYPED_BUDGETS)
+                budgets = [int(typed[:n]) for n in range(1, len(typed) + 1)]
+            else:
+                budgets = [budget + n for n in range(1, rng.randint(2, 6))]
+            for value in budgets:
+                # dcc.Input sends None for a number out of its range, the callbacks answer 204 (PreventUpdate)
+                value = value if MIN_BUDGET <= value <= MAX_BUDGET else None
+                yield [request_body(*combined, country, value), request_body(*world_map, country, value)]
+            budget = min(max(budgets[-1], MIN_BUDGET), MAX_BUDGET)
+
+
+class User(threading.Thread):
+
+    def __init__(self, port, countries, think, until, warmup_until, seed):
+        threading.Thread.__init__(self, daemon=True)
+        self.port = port
+        self.countries = countries
+        self.think = think
+        self.until = until
+        self.warmup_until = warmup_until
+        self.seed = seed
+        self.latencies = []
+        self.errors = 0
+
+    def send(self, connection, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            # 204 : PreventUpdate for the out of range budgets typed on the way
+            ok = response.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        if time.time() >= self.warmup_until:
+            if ok:
+                self.latencies.append(time.perf_counter() - start)
+            else:
+                self.errors += 1
+
+    def run(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        self.send(connection, 'GET', '/_dash-layout')
+        self.send(connection, 'GET', '/_dash-dependencies')
+        for bodies in interactions(self.countries, random.Random(self.seed)):
+            if time.time() >= self.until:
+                break
+            for body in bodies:
+                self.send(connection, 'POST', '/_dash-update-component', body)
+            if self.think:
+                time.sleep(self.think)
+        connection.close()
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else (values or [float('nan')])[0]
+
+
+def run(worker_class, workers, threads, users, duration, warmup, think, countries, env):
+    """Results of one load test as a dict."""
+    with Server(worker_class, workers, threads, env) as server:
+        idle_rss_kb = server.rss_kb()
+        start = time.time()
+        pool = [User(server.port, countries, think, start + warmup + duration, start + warmup, seed)
+                for seed in range(users)]
+        for user in pool:
+            user.start()
+        for user in pool:
+            user.join()
+        peak_rss_kb = max(server.peak_rss_kb, server.rss_kb())
+
+    latencies = [latency for user in pool for latency in user.latencies]
+    return {
+        'worker_class': worker_class, 'workers': workers, 'threads': threads if worker_class == 'gthread' else 1,
+        'users': users, 'requests': len(latencies), 'errors': sum(user.errors for user in pool),
+        'requests_per_s': len(latencies) / duration,
+        'p50_ms': 1000 * percentile(latencies, 50), 'p95_ms': 1000 * percentile(latencies, 95),
+        'p99_ms': 1000 * percentile(latencies, 99),
+        'idle_rss_mb': idle_rss_kb / 1024, 'peak_rss_mb': peak_rss_kb / 1024,
+    }
+
+
+def available_worker_classes():
+    """Worker classes whose dependencies are installed (gevent is optional)."""
+    return [name for name in WORKER_CLASSES if name != 'gevent' or importlib.util.find_spec('gevent') is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the app under gunicorn with several worker models.')
+    parser.add_argument('--worker-class', nargs='+', default=available_worker_classes(), choices=WORKER_CLASSES,
+                        help='default sync, gthread and gevent when it is installed')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker, default 4')
+    parser.add_argument('--users', type=int, nargs='+', default=[8, 32], help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per run, default 20')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds before measuring, default 3')
+    parser.add_argument('--think-ms', type=float, default=0, help='pause between interactions of a user')
+    parser.add_argument('--no-cache', action='store_true', help='FIGURE_CACHE_SIZE=0, every callback computes')
+    parser.add_argument('--env', nargs='*', default=[], metavar='NAME=VALUE', help='more settings of the app')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        parser.error('needs gunicorn (pip install gunicorn)')
+    if 'gevent' in args.worker_class:
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            parser.error('the gevent worker class needs gevent (pip install gevent)')
+
+    env = {'CALLBACK_MODE': 'combined'}
+    if args.no_cache:
+        env['FIGURE_CACHE_SIZE'] = '0'
+    env.update(setting.split('=', 1) for setting in args.env)
+
+    print('{:<10}{:>8}{:>8}{:>7}{:>10}{:>8}{:>9}{:>9}{:>9}{:>10}{:>10}'.format(
+        'class', 'workers', 'threads', 'users', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'idle MB', 'peak MB'))
+    results = []
+    for worker_class in args.worker_class:
+        for workers in args.workers:
+            for users in args.users:
+                r = run(worker_class, workers, args.threads, users, args.duration, args.warmup, args.think_ms / 1000,
+                        app.store.countries, env)
+                results.append(r)
+                print('{worker_class:<10}{workers:>8}{threads:>8}{users:>7}{requests_per_s:>10.1f}{errors:>8}'
+                      '{p50_ms:>9.1f}{p95_ms:>9.1f}{p99_ms:>9.1f}{idle_rss_mb:>10.1f}{peak_rss_mb:>10.1f}'.format(**r))
+                sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('results written to {}'.format(args.save))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
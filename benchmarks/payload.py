@@ -0,0 +1,69 @@
+# Figure payload size per country : JSON bytes of both graphs as sent to the browser.
+#
+#   legacy : explicit x lists, future x always 2020 - 2999 and the untrimmed pathway (previous figures)
+#   list   : budgets/figures.py with x0/dx and trimmed pathways
+#   typed  : the same with FIGURE_TYPED_ARRAYS=1 (base64 float32 y values), only
+#            usable with a Dash bundling plotly.js 2.28 or newer
+#
+#     python benchmarks/payload.py --budget 580 [--per-country]
+
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plotly.io.json import to_json_plotly  # noqa: E402 (same encoder as Dash)
+
+from budgets import engine, figures  # noqa: E402
+from budgets.dataset import load_store  # noqa: E402
+
+
+def legacy_figures(store, i, budget):
+    def trace(name, x, y):
+        return {'type': 'bar', 'name': name, 'x': list(x), 'y': list(y)}
+    population = round(float(store.population[i]), 2)
+    national = [trace('Historical', range(1970, 2018), store.historical[i].tolist()),
+                trace('Recent', range(2018, 2020), store.recent[i].tolist()),
+                trace('Future', range(2020, 3000),
+                      engine.linear_pathway(budget.emissions_2019, budget.slope, budget.t_depletion).tolist())]
+    personal = [trace('Recent', range(2019, 2020), [1000000 * (store.emissions(i, 2018) / population)]),
+                trace('Future', range(2020, 3000),
+                      engine.personal_pathway(budget.emissions_2019, budget.slope, budget.t_depletion, population).tolist())]
+    return {'data': national}, {'data': personal}
+
+
+def payload(figure_pair):
+    return sum(len(to_json_plotly(figure)) for figure in figure_pair)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON size of the figures for every country.')
+    parser.add_argument('--budget', type=float, default=580)
+    parser.add_argument('--per-country', action='store_true')
+    args = parser.parse_args()
+
+    store = load_store(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data.csv'))
+    sizes = {'legacy': [], 'list': [], 'typed': []}
+    for i, country in enumerate(store.countries):
+        budget = engine.compute(store, i, args.budget)
+        sizes['legacy'].append(payload(legacy_figures(store, i, budget)))
+        for name, typed in (('list', False), ('typed', True)):
+            figures.TYPED_ARRAYS = typed
+            sizes[name].append(payload((figures.national_figure(store, i, budget, country),
+                                        figures.personal_figure(store, i, budget, country))))
+        if args.per_country:
+            print('{:<45}{:>10}{:>10}{:>10}'.format(country, *(sizes[name][-1] for name in sizes)))
+
+    print('{:<10}{:>12}{:>12}{:>12}'.format('bytes', 'median', 'max', 'total'))
+    for name, values in sizes.items():
+        print('{:<10}{:>12.0f}{:>12}{:>12}'.format(name, statistics.median(values), max(values), sum(values)))
+    version = figures.plotly_js_version()
+    if version is None or version < figures.MIN_TYPED_ARRAYS_PLOTLY_JS:
+        print('typed arrays need plotly.js 2.28+, the installed Dash bundles {}'.format(
+            '.'.join(map(str, version)) if version else 'an unknown version'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Startup benchmark : time from interpreter start to a loaded dataset, and peak RSS.
+#
+# Every variant runs in a fresh interpreter, like a gunicorn worker booting:
+#
+#   csv : pandas.read_csv("data.csv") + BudgetStore.from_frame (the previous startup path)
+#   npz : budgets.dataset.load_store("data.csv"), which reads data.npz when it is up to date
+#   app : import app (layout, callbacks and dataset), requires dash
+#
+#     python benchmarks/startup.py --repeat 5
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = {
+    'csv': 'import pandas as pd\n'
+           'from budgets.store import BudgetStore\n'
+           'store = BudgetStore.from_frame(pd.read_csv("data.csv"))',
+    'npz': 'from budgets.dataset import load_store\n'
+           'store = load_store("data.csv")',
+    'app': 'import app',
+}
+
+PROBE = '''
+import json, resource, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+
+def run(code):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(code=code)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time from interpreter start to a loaded dataset.')
+    parser.add_argument('variants', nargs='*', help='any of {}, default: all'.format(', '.join(VARIANTS)))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        parser.error('unknown variant(s): {}'.format(', '.join(sorted(unknown))))
+
+    print('{:<6}{:>14}{:>14}'.format('', 'ready (ms)', 'max RSS (MB)'))
+    for name in args.variants or ['csv', 'npz', 'app']:
+        try:
+            samples = [run(VARIANTS[name]) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print('{:<6}failed: {}'.format(name, e.stderr.strip().splitlines()[-1]))
+            continue
+        print('{:<6}{:>14.1f}{:>14.1f}'.format(
+            name,
+            1000 * statistics.median(s['seconds'] for s in samples),
+            statistics.median(s['rss_mb'] for s in samples)))
+
+
+if __name__ == '__main__':
+    main()
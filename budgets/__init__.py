@@ -0,0 +1 @@
+# Data layer and budget calculations behind app.py
@@ -0,0 +1,171 @@
+# Allocation of the global budget between countries.
+#
+# Every scheme implements `country_budget_2016(store, rows, carbon_budgets)`,
+# the national budget from 2016 onwards in Mton CO2, with the same
+# broadcasting rules as engine.compute(), which takes the scheme as its
+# `allocation` argument. Schemes work on whole columns of the store, so all
+# countries are allocated in one vectorized pass.
+#
+# - equal-per-capita : the global budget shared equally per person in 2016 (Rahmstorf, the default)
+# - grandfathering : shared according to the 2016 emissions
+# - contraction-convergence : shares converge linearly from the 2016 emission shares to
+#   per capita shares by CONVERGENCE_YEAR, weighted along a linear global pathway
+# - capability : per capita shares weighted by (2016 per capita emissions) ** -CAPABILITY_EXPONENT,
+#   the dataset has no GDP so per capita emissions stand in for the capability to reduce emissions
+#
+# Population is the 2016 population implied by the total and per capita
+# emissions, as in the original formula. Aggregate rows (World) get no share.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from budgets import engine
+
+AGGREGATES = ('World',)
+
+CONVERGENCE_YEAR = 2050
+CAPABILITY_EXPONENT = 0.5
+
+
+def _national(store):
+    # rows that are countries, not aggregates
+    return np.array([country not in AGGREGATES for country in store.countries])
+
+
+def _normalized(weights, national):
+    # shares of the national rows summing to one, nan for aggregates and countries without data
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(national & np.isfinite(weights), weights, np.nan)
+        return weights / np.nansum(weights)
+
+
+def population_2016(store):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1000 * store.total_kton_CO2 / store.per_capita_CO2
+
+
+def global_budget_2016(carbon_budgets):
+    """Global budget from 2016 onwards (Mton CO2) of a 2018 budget (Gt CO2)."""
+    return (np.asarray(carbon_budgets, dtype=np.float64) + engine.EMISSIONS_2016_2017) * 1000
+
+
+class Allocation(object):
+    """Share of the global budget per country, see :meth:`shares`."""
+
+    name = ''
+    label = ''
+    tolerance = 1e-9  # allowed relative difference between the sum of the national budgets and the global budget
+
+    def shares(self, store, carbon_budgets):
+        """Fraction of the global budget of every row of ``store``, shape (countries,) + budgets shape."""
+        raise NotImplementedError
+
+    def country_budget_2016(self, store, rows, carbon_budgets):
+        """National budget from 2016 onwards (Mton CO2), for shares that do not depend on the global budget."""
+        return global_budget_2016(carbon_budgets) * self.shares(store, carbon_budgets)[rows]
+
+    def check(self, store, carbon_budgets=(50, 580, 2500)):
+        """Relative difference between the sum of the national budgets and the global budget, ValueError above tolerance."""
+        national = _national(store)
+        rows = np.flatnonzero(national)
+        carbon_budgets = np.asarray(carbon_budgets, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            budgets = self.country_budget_2016(store, rows[:, None], carbon_budgets[None, :])
+        total = np.nansum(np.where(np.isfinite(budgets), budgets, np.nan), axis=0)
+        error = np.abs(total / global_budget_2016(carbon_budgets) - 1).max()
+        if not error <= self.tolerance:
+            raise ValueError('{} : national budgets add up to {} instead of {} Mton CO2'.format(
+                self.name, total.tolist(), global_budget_2016(carbon_budgets).tolist()))
+        return error
+
+
+class EqualPerCapita(Allocation):
+    name = 'equal-per-capita'
+    label = 'Equal per capita (2016)'
+    # the original formula divides by a world population of GLOBAL_EMISSIONS / GLOBAL_PER_CAPITA_EMISSIONS
+    # (7.41 billion), slightly less than the sum over the countries in the dataset
+    tolerance = 0.01
+
+    def shares(self, store, carbon_budgets):
+        return self.country_budget_2016(store, np.arange(len(store)), 0) / global_budget_2016(0)
+
+    def country_budget_2016(self, store, rows, carbon_budgets):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return engine.country_budget_2016(store, rows, carbon_budgets)
+
+
+class Grandfathering(Allocation):
+    name = 'grandfathering'
+    label = 'Grandfathering (2016 emissions)'
+
+    def shares(self, store, carbon_budgets):
+        return _normalized(store.historical[:, -2], _national(store))
+
+
+class ContractionConvergence(Allocation):
+    name = 'contraction-convergence'
+    label = 'Contraction & convergence ({})'.format(CONVERGENCE_YEAR)
+
+    def __init__(self, convergence_year=CONVERGENCE_YEAR):
+        self.convergence_year = convergence_year
+
+    def convergence_weight(self, carbon_budgets):
+        """Weight of the per capita shares in the cumulative budget.
+
+        Yearly shares move linearly from the emission shares in 2016 to per
+        capita shares over C years; the global budget is spent along a linear
+        pathway from GLOBAL_EMISSIONS in 2016 to zero after D years. The
+        weight is the average of min(t / C, 1) along that pathway.
+        """
+        c = float(self.convergence_year - 2016)
+        d = 2 * global_budget_2016(carbon_budgets) / 1000 / engine.GLOBAL_EMISSIONS
+        before = d / (3 * c)  # depleted before convergence
+        after = (c / 2 - c ** 2 / (3 * d) + (d - c) ** 2 / (2 * d)) / (d / 2)
+        return np.where(d <= c, before, after)
+
+    def _endpoints(self, store):
+        # emission and per capita shares over the same countries, so that every mix of them sums to one
+        emissions, population = store.historical[:, -2], population_2016(store)
+        rows = _national(store) & np.isfinite(emissions) & np.isfinite(population)
+        return _normalized(emissions, rows), _normalized(population, rows)
+
+    def shares(self, store, carbon_budgets):
+        emissions, per_capita = self._endpoints(store)
+        weight = self.convergence_weight(carbon_budgets)
+        shape = (-1,) + (1,) * weight.ndim
+        return emissions.reshape(shape) + (per_capita - emissions).reshape(shape) * weight
+
+    def country_budget_2016(self, store, rows, carbon_budgets):
+        # shares are linear in the weight, so rows and budgets broadcast without a (countries x budgets) table
+        emissions, per_capita = self._endpoints(store)
+        emissions, per_capita = emissions[rows], per_capita[rows]
+        weight = self.convergence_weight(carbon_budgets)
+        return global_budget_2016(carbon_budgets) * (emissions + (per_capita - emissions) * weight)
+
+
+class CapabilityWeighted(Allocation):
+    name = 'capability'
+    label = 'Capability weighted per capita'
+
+    def __init__(self, exponent=CAPABILITY_EXPONENT):
+        self.exponent = exponent
+
+    def shares(self, store, carbon_budgets):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = population_2016(store) * store.per_capita_CO2 ** -self.exponent
+        return _normalized(weights, _national(store))
+
+
+SCHEMES = OrderedDict((scheme.name, scheme) for scheme in [
+    EqualPerCapita(), Grandfathering(), ContractionConvergence(), CapabilityWeighted()])
+
+DEFAULT = EqualPerCapita.name
+
+
+def get(name):
+    """Scheme by name, the default for None, ValueError for unknown names."""
+    try:
+        return SCHEMES[name or DEFAULT]
+    except (KeyError, TypeError):
+        raise ValueError('unknown allocation {}, choose from {}'.format(name, ', '.join(SCHEMES)))
@@ -0,0 +1,144 @@
+# Batch JSON API on the Flask server behind the Dash app.
+#
+#     GET /api/budgets?countries=Belgium;Germany&budgets=420,580,1170
+#
+# returns national budgets for every requested country and global budget,
+# computed with vectorized engine.compute() calls over chunks of countries.
+# `allocation` selects a scheme from allocation.py (default equal per capita).
+# `countries` and `budgets` may be repeated; countries are separated with ';'
+# (some names contain commas) and default to all countries. The same
+# parameters can be POSTed as JSON lists. The response is a JSON list streamed
+# in chunks of about CHUNK_ROWS rows, each computed just before it is sent, so
+# large grids are neither built in memory nor computed before the first byte;
+# `format=csv` streams the same rows as CSV. Requests of more than
+# API_MAX_ROWS (default 1000000) country x budget rows are refused.
+
+import json
+import math
+import os
+
+import numpy as np
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from budgets import allocation, engine
+
+FIELDS = ['country_budget_2016', 'remaining_2020', 'years_constant', 'years_linear']
+CHUNK_ROWS = 5000
+MAX_ROWS = int(os.environ.get('API_MAX_ROWS', 1000000))
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _body():
+    # parameters posted as a JSON object
+    body = request.get_json(silent=True)
+    if body is None:
+        return {}
+    if not isinstance(body, dict):
+        raise BadRequest('the JSON body must be an object')
+    return body
+
+
+def _values(name, separator):
+    # list from a JSON body or from (repeated) query parameters
+    if request.is_json:
+        values = _body().get(name) or []
+        if not isinstance(values, list):
+            raise BadRequest('{} must be a list'.format(name))
+        return values
+    return [value.strip() for arg in request.args.getlist(name) for value in arg.split(separator) if value.strip()]
+
+
+def parse_request(store):
+    """Row indices, country names, global budgets and allocation scheme requested, raises BadRequest."""
+    countries = _values('countries', ';') or store.countries
+    if not all(isinstance(country, str) for country in countries):
+        raise BadRequest('countries must be strings')
+    unknown = [country for country in countries if country not in store.index]
+    if unknown:
+        raise BadRequest('unknown countries: {}'.format(', '.join(map(str, unknown))))
+    values = _values('budgets', ',')
+    # numbers from a JSON body, strings from the query (float() would also take true and false)
+    if any(isinstance(budget, bool) or not isinstance(budget, (int, float, str)) for budget in values):
+        raise BadRequest('budgets must be numbers')
+    try:
+        budgets = np.array([float(budget) for budget in values], dtype=np.float64)
+    except ValueError:
+        raise BadRequest('budgets must be numbers')
+    if budgets.size == 0:
+        raise BadRequest('at least one budget is required')
+    if not np.isfinite(budgets).all():
+        raise BadRequest('budgets must be finite')
+    if len(countries) * budgets.size > MAX_ROWS:
+        raise BadRequest('{} countries x {} budgets is more than the {} rows allowed per request'.format(
+            len(countries), budgets.size, MAX_ROWS))
+    name = _body().get('allocation') if request.is_json else request.args.get('allocation')
+    try:
+        scheme = allocation.get(name)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return store.rows(countries), countries, budgets, scheme
+
+
+def _numbers(values):
+    # NaN and inf are not valid JSON
+    return [repr(value) if math.isfinite(value) else 'null' for value in values]
+
+
+def _chunks(store, rows, countries, budgets, scheme):
+    # (countries, result) for chunks of about CHUNK_ROWS rows, each computed in one vectorized pass
+    step = max(1, CHUNK_ROWS // budgets.size)
+    for start in range(0, len(rows), step):
+        yield countries[start:start + step], engine.compute(
+            store, rows[start:start + step, None], budgets[None, :], scheme)
+
+
+def _json_rows(budgets, chunks):
+    row = '{"country":%s,"carbon_budget":%s,' + ','.join('"{}":%s'.format(field) for field in FIELDS) + '}'
+    budgets = _numbers(budgets.tolist())
+    yield '['
+    separator = ''
+    for countries, result in chunks:
+        chunk = []
+        for n, country in enumerate(countries):
+            name = json.dumps(country)
+            columns = [_numbers(getattr(result, field)[n].tolist()) for field in FIELDS]
+            chunk.extend(row % ((name, budget) + tuple(values)) for budget, *values in zip(budgets, *columns))
+        yield separator + ','.join(chunk)
+        separator = ','
+    yield ']'
+
+
+def _csv_rows(budgets, chunks):
+    budgets = [repr(budget) for budget in budgets.tolist()]
+    yield ','.join(['country', 'carbon_budget'] + FIELDS) + '\n'
+    for countries, result in chunks:
+        chunk = []
+        for n, country in enumerate(countries):
+            name = '"{}"'.format(country.replace('"', '""'))
+            columns = [[repr(value) for value in getattr(result, field)[n].tolist()] for field in FIELDS]
+            chunk.extend(','.join((name, budget) + tuple(values)) + '\n'
+                         for budget, *values in zip(budgets, *columns))
+        yield ''.join(chunk)
+
+
+def create_blueprint(get_store):
+    """Blueprint serving /api/budgets from the store returned by ``get_store()``."""
+    api = Blueprint('api', __name__, url_prefix='/api')
+
+    @api.route('/budgets', methods=['GET', 'POST'])
+    def budgets():
+        store = get_store()
+        try:
+            rows, countries, carbon_budgets, scheme = parse_request(store)
+        except BadRequest as e:
+            return jsonify(error=str(e)), 400
+
+        chunks = _chunks(store, rows, countries, carbon_budgets, scheme)
+        if request.args.get('format') == 'csv':
+            return Response(stream_with_context(_csv_rows(carbon_budgets, chunks)), mimetype='text/csv')
+        return Response(stream_with_context(_json_rows(carbon_budgets, chunks)), mimetype='application/json')
+
+    return api
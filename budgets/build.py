@@ -0,0 +1,152 @@
+# Offline build of data.csv and data.npz from the raw source files.
+#
+# The dataset used to be assembled in a Google Sheet and exported by hand
+# (see app-other/app-old-190929.py). This rebuilds it from the raw downloads:
+#
+# - EDGAR fossil CO2 emissions (kton CO2), a CSV with a country column and one
+#   column per year, optionally split in several rows per country (one per
+#   sector or substance), which are added up
+# - World Bank population (SP.POP.TOTL), the CSV of the World Bank download
+#   with its 4 lines of metadata before the header
+# - optionally a CSV mapping names (country,edgar,worldbank) for countries
+#   whose names differ between the sources; other countries are joined by name
+#
+#     python -m budgets.build edgar.csv population.csv --names names.csv --output data.csv
+#
+# writes data.csv (and data.npz, see dataset.py) with the columns read by the
+# app: emissions 1970 - 2017 in Mton CO2, capita_1990 - capita_2017 (t CO2 per
+# person), the 2016 population, total_kton_CO2 and per_capita_CO2 of 2016 and
+# 2018 / 2019 copied from 2017. Per capita values are derived from the same
+# EDGAR emissions and World Bank population, so they are consistent with each
+# other.
+#
+# The yearly emissions match the sheet export, but its total_kton_CO2,
+# per_capita_CO2 and capita_* columns do not : they came from other sources
+# (for Belgium 94722.81 kton and 8.31 t in the sheet, 104320 kton and 9.21 t
+# from EDGAR 2016). As the equal per capita allocation uses their ratio as the
+# population, national budgets of a rebuilt dataset differ slightly.
+#
+# The inputs are streamed in chunks and every column is computed for all
+# countries at once; countries are sorted and numbers written with fixed
+# rounding, so the same inputs always give byte-identical files.
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from budgets import engine, reload
+from budgets.dataset import default_npz_path, file_sha1, write_npz
+from budgets.store import HISTORICAL_YEARS, PER_CAPITA_YEARS, RECENT_YEARS, BudgetStore
+
+EDGAR_COUNTRY = 'Name'
+POPULATION_COUNTRY = 'Country Name'
+POPULATION_SKIPROWS = 4  # metadata lines before the header of World Bank downloads
+POPULATION_YEAR = 2016  # year of the population, total_kton_CO2 and per_capita_CO2 columns
+
+CHUNKSIZE = 100000  # rows per chunk when reading the raw files
+
+# budget of the legacy country_budget_mton_CO2 and budget_reach_years_from_2016 columns of the sheet (Gt CO2 from 2018)
+SHEET_BUDGET = 580
+
+DECIMALS = 2
+
+
+def read_years(path, country_column, years, chunksize=CHUNKSIZE, year_prefix='', **read_csv):
+    """Sum of the year columns per country (rows of the same country added up), columns are the years as int."""
+    columns = {year_prefix + str(year): year for year in years}
+    totals = []
+    for chunk in pd.read_csv(path, usecols=[country_column] + list(columns), chunksize=chunksize,
+                             dtype={country_column: str}, **read_csv):
+        values = chunk[list(columns)].apply(pd.to_numeric, errors='coerce')
+        # min_count : a country without any value in a year stays missing instead of 0
+        totals.append(values.groupby(chunk[country_column].str.strip()).sum(min_count=1))
+    return pd.concat(totals).groupby(level=0).sum(min_count=1).rename(columns=columns)
+
+
+def read_names(path):
+    """(EDGAR name -> country, World Bank name -> country) from a CSV with country,edgar,worldbank columns."""
+    if path is None:
+        return {}, {}
+    names = pd.read_csv(path, dtype=str).fillna('')
+    edgar = names[names['edgar'] != '']
+    worldbank = names[names['worldbank'] != '']
+    return dict(zip(edgar['edgar'], edgar['country'])), dict(zip(worldbank['worldbank'], worldbank['country']))
+
+
+def build_frame(emissions, population):
+    """data.csv as a DataFrame from emissions (kton CO2) and population per country and year."""
+    emissions = emissions / 1000  # Mton CO2
+    countries = sorted(set(emissions.index) & set(population.index))
+    emissions = emissions.reindex(countries)
+    population = population.reindex(countries)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # t CO2 per person : Mton * 1e6 / persons, missing where the population is 0 or unknown
+        per_capita = 1e6 * emissions[PER_CAPITA_YEARS] / population[PER_CAPITA_YEARS].where(population[PER_CAPITA_YEARS] > 0)
+    emissions = emissions.round(DECIMALS)
+    per_capita = per_capita.round(DECIMALS)
+
+    frame = pd.DataFrame({'country': countries})
+    frame['total_kton_CO2'] = (1000 * emissions[POPULATION_YEAR]).round(DECIMALS).to_numpy()
+    frame['per_capita_CO2'] = per_capita[POPULATION_YEAR].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        country_budget = ((SHEET_BUDGET + engine.EMISSIONS_2016_2017) * frame['total_kton_CO2'] / frame['per_capita_CO2']
+                          / engine.GLOBAL_EMISSIONS * engine.GLOBAL_PER_CAPITA_EMISSIONS / 1000)
+    frame['country_budget_mton_CO2'] = country_budget.round(1).where(np.isfinite(country_budget))
+    frame['budget_reach_years_from_2016'] = (1000 * frame['country_budget_mton_CO2'] / frame['total_kton_CO2']).round(1)
+    years = pd.DataFrame(emissions[HISTORICAL_YEARS].to_numpy(), columns=[str(year) for year in HISTORICAL_YEARS])
+    capita = pd.DataFrame(per_capita.to_numpy(), columns=['capita_{}'.format(year) for year in PER_CAPITA_YEARS])
+    frame = pd.concat([frame, years, capita], axis=1)
+    frame['population'] = population[POPULATION_YEAR].round().astype('Int64').to_numpy()
+    for year in RECENT_YEARS:  # no data after 2017 : assumed equal to 2017
+        frame[str(year)] = frame[str(HISTORICAL_YEARS[-1])]
+    return frame.replace([np.inf, -np.inf], np.nan)
+
+
+def build(edgar_path, population_path, output='data.csv', names_path=None, chunksize=CHUNKSIZE, edgar_year_prefix=''):
+    """Write ``output`` and its .npz copy from the raw files, returns the BudgetStore."""
+    edgar_names, worldbank_names = read_names(names_path)
+    emissions = read_years(edgar_path, EDGAR_COUNTRY, HISTORICAL_YEARS, chunksize, edgar_year_prefix)
+    population = read_years(population_path, POPULATION_COUNTRY, PER_CAPITA_YEARS, chunksize,
+                            skiprows=POPULATION_SKIPROWS)
+    emissions = emissions.rename(index=edgar_names).groupby(level=0).sum(min_count=1)
+    population = population.rename(index=worldbank_names).groupby(level=0).sum(min_count=1)
+
+    frame = build_frame(emissions, population)
+
+    # written next to the outputs and renamed once valid, so a running app (DATA_RELOAD_INTERVAL) never reads
+    # a partial or invalid dataset
+    npz_path = default_npz_path(output)
+    frame.to_csv(output + '.tmp', index=False, float_format='%.10g', lineterminator='\n', encoding='utf-8')
+    store = BudgetStore.from_csv(output + '.tmp')
+    reload.validate(store)
+    write_npz(npz_path + '.tmp', store, file_sha1(output + '.tmp'))
+    os.replace(output + '.tmp', output)
+    os.replace(npz_path + '.tmp', npz_path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the dataset from raw EDGAR emissions and World Bank population.')
+    parser.add_argument('edgar', help='EDGAR fossil CO2 emissions per country and year (kton CO2), CSV')
+    parser.add_argument('population', help='World Bank population download (SP.POP.TOTL), CSV')
+    parser.add_argument('--names', help='CSV with country,edgar,worldbank columns for names that differ')
+    parser.add_argument('--output', default='data.csv', help='dataset to write, default data.csv (and data.npz)')
+    parser.add_argument('--edgar-year-prefix', default='', help='prefix of the EDGAR year columns, e.g. Y_')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='rows read at once')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = build(args.edgar, args.population, args.output, args.names, args.chunksize, args.edgar_year_prefix)
+    print('{} countries in {:.2f} s : {} ({:.1f} kB), {}'.format(
+        len(store), time.perf_counter() - start, args.output, os.path.getsize(args.output) / 1e3,
+        default_npz_path(args.output)))
+    print('note : total_kton_CO2, per_capita_CO2 and capita_* are derived from the EDGAR emissions and World Bank '
+          'population and differ from the sheet values of the original data.csv')
+
+
+if __name__ == '__main__':
+    main()
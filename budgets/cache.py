@@ -0,0 +1,208 @@
+# Bounded memoization for callback outputs.
+#
+# The inputs of the app are a country name and an integer global budget
+# (50 - 2500), so the same outputs are requested over and over. LRUCache keeps
+# the most recently used results in memory per worker; an optional FileBackend
+# (point it at /dev/shm for a shared-memory cache) lets gunicorn workers reuse
+# each other's results. The directory is bounded : every PRUNE_EVERY writes
+# of a process, the least recently used files are removed until it is back
+# under 90 % of its maximum number of files and bytes.
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+MAX_FILES = 20000
+MAX_BYTES = 256 * 1024 * 1024
+PRUNE_EVERY = 100  # writes between two scans of the directory
+PRUNE_TO = 0.9  # fraction of the limits kept by a scan
+
+
+class FileBackend(object):
+    """Pickled values in a directory, one file per key, shared between processes.
+
+    The directory holds at most ``max_files`` files and ``max_bytes`` bytes,
+    give or take the ``prune_every`` writes of every process between two
+    scans. The files used least recently (modification time, refreshed on
+    reads) are removed first.
+    """
+
+    def __init__(self, directory, max_files=MAX_FILES, max_bytes=MAX_BYTES, prune_every=PRUNE_EVERY):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.prune()  # files left by a previous run with higher limits
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.pkl')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISSING
+        try:
+            os.utime(path)  # recently used, pruned last
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        # write to a temporary file first so readers never see a partial pickle
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except (OSError, pickle.PicklingError):  # the in-memory cache still holds the value
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def _files(self):
+        # (mtime, size, path) of the cached values, oldest first
+        files = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except OSError:  # removed by another process meanwhile
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        files.sort()
+        return files
+
+    def prune(self):
+        """Remove the least recently used files when the directory is over one of its limits, returns the count."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if len(files) <= self.max_files and total <= self.max_bytes:
+            return 0
+        count, removed = len(files), 0
+        for _, size, path in files:
+            if count <= PRUNE_TO * self.max_files and total <= PRUNE_TO * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:  # already removed by another process
+                pass
+            count -= 1
+            total -= size
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class LRUCache(object):
+    """Thread-safe least-recently-used cache with hit, miss and eviction counters.
+
+    Values missing from memory are looked up in ``backend`` (if any) before
+    being computed; computed values are written to both.
+    """
+
+    def __init__(self, maxsize=1024, backend=None):
+        self.maxsize = maxsize
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = threading.local()  # per-thread counters, see thread_counts()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        value = self._get(key)
+        if value is MISSING:
+            self._thread.misses = getattr(self._thread, 'misses', 0) + 1
+        else:
+            self._thread.hits = getattr(self._thread, 'hits', 0) + 1
+        return value
+
+    def _get(self, key):
+        with self._lock:
+            value = self._data.get(key, MISSING)
+            if value is not MISSING:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def thread_counts(self):
+        """(hits, misses) of lookups made by the calling thread, to attribute them to the request it serves."""
+        return getattr(self._thread, 'hits', 0), getattr(self._thread, 'misses', 0)
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``, calling ``compute()`` on a miss."""
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses,
+                     'evictions': self.evictions, 'size': len(self._data), 'maxsize': self.maxsize}
+        if self.backend is not None:
+            stats['file_evictions'] = self.backend.evictions
+        return stats
@@ -0,0 +1,133 @@
+# Data for the clientside callback (assets/budgets.js) and a parity check against the Python engine.
+#
+# With CALLBACK_MODE=clientside the dataset is shipped once in a dcc.Store and
+# budgets are computed in the browser. The Python engine stays the reference:
+#
+#     python -m budgets.clientside data.csv
+#
+# runs assets/budgets.js with node for every country and a sweep of budgets and
+# compares its outputs with budgets/figures.py. tests/test_clientside.py runs
+# the same comparison (skipped when node is not installed).
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from budgets import engine, figures, nowcast
+from budgets.store import BudgetStore
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'budgets.js')
+
+
+def _list(values):
+    # NaN is not valid JSON, missing values are sent as null
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def store_data(store):
+    """Payload of the `country-data` dcc.Store : everything budgets.js needs, about 60 kB of JSON."""
+    return {
+        'index': store.index,
+        'historical': _list(store.historical),
+        'recent': _list(store.recent),
+        'population': _list(store.population),
+        'total_kton_CO2': _list(store.total_kton_CO2),
+        'per_capita_CO2': _list(store.per_capita_CO2),
+        'nowcast': store.nowcast,
+        'constants': {
+            'GLOBAL_EMISSIONS': engine.GLOBAL_EMISSIONS,
+            'GLOBAL_PER_CAPITA_EMISSIONS': engine.GLOBAL_PER_CAPITA_EMISSIONS,
+            'EMISSIONS_2016_2017': engine.EMISSIONS_2016_2017,
+        },
+    }
+
+
+def python_outputs(store, selected_country, carbon_budget):
+    """Outputs of the server side callbacks, converted to plain JSON like Dash sends them."""
+    i = store.row(selected_country)
+    budget = engine.compute(store, i, carbon_budget)
+    outputs = (figures.national_figure(store, i, budget, selected_country),
+               figures.personal_figure(store, i, budget, selected_country),
+               figures.worldwide_reach_text(carbon_budget),
+               figures.country_text(budget, recent=store.recent[i] if store.nowcast else None))
+    return json.loads(json.dumps(outputs, default=lambda o: o.to_plotly_json()))
+
+
+def node_outputs(data, cases):
+    """Run assets/budgets.js in node for a list of (country, budget) cases."""
+    program = '''
+        global.window = {dash_clientside: {}};
+        require(%s);
+        const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+        const update = window.dash_clientside.budgets.update;
+        process.stdout.write(JSON.stringify(input.cases.map(c => update(c[0], c[1], input.data))));
+    ''' % json.dumps(SCRIPT)
+    result = subprocess.run(['node', '-e', program], input=json.dumps({'data': data, 'cases': cases}),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def _differences(expected, actual, path=''):
+    # numbers are compared with a relative tolerance, strings in texts as displayed numbers
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        expected = {k: v for k, v in expected.items() if k != 'namespace'}
+        actual = {k: v for k, v in actual.items() if k != 'namespace'}
+        if set(expected) != set(actual):
+            return [(path, sorted(expected), sorted(actual))]
+        return [d for key in expected for d in _differences(expected[key], actual[key], path + '/' + str(key))]
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [(path, 'length {}'.format(len(expected)), 'length {}'.format(len(actual)))]
+        return [d for n, (e, a) in enumerate(zip(expected, actual)) for d in _differences(e, a, path + '/' + str(n))]
+    if isinstance(expected, str) and isinstance(actual, str):
+        try:
+            expected, actual = float(expected), float(actual)
+            if math.isclose(expected, actual, abs_tol=0.0100001) or (math.isnan(expected) and math.isnan(actual)):
+                return []
+            return [(path, expected, actual)]
+        except ValueError:
+            return [] if expected == actual else [(path, expected, actual)]
+    if isinstance(expected, float) and math.isnan(expected) and actual is None:
+        return []
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return [] if math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9) else [(path, expected, actual)]
+    return [] if expected == actual else [(path, expected, actual)]
+
+
+def compare(store, budgets):
+    """(country, budget, differences) of every case where budgets.js and the Python engine disagree, and the case count."""
+    typed, figures.TYPED_ARRAYS = figures.TYPED_ARRAYS, False  # budgets.js sends plain lists
+    try:
+        cases = [(country, budget) for country in store.countries for budget in budgets]
+        actual = node_outputs(store_data(store), cases)
+        failures = []
+        for (country, budget), js in zip(cases, actual):
+            differences = _differences(python_outputs(store, country, budget), js)
+            if differences:
+                failures.append((country, budget, differences))
+        return failures, len(cases)
+    finally:
+        figures.TYPED_ARRAYS = typed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check assets/budgets.js against the Python engine.')
+    parser.add_argument('data', nargs='?', default='data.csv', help='dataset, default data.csv')
+    parser.add_argument('--budgets', type=int, nargs='+', default=[50, 420, 580, 1170, 1500, 2500])
+    args = parser.parse_args()
+
+    store = nowcast.apply(BudgetStore.from_csv(args.data))  # NOWCAST, like the app
+    failures, count = compare(store, args.budgets)
+    for country, budget, differences in failures:
+        print('{} / {} : {}'.format(country, budget, differences[:3]))
+    print('{} of {} cases differ'.format(len(failures), count))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Server side coalescing of callback requests from the same browser session.
+#
+# Typing "1500" in the carbon budget input sends a request for 1, 15, 150 and
+# 1500. Every page load gets a session id (a dcc.Store in the layout) and every
+# request of a session increments a generation counter per callback. A request
+# waits `window` seconds before computing and is dropped (PreventUpdate) when a
+# newer request of the same session and callback arrived in the meantime, so
+# only the last value of a burst is computed. A result that is superseded while
+# it is being computed is dropped as well instead of being sent.
+#
+# Generations are kept per worker process, in a bounded LRU of sessions. With
+# several gunicorn workers, requests of one session can land on different
+# workers and are then not coalesced with each other; threaded workers
+# (gthread) coalesce best.
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from dash.exceptions import PreventUpdate
+
+
+class Coalescer(object):
+    """Generation counters per (session, callback), the newest request of a burst wins."""
+
+    def __init__(self, window=0.15, max_sessions=10000):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.dropped = 0
+        self._generations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """Generation of a new request for ``key``, superseding the ones in flight."""
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.max_sessions:
+                self._generations.popitem(last=False)
+            return generation
+
+    def is_current(self, key, generation):
+        with self._lock:
+            # a key evicted from the LRU cannot be compared any more, let the request through
+            return self._generations.get(key, generation) == generation
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+        raise PreventUpdate
+
+    def wrap(self, name, func):
+        """``func`` taking the session id as an extra last argument, coalesced per session for callback ``name``."""
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            *args, session_id = args
+            if session_id is None:  # no session store (e.g. an old page), nothing to coalesce with
+                return func(*args)
+            key = (session_id, name)
+            generation = self.begin(key)
+            if self.window > 0:
+                time.sleep(self.window)
+            if not self.is_current(key, generation):
+                self._drop()
+            result = func(*args)
+            if not self.is_current(key, generation):
+                self._drop()
+            return result
+
+        return wrapper
@@ -0,0 +1,89 @@
+# Compact binary copy of data.csv and the loader used at startup.
+#
+# data.csv is ~1,000 columns wide, but everything from 2020 onwards is empty
+# and only the fields of BudgetStore are used. `convert` writes those fields as
+# a .npz (plain numpy arrays, no type inference, no pandas) with the SHA-1 of
+# the CSV it was built from, byte for byte reproducible; `load_store` uses it
+# when it matches the CSV and falls back to parsing the CSV otherwise.
+#
+#     python -m budgets.dataset data.csv data.npz
+
+import argparse
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+
+from budgets.store import BudgetStore
+
+ARRAYS = ['historical', 'per_capita', 'recent', 'population', 'total_kton_CO2', 'per_capita_CO2']
+
+
+def file_sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def write_npz(path, store, source_sha1=''):
+    """Same layout as np.savez_compressed, with fixed timestamps so the same dataset always gives the same bytes."""
+    arrays = dict(countries=np.array(store.countries), source_sha1=np.array(source_sha1),
+                  **{name: getattr(store, name) for name in ARRAYS})
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as npz:
+        for name, values in arrays.items():
+            info = zipfile.ZipInfo(name + '.npy', date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with npz.open(info, 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(values), allow_pickle=False)
+
+
+def read_npz(path):
+    """BudgetStore and SHA-1 of the source CSV from a file written by :func:`write_npz`."""
+    with np.load(path, allow_pickle=False) as npz:
+        arrays = {}
+        for name in ARRAYS:
+            values = np.ascontiguousarray(npz[name])
+            values.flags.writeable = False
+            arrays[name] = values
+        return BudgetStore(npz['countries'].tolist(), **arrays), str(npz['source_sha1'])
+
+
+def convert(csv_path, npz_path):
+    store = BudgetStore.from_csv(csv_path)
+    write_npz(npz_path, store, file_sha1(csv_path))
+    return store
+
+
+def dataset_version(csv_path, npz_path=None):
+    """SHA-1 of the dataset file, the CSV or else its binary copy."""
+    return file_sha1(csv_path if os.path.exists(csv_path) else npz_path or default_npz_path(csv_path))
+
+
+def default_npz_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.npz'
+
+
+def load_store(csv_path, npz_path=None):
+    """Load the dataset, preferring the binary copy next to ``csv_path`` when it is up to date."""
+    npz_path = npz_path or default_npz_path(csv_path)
+    if os.path.exists(npz_path):
+        store, source_sha1 = read_npz(npz_path)
+        if not os.path.exists(csv_path) or source_sha1 == file_sha1(csv_path):
+            return store
+    return BudgetStore.from_csv(csv_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the dataset CSV to the binary format loaded at startup.')
+    parser.add_argument('csv', nargs='?', default='data.csv')
+    parser.add_argument('npz', nargs='?', help='output file, default: the CSV path with a .npz extension')
+    args = parser.parse_args()
+
+    npz_path = args.npz or default_npz_path(args.csv)
+    store = convert(args.csv, npz_path)
+    print('{} countries, {:.1f} kB -> {:.1f} kB'.format(
+        len(store), os.path.getsize(args.csv) / 1e3, os.path.getsize(npz_path) / 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Budget engine : national carbon budgets following Rahmstorf's method.
+#
+# All functions are pure and work on numpy arrays. `rows` (row indices into a
+# BudgetStore, see store.py) and `carbon_budgets` (global 2018 budgets in Gt
+# CO2) are broadcast against each other, so the same call computes a single
+# country/budget pair for a callback or the full country x budget grid for a
+# batch job.
+
+from collections import namedtuple
+
+import numpy as np
+
+GLOBAL_EMISSIONS = 40  # global emissions in 2016 (Gt CO2)
+GLOBAL_PER_CAPITA_EMISSIONS = 5.4  # global per capita emissions in 2016 (t CO2)
+EMISSIONS_2016_2017 = 80  # global emissions of 2016 and 2017, added to the 2018 budget (Gt CO2)
+
+Budgets = namedtuple('Budgets', [
+    'country_budget_2016',  # national share of the global budget from 2016 onwards (Mton CO2)
+    'emissions_2017',  # latest EDGAR emissions (Mton CO2)
+    'emissions_2019',  # starting point of the future pathway, rounded (Mton CO2)
+    'remaining_2019',  # national budget left from 2019 onwards, rounded (Mton CO2)
+    'remaining_2020',  # national budget left from 2020 onwards (Mton CO2)
+    'years_constant',  # years left from 2020 at constant emissions
+    'slope',  # yearly decrease of a linear pathway from 2019 (Mton CO2 / year)
+    't_depletion',  # years until a linear pathway from 2019 reaches zero
+    'years_linear',  # years left from 2020 when linearly decreasing emissions
+])
+
+
+def global_reach(carbon_budgets):
+    """Years of constant worldwide emissions covered by the budget, from 2016 and from 2020."""
+    reach_2016 = (np.asarray(carbon_budgets) + EMISSIONS_2016_2017) / GLOBAL_EMISSIONS
+    return reach_2016, reach_2016 - 4
+
+
+def country_budget_2016(store, rows, carbon_budgets):
+    """National budget from 2016 onwards, the global budget shared equally per capita in 2016."""
+    return ((np.asarray(carbon_budgets) + EMISSIONS_2016_2017)
+            * store.total_kton_CO2[rows]
+            / store.per_capita_CO2[rows]
+            / GLOBAL_EMISSIONS
+            * GLOBAL_PER_CAPITA_EMISSIONS
+            / 1000)
+
+
+def compute(store, rows, carbon_budgets, allocation=None):
+    """Compute every derived budget quantity in one broadcast pass.
+
+    ``rows`` and ``carbon_budgets`` may be scalars or arrays of any shapes that
+    broadcast together; use :func:`grid` for the full country x budget table.
+    ``allocation`` is a scheme from allocation.py, by default the global budget
+    is shared equally per capita (:func:`country_budget_2016`).
+    Countries with zero emissions or zero per capita emissions give inf/nan.
+    """
+    rows = np.asarray(rows)
+    allocate = allocation.country_budget_2016 if allocation is not None else country_budget_2016
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return from_budget_2016(allocate(store, rows, carbon_budgets),
+                                store.historical[rows, -2], store.historical[rows, -1],
+                                store.recent[rows, 0], store.recent[rows, 1])
+
+
+def from_budget_2016(budget_2016, emissions_2016, emissions_2017, emissions_2018, emissions_2019):
+    """Budgets left after the 2016 - 2019 emissions, for any broadcastable arrays of national budgets and emissions."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining_2019 = np.round(budget_2016 - (emissions_2016 + emissions_2017 + emissions_2018), 2)
+        remaining_2020 = budget_2016 - (emissions_2016 + emissions_2017 + emissions_2018 + emissions_2019)
+
+        # linear decrease from 2019 until depletion, solving
+        #   budget = emissions * t / 2   and   emissions = slope * t
+        start = np.round(emissions_2019, 2)
+        slope = start ** 2 / (2 * remaining_2019)
+        t_depletion = start / slope
+
+        shape = np.broadcast(budget_2016, remaining_2020).shape
+        return Budgets(
+            country_budget_2016=np.broadcast_to(budget_2016, shape),
+            emissions_2017=np.broadcast_to(emissions_2017, shape),
+            emissions_2019=np.broadcast_to(start, shape),
+            remaining_2019=remaining_2019,
+            remaining_2020=remaining_2020,
+            years_constant=remaining_2020 / emissions_2019,
+            slope=slope,
+            t_depletion=t_depletion,
+            years_linear=t_depletion - 1,
+        )
+
+
+def grid(store, carbon_budgets, rows=None, allocation=None):
+    """All countries (or ``rows``) x all ``carbon_budgets``, arrays of shape (countries, budgets)."""
+    if rows is None:
+        rows = np.arange(len(store))
+    return compute(store, np.asarray(rows)[:, None], np.asarray(carbon_budgets)[None, :], allocation)
+
+
+def linear_pathway(emissions_2019, slope, t_depletion):
+    """Yearly national emissions from 2020 onwards for a linear decrease until depletion."""
+    if not np.isfinite(t_depletion):
+        return np.empty(0)
+    t = np.arange(1, int(t_depletion), dtype=np.float64)
+    return round(float(emissions_2019), 2) - round(float(slope), 2) * t
+
+
+def personal_pathway(emissions_2019, slope, t_depletion, population):
+    """Yearly emissions per person (t CO2) from 2020 onwards for the same linear decrease."""
+    if not np.isfinite(t_depletion):
+        return np.empty(0)
+    population = round(float(population), 2)
+    t = np.arange(1, int(t_depletion), dtype=np.float64)
+    return (1000000 * (round(float(emissions_2019), 2) / population)) - (1000000 * ((round(float(slope), 2) / population) * t))
+
+
+def linear_pathways(emissions_2019, slope, t_depletion, years):
+    """Linear pathways of several countries, shape (countries, years) from 2020, nan once the budget is depleted."""
+    start = np.round(np.asarray(emissions_2019, dtype=np.float64), 2)[:, None]
+    slope = np.round(np.asarray(slope, dtype=np.float64), 2)[:, None]
+    t = np.arange(1, years + 1, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        # like linear_pathway : t = 1 .. int(t_depletion) - 1
+        return np.where(t < np.trunc(np.asarray(t_depletion, dtype=np.float64))[:, None], start - slope * t, np.nan)
+
+
+def personal_pathways(emissions_2019, slope, t_depletion, population, years):
+    """Per person pathways of several countries (t CO2), shape (countries, years) from 2020, nan once depleted."""
+    population = np.round(np.asarray(population, dtype=np.float64), 2)[:, None]
+    start = np.round(np.asarray(emissions_2019, dtype=np.float64), 2)[:, None]
+    slope = np.round(np.asarray(slope, dtype=np.float64), 2)[:, None]
+    t = np.arange(1, years + 1, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = (1000000 * (start / population)) - (1000000 * ((slope / population) * t))
+        return np.where(t < np.trunc(np.asarray(t_depletion, dtype=np.float64))[:, None], values, np.nan)
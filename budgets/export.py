@@ -0,0 +1,154 @@
+# Static export of the country pages for a set of canonical global budgets.
+#
+# Most visitors look at a few countries with the default budget. This renders,
+# for every country and budget, the outputs of the app with the same figure
+# builders:
+#
+#     <output>/<country>/<budget>.json   the four callback outputs, as Dash sends them
+#     <output>/<country>/<budget>.html   a standalone page drawing both figures with plotly.js
+#     <output>/index.html                links to every page
+#     <output>/countries.json            country name -> directory
+#
+# so these requests can be served from static storage or a CDN without any
+# Python work. Countries are rendered in parallel with a process pool:
+#
+#     python -m budgets.export data.csv static_export --budgets 420 580 1170 1500
+
+import argparse
+import html as html_escape
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from plotly.io.json import to_json_plotly
+
+from budgets import engine, figures
+from budgets.dataset import load_store
+
+# IPCC SR1.5 budgets from 2018 : 1.5 °C with 66 % / 50 % and 2 °C with 66 % / 50 % probability
+CANONICAL_BUDGETS = [420, 580, 1170, 1500]
+
+PLOTLY_JS = 'https://cdn.plot.ly/plotly-2.29.1.min.js'  # typed arrays (FIGURE_TYPED_ARRAYS=1) need 2.28+
+
+PAGE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Carbon Emission Budget Calculator : {country}, {budget} Gt CO2</title>
+<link rel="stylesheet" href="https://codepen.io/chriddyp/pen/bWLwgP.css">
+<script src="{plotly_js}"></script>
+</head>
+<body>
+<h1>Carbon Emission Budget Calculator</h1>
+<h2>{country}, global carbon budget of {budget} Gt CO2 from 2018</h2>
+<p>{worldwide_reach}</p>
+<p>{country_text}</p>
+<div id="emissions-graph"></div>
+<div id="emissions-graph-personal"></div>
+<script>
+var outputs = {outputs};
+Plotly.newPlot('emissions-graph', outputs[0].data, outputs[0].layout);
+Plotly.newPlot('emissions-graph-personal', outputs[1].data, outputs[1].layout);
+</script>
+</body>
+</html>
+'''
+
+_store = None
+
+
+def slug(country):
+    """File system and URL safe directory name of a country."""
+    ascii_name = unicodedata.normalize('NFKD', country).encode('ascii', 'ignore').decode('ascii')
+    return re.sub('[^a-z0-9]+', '-', ascii_name.lower()).strip('-')
+
+
+def _text_html(children):
+    # list of strings and html.Span (bold numbers) from figures.py as HTML
+    parts = []
+    for child in children:
+        if isinstance(child, str):
+            parts.append(html_escape.escape(' '.join(child.split())))
+        else:
+            parts.append('<b>{}</b>'.format(html_escape.escape(str(child.children))))
+    return ' '.join(parts)
+
+
+def render(store, i, carbon_budget):
+    """JSON outputs and HTML page of country row ``i`` for one global budget."""
+    country = store.countries[i]
+    budget = engine.compute(store, i, carbon_budget)
+    outputs = (figures.national_figure(store, i, budget, country),
+               figures.personal_figure(store, i, budget, country),
+               figures.worldwide_reach_text(carbon_budget),
+               figures.country_text(budget))
+    outputs_json = to_json_plotly(outputs)  # same encoder as Dash : NaN as null, components as dicts
+    page = PAGE.format(country=html_escape.escape(country), budget=carbon_budget, plotly_js=PLOTLY_JS,
+                       worldwide_reach=_text_html(outputs[2]), country_text=_text_html(outputs[3]),
+                       outputs=outputs_json.replace('</', '<\\/'))
+    return outputs_json, page
+
+
+def _init_worker(csv_path):
+    global _store
+    _store = load_store(csv_path)
+
+
+def _export_country(args):
+    # runs in a worker process : every budget of one country
+    i, budgets, directory = args
+    os.makedirs(directory, exist_ok=True)
+    size = 0
+    for carbon_budget in budgets:
+        outputs_json, page = render(_store, i, carbon_budget)
+        for extension, content in (('.json', outputs_json), ('.html', page)):
+            path = os.path.join(directory, '{}{}'.format(carbon_budget, extension))
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            size += len(content.encode('utf-8'))
+    return size
+
+
+def export(csv_path, output, budgets=CANONICAL_BUDGETS, workers=None):
+    """Write the pages of every country and budget to ``output``, returns (number of files, bytes)."""
+    store = load_store(csv_path)
+    slugs = [slug(country) for country in store.countries]
+    if len(set(slugs)) != len(slugs):
+        raise ValueError('countries with the same directory name: {}'.format(
+            sorted({s for s in slugs if slugs.count(s) > 1})))
+
+    os.makedirs(output, exist_ok=True)
+    tasks = [(i, budgets, os.path.join(output, s)) for i, s in enumerate(slugs)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(csv_path,)) as pool:
+        size = sum(pool.map(_export_country, tasks, chunksize=8))
+
+    with open(os.path.join(output, 'countries.json'), 'w', encoding='utf-8') as f:
+        json.dump(dict(zip(store.countries, slugs)), f, indent=1, ensure_ascii=False)
+    links = '\n'.join('<li>{} : {}</li>'.format(
+        html_escape.escape(country),
+        ', '.join('<a href="{}/{}.html">{}</a>'.format(s, b, b) for b in budgets))
+        for country, s in zip(store.countries, slugs))
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<meta charset="utf-8">\n<title>Carbon Emission Budget Calculator</title>\n'
+                '<h1>Carbon Emission Budget Calculator</h1>\n<ul>\n{}\n</ul>\n'.format(links))
+    return 2 * len(tasks) * len(budgets) + 2, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render static pages for every country and canonical budget.')
+    parser.add_argument('data', nargs='?', default='data.csv', help='dataset, default data.csv')
+    parser.add_argument('output', nargs='?', default='static_export', help='output directory, default static_export')
+    parser.add_argument('--budgets', type=int, nargs='+', default=CANONICAL_BUDGETS)
+    parser.add_argument('--workers', type=int, help='worker processes, default one per core')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files, size = export(args.data, args.output, args.budgets, args.workers)
+    print('{} files, {:.1f} MB in {:.2f} s'.format(files, size / 1e6, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+# Figure and text builders for the app outputs.
+#
+# Every builder takes the row of the selected country and the Budgets tuple
+# returned by engine.compute(), so the budget math runs once per request no
+# matter how many outputs are built from it.
+#
+# Traces are plain dicts rather than plotly.graph_objs: the years are sent as
+# a start year (x0) and step (dx) instead of a list, and only the years that
+# have a value are sent. With FIGURE_TYPED_ARRAYS=1 the y values are sent as
+# base64 encoded float32 typed arrays, which needs plotly.js 2.28 or newer :
+# the option is refused at import when the plotly.js bundled with the
+# installed Dash is older (Dash 2.16.1, pinned in requirements.txt, bundles
+# plotly.js 2.25.2, which draws these traces empty).
+
+import base64
+import os
+import re
+
+import numpy as np
+from dash import dcc, html
+
+from budgets import engine, locations
+
+STYLE_BOLD = {'font-weight': 'bold'}
+
+MIN_TYPED_ARRAYS_PLOTLY_JS = (2, 28)
+
+
+def plotly_js_version():
+    """Version of the plotly.js bundled with Dash, as a tuple of ints, or None when it cannot be read."""
+    try:
+        with open(os.path.join(os.path.dirname(dcc.__file__), 'plotly.min.js'), encoding='utf-8') as f:
+            header = f.read(200)
+    except OSError:
+        return None
+    match = re.search(r'plotly\.js v(\d+)\.(\d+)\.(\d+)', header)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def check_typed_arrays():
+    """Raise RuntimeError when the bundled plotly.js cannot decode typed arrays."""
+    version = plotly_js_version()
+    if version is None or version < MIN_TYPED_ARRAYS_PLOTLY_JS:
+        raise RuntimeError('FIGURE_TYPED_ARRAYS=1 needs plotly.js {} or newer, Dash bundles {}'.format(
+            '.'.join(map(str, MIN_TYPED_ARRAYS_PLOTLY_JS)),
+            '.'.join(map(str, version)) if version else 'an unknown version'))
+
+
+TYPED_ARRAYS = os.environ.get('FIGURE_TYPED_ARRAYS', '0') == '1'
+if TYPED_ARRAYS:
+    check_typed_arrays()
+
+MAX_FUTURE_YEARS = 980  # future pathways are displayed from 2020 up to 2999
+
+
+def series(values, typed_arrays=None):
+    """y values of a trace, as a list or as a plotly.js typed array."""
+    if TYPED_ARRAYS if typed_arrays is None else typed_arrays:
+        values = np.asarray(values, dtype=np.float32)
+        return {'dtype': 'f4', 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+    return np.asarray(values, dtype=np.float64).tolist()
+
+
+def bar(name, first_year, values, **kwargs):
+    """Bar trace with one bar per year from ``first_year`` onwards."""
+    return dict({'type': 'bar', 'name': name, 'x0': first_year, 'dx': 1, 'y': series(values)}, **kwargs)
+
+
+def fan(name, first_year, lower, upper, color):
+    """Filled band between two lines, one value per year from ``first_year`` onwards."""
+    line = {'width': 0}
+    return [
+        {'type': 'scatter', 'mode': 'lines', 'name': name, 'x0': first_year, 'dx': 1, 'y': series(lower),
+         'line': line, 'showlegend': False, 'hoverinfo': 'skip'},
+        {'type': 'scatter', 'mode': 'lines', 'name': name, 'x0': first_year, 'dx': 1, 'y': series(upper),
+         'line': line, 'fill': 'tonexty', 'fillcolor': color},
+    ]
+
+
+def uncertainty_traces(spread):
+    """Fan bands and median of the Monte Carlo pathways (see uncertainty.py)."""
+    bands = spread.bands
+    if bands.shape[1] == 0:
+        return []
+    traces = []
+    for n, alpha in ((0, 0.15), (1, 0.3)):  # outer range first, so the inner range is drawn on top
+        name = '{}-{} % range'.format(spread.percentiles[n], spread.percentiles[-1 - n])
+        traces.extend(fan(name, 2020, bands[n], bands[-1 - n], 'rgba(43,160,43,{})'.format(alpha)))
+    traces.append({'type': 'scatter', 'mode': 'lines', 'name': 'Median', 'x0': 2020, 'dx': 1,
+                   'y': series(bands[len(bands) // 2]), 'line': {'color': 'rgb(43,160,43)', 'dash': 'dash'}})
+    return traces
+
+
+def national_figure(store, i, budget, selected_country, spread=None, pathway=None):
+    """Historical, recent and future national emissions (id: emissions-graph), with optional uncertainty bands.
+
+    ``pathway`` is the shape of the future emissions (see pathways.py), linear by default. The uncertainty
+    bands are those of the linear pathway (see uncertainty.py), so they are only drawn with it.
+    """
+
+    # emission values from 2020 until the budget is depleted
+    if pathway is None:
+        future = engine.linear_pathway(budget.emissions_2019, budget.slope, budget.t_depletion)[:MAX_FUTURE_YEARS]
+    else:
+        future = pathway.national(budget)[:MAX_FUTURE_YEARS]
+
+    return {
+        'data': [
+
+            ###################
+            # Historical data # : from imported EDGAR dataset
+            ###################
+            bar('Historical', 1970, store.historical[i]),
+
+            ###############
+            # Recent data # : 2018 and 2019 assumed to have same emissions as 2017 (latest EDGAR data available),
+            ############### or estimated from the trend of the emissions (budgets/nowcast.py)
+            ###############
+            bar('Recent', 2018, store.recent[i]),
+
+            ###############
+            # Future data # : compute linear decrease in emissions with given country carbon budget until zero
+            ############### with function describing emission value for years from 2020
+            bar('Future', 2020, future),
+
+        ] + (uncertainty_traces(spread) if spread is not None and pathway is None else []),
+        'layout': {
+            'title': 'Historical Emissions and Future Emission Budget for {} <br><sub>Source: @FlorianDRX</sub>'.format(selected_country),
+            'xaxis': {
+                'title': 'Year'
+            },
+            'yaxis': {
+                'title': 'National Emissions (Megatons CO2)'
+            },
+        },
+    }
+
+
+def personal_figure(store, i, budget, selected_country, pathway=None):
+    """Recent and future emissions per person (id: emissions-graph-personal), along ``pathway`` (linear by default)."""
+
+    # country population
+    population = round(float(store.population[i]), 2)
+
+    # personal emission values from 2020 until the budget is depleted
+    if pathway is None:
+        future = engine.personal_pathway(budget.emissions_2019, budget.slope, budget.t_depletion, population)[:MAX_FUTURE_YEARS]
+    else:
+        future = pathway.personal(budget, population)[:MAX_FUTURE_YEARS]
+
+    return {
+        'data': [
+
+            ###############
+            # Recent data #
+            ###############
+            bar('Recent', 2019, [1000000 * (store.emissions(i, 2018) / population)],
+                marker={'color': 'rgb(255,127,15)'}),
+
+            ###############
+            # Future data # : compute linear decrease in emissions with given country carbon budget until zero
+            ############### with function describing emission value for years from 2020
+            bar('Future', 2020, future, marker={'color': 'rgb(106,187,104)'}),
+        ],
+        'layout': {
+            'title': 'Personal Future Emission Budget in {} <br><sub>Source: @FlorianDRX</sub>'.format(selected_country),
+            'xaxis': {
+                'title': 'Year'
+            },
+            'yaxis': {
+                'title': 'Personal Emissions (tons CO2)'
+            },
+        },
+    }
+
+
+# plotly's default colors, so the history and the future of a country get the same color
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+COMPARISON_TITLE_COUNTRIES = 4  # countries named in the title of a comparison, larger selections are counted
+
+
+def _width(matrix):
+    # columns up to the last year in which any country still has a value
+    finite = np.isfinite(matrix).any(axis=0)
+    return int(np.flatnonzero(finite)[-1]) + 1 if finite.any() else 0
+
+
+def comparison_traces(countries, first_year, past, future):
+    """One line per country and its dashed continuation from 2020, from rows of nan padded matrices."""
+    past, future = past[:, :_width(past)], future[:, :_width(future)]
+    traces = []
+    for n, country in enumerate(countries):
+        line = {'color': COLORS[n % len(COLORS)]}
+        traces.append({'type': 'scatter', 'mode': 'lines', 'name': country, 'legendgroup': country,
+                       'x0': first_year, 'dx': 1, 'y': series(past[n]), 'line': line})
+        traces.append({'type': 'scatter', 'mode': 'lines', 'name': country, 'legendgroup': country, 'showlegend': False,
+                       'x0': 2020, 'dx': 1, 'y': series(future[n]), 'line': dict(line, dash='dash')})
+    return traces
+
+
+def comparison_figures(store, rows, budgets, countries, pathway):
+    """National and personal figures overlaying several countries.
+
+    ``rows`` are the store rows of ``countries`` and ``budgets`` their
+    engine.compute() result (1-d fields). The history of all countries is one
+    slice of the store and the futures one ``pathway`` matrix (see pathways.py).
+    """
+    national = pathway.national_matrix(budgets, MAX_FUTURE_YEARS)
+    personal = pathway.personal_matrix(budgets, store.population[rows], MAX_FUTURE_YEARS)
+    # 1970 - 2019, the recent years continue the historical lines
+    history = np.concatenate([store.historical[rows], store.recent[rows]], axis=1)
+    per_capita = store.per_capita[rows]  # 1990 - 2017
+
+    names = ', '.join(countries) if len(countries) <= COMPARISON_TITLE_COUNTRIES else '{} countries'.format(len(countries))
+    return (
+        {
+            'data': comparison_traces(countries, 1970, history, national),
+            'layout': {
+                'title': 'Historical Emissions and Future Emission Budgets for {} <br><sub>Source: @FlorianDRX</sub>'.format(names),
+                'xaxis': {'title': 'Year'},
+                'yaxis': {'title': 'National Emissions (Megatons CO2)'},
+            },
+        },
+        {
+            'data': comparison_traces(countries, 1990, per_capita, personal),
+            'layout': {
+                'title': 'Personal Emissions and Future Emission Budgets in {} <br><sub>Source: @FlorianDRX</sub>'.format(names),
+                'xaxis': {'title': 'Year'},
+                'yaxis': {'title': 'Personal Emissions (tons CO2)'},
+            },
+        },
+    )
+
+
+# fields of engine.Budgets shown on the world map
+MAP_FIELDS = {
+    'years_constant': 'constant emissions',
+    'years_linear': 'linearly decreasing emissions',
+}
+MAP_MAX_YEARS = 50  # top of the color scale, countries with more years left get the same color
+
+
+def world_map_title(carbon_budget, field):
+    return 'Years left from 2020 with {}, for a global budget of {} Gt CO2'.format(MAP_FIELDS[field], carbon_budget)
+
+
+def world_map_values(values, countries):
+    """Years left of every map location (see locations.py) as sent to the map, rounded to a tenth of a year.
+
+    ``values`` has one value per row of ``countries``.
+    """
+    _, rows = locations.locations(countries)
+    return series(np.round(np.asarray(values, dtype=np.float64)[rows], 1))
+
+
+def world_map_figure(countries, values, carbon_budget, field):
+    """Countries colored by the years left from 2020 (id: world-map).
+
+    The country shapes are drawn by plotly.js from its own world map, matched
+    by ISO-3 code (a merged row of data.csv on every country it covers), so
+    after the first load only ``z`` (world_map_values) and the title change.
+    """
+    codes, rows = locations.locations(countries)
+    return {
+        'data': [{
+            'type': 'choropleth',
+            'locationmode': 'ISO-3',
+            'locations': codes,
+            'text': [countries[row] for row in rows],
+            'z': world_map_values(values, countries),
+            'zmin': 0,
+            'zmax': MAP_MAX_YEARS,
+            'colorscale': 'RdYlGn',
+            'colorbar': {'title': 'Years'},
+            'hovertemplate': '%{text} : %{z} years<extra></extra>',
+        }],
+        'layout': {
+            'title': world_map_title(carbon_budget, field),
+            'geo': {'showframe': False, 'projection': {'type': 'natural earth'}},
+            'margin': {'l': 0, 'r': 0, 'b': 0},
+        },
+    }
+
+
+def worldwide_reach_text(carbon_budget):
+    """Years of constant worldwide emissions before depletion (id: worldwide-reach)."""
+    reach_2016, reach_2020 = engine.global_reach(carbon_budget)
+    return ['At the start of 2016, it would have taken ',
+    html.Span('{}'.format(float(reach_2016)), style=STYLE_BOLD), # Global reach from 2016 onwards
+    ' years of constant worldwide emissions before the carbon budget was depleted. \
+    From 2020 onwards, this will be reduced to ',
+    html.Span('{}'.format(float(reach_2020)), style=STYLE_BOLD), # Global reach from 2020 onwards
+    ' years.']
+
+
+def country_text(budget, spread=None, recent=None):
+    """National budget and timeline (id: country-carbon-budget), with optional depletion year range.
+
+    ``recent`` are the 2018 and 2019 emissions when they were estimated by nowcast.py instead of copied from 2017.
+    """
+    text = ['At the start of 2016, the remaining carbon budget for your country was ',
+    html.Span('{}'.format(round(float(budget.country_budget_2016), 2)), style=STYLE_BOLD)]
+    if recent is None:
+        text += [' Mton CO2. \
+    Assuming that the 2018 and 2019-emissions in your country stayed at the level of ',
+        html.Span('{}'.format(round(float(budget.emissions_2017), 2)), style=STYLE_BOLD), # country emissions 2017
+        ' Mton CO2 (last available data from 2017), the remaining national carbon\
+    budget from 2020 onwards is ']
+    else:
+        text += [' Mton CO2. Estimating the 2018 and 2019-emissions in your country at ',
+        html.Span('{}'.format(round(float(recent[0]), 2)), style=STYLE_BOLD), # nowcast emissions 2018
+        ' and ',
+        html.Span('{}'.format(round(float(recent[1]), 2)), style=STYLE_BOLD), # nowcast emissions 2019
+        ' Mton CO2 from the trend of the emissions up to 2017 (last available data: ',
+        html.Span('{}'.format(round(float(budget.emissions_2017), 2)), style=STYLE_BOLD), # country emissions 2017
+        ' Mton CO2), the remaining national carbon budget from 2020 onwards is ']
+    text += [html.Span('{}'.format(round(float(budget.remaining_2020), 2)), style=STYLE_BOLD), # country carbon budget from 2019 onwards
+    ' Mton CO2. This is equal to ',
+    html.Span('{}'.format(round(float(budget.years_constant), 2)), style=STYLE_BOLD), # years in cte emissions from 2019 onwards
+    ' years of constant emissions, or ',
+    html.Span('{}'.format(round(float(budget.years_linear), 2)), style=STYLE_BOLD), # Global reach from 2016 onwards
+    ' years when linearly decreasing emissions.',]
+    if spread is not None and np.isfinite(spread.depletion_linear).all():
+        text += [' Taking the uncertainty of the global budget and of the 2018 and 2019-emissions into account, the national budget is depleted between ',
+        html.Span(_year(spread.depletion_linear[0]), style=STYLE_BOLD),
+        ' and ',
+        html.Span(_year(spread.depletion_linear[-1]), style=STYLE_BOLD),
+        ' ({}-{} % range) when linearly decreasing emissions, with a median of '.format(spread.percentiles[0], spread.percentiles[-1]),
+        html.Span(_year(spread.depletion_linear[len(spread.percentiles) // 2]), style=STYLE_BOLD),
+        '.']
+    return text
+
+
+def _year(year):
+    # depletion years before 2020 mean the budget was already used up
+    return 'before 2020' if year < 2020 else '{:.0f}'.format(year)
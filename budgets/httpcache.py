@@ -0,0 +1,221 @@
+# HTTP validators and compression for the deterministic responses.
+#
+# Callback outputs only depend on the request body and the dataset, the page
+# layout and the callback graph only on the dataset, and /api/budgets on its
+# parameters and the dataset. With HTTP_CACHE=1 hooks on the Flask server:
+#
+# - add an ETag to these responses : the SHA-1 of the body, or for the
+#   streamed /api/budgets responses the SHA-1 of the dataset version and the
+#   request (method, URL and body), so the stream is never buffered
+# - add Cache-Control : `no-cache` by default (browsers keep the response but
+#   revalidate it every time, as a reload may change the dataset), or
+#   `public, max-age=<HTTP_CACHE_MAX_AGE>`
+# - answer a GET whose If-None-Match has the current ETag with an empty 304;
+#   for /api/budgets this is decided before the request is computed
+# - compress JSON, JavaScript, CSS and text bodies (these responses, but also
+#   the page and the Dash JavaScript bundles) of at least
+#   HTTP_COMPRESS_MIN_BYTES (default 1024) with brotli (when the brotli package
+#   is installed) or gzip, as accepted by the client. The same body is
+#   compressed once : compressed bodies are kept in an LRU cache of
+#   HTTP_COMPRESS_CACHE_SIZE entries per worker. Streamed bodies are
+#   compressed chunk by chunk.
+#
+# Browsers only revalidate GET requests (the page, /api/budgets). Dash POSTs
+# the callbacks, and a POST with a matching If-None-Match is not answered
+# with 304 (RFC 9110 reserves it for GET and HEAD), so for the callbacks the
+# gain is the compression; their ETag still lets a client or proxy tell
+# whether two outputs are identical. When disabled, no hook is added.
+
+import hashlib
+import os
+import zlib
+
+from flask import Response, request
+
+from budgets.cache import MISSING, LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.environ.get('HTTP_CACHE', '0') == '1'
+MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 0))
+MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', 1024))
+COMPRESS_CACHE_SIZE = int(os.environ.get('HTTP_COMPRESS_CACHE_SIZE', 256))
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # fast enough to compress a figure per request, most of the size reduction of 11
+
+# responses whose ETag is the hash of their body, matched on the end of the path (the Dash url prefix may vary)
+CONTENT_PATHS = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies')
+# streamed responses whose ETag is the hash of the dataset version and the request
+REQUEST_PREFIXES = ('/api/',)
+
+COMPRESSIBLE = ('application/json', 'application/javascript', 'text/', 'image/svg+xml')
+
+
+def encodings():
+    """Content encodings the server can produce, preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+class _Gzip(object):
+    # gzip stream with the interface of brotli.Compressor
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 : gzip header and trailer
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def compressor(encoding):
+    if encoding == 'br':
+        return brotli.Compressor(quality=BROTLI_QUALITY)
+    return _Gzip()
+
+
+def compress(data, encoding):
+    """``data`` (bytes) compressed with ``encoding``, 'br' or 'gzip'."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return zlib.compress(data, GZIP_LEVEL, 31)
+
+
+def _compress_chunks(chunks, encoding):
+    stream = compressor(encoding)
+    for chunk in chunks:
+        data = stream.process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def _etag(digest, encoding=None):
+    # every encoding of a body is a different representation, so it gets its own (strong) ETag
+    return digest if encoding is None else '{}-{}'.format(digest, encoding)
+
+
+class HTTPCache(object):
+    """ETags, Cache-Control, 304 responses and compression, added by :meth:`register`.
+
+    ``get_version`` returns the version of the loaded dataset (a function, so
+    the dataset can be replaced at runtime), part of the ETag of streamed
+    responses.
+    """
+
+    def __init__(self, enabled=ENABLED, get_version=None, max_age=MAX_AGE, min_bytes=MIN_BYTES,
+                 compress_cache_size=COMPRESS_CACHE_SIZE):
+        self.enabled = enabled
+        self.get_version = get_version
+        self.max_age = max_age
+        self.min_bytes = min_bytes
+        self.compressed = LRUCache(maxsize=compress_cache_size)
+
+    def cache_control(self):
+        return 'public, max-age={}'.format(self.max_age) if self.max_age > 0 else 'no-cache'
+
+    def request_digest(self):
+        """SHA-1 of the dataset version and the current request."""
+        digest = hashlib.sha1()
+        for part in (self.get_version() if self.get_version is not None else '', request.method, request.full_path):
+            digest.update(part.encode('utf-8') + b'\0')
+        digest.update(request.get_data())
+        return digest.hexdigest()
+
+    def _match(self, digest):
+        # ETag of If-None-Match naming any encoding of the same body, for a GET, else None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        etags = request.if_none_match
+        if etags.star_tag:
+            return _etag(digest)
+        for encoding in [None] + encodings():
+            if etags.contains_weak(_etag(digest, encoding)):
+                return _etag(digest, encoding)
+        return None
+
+    def _validators(self, response, etag):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control()
+        return response
+
+    def not_modified(self, etag, response=None):
+        """Empty 304 response with the ETag ``etag`` the client already has."""
+        response = response if response is not None else Response()
+        response.status_code = 304
+        response.set_data(b'')
+        response.vary.add('Accept-Encoding')
+        return self._validators(response, etag)
+
+    def _encoding(self, response, size=None):
+        # encoding chosen for ``response``, None to send it as is
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+            return None
+        response.vary.add('Accept-Encoding')
+        if size is not None and size < self.min_bytes:
+            return None
+        return request.accept_encodings.best_match(encodings())
+
+    def compress_body(self, data, digest, encoding):
+        """``data`` compressed with ``encoding``, each body compressed once."""
+        key = (digest, encoding)
+        body = self.compressed.get(key)
+        if body is MISSING:
+            body = compress(data, encoding)
+            self.compressed.set(key, body)
+        return body
+
+    def before_request(self):
+        # conditional requests of the streamed responses are answered before they are computed
+        if request.path.startswith(REQUEST_PREFIXES) and request.method in ('GET', 'HEAD') and request.if_none_match:
+            etag = self._match(self.request_digest())
+            if etag is not None:
+                return self.not_modified(etag)
+        return None
+
+    def after_request(self, response):
+        if response.direct_passthrough:  # files sent by Flask
+            return response
+        validate = response.status_code == 200
+
+        if response.is_streamed:
+            if not request.path.startswith(REQUEST_PREFIXES):
+                return response
+            digest = self.request_digest()
+            encoding = self._encoding(response)
+            if validate:
+                self._validators(response, _etag(digest, encoding))
+            if encoding is not None:
+                response.response = _compress_chunks(response.response, encoding)
+                response.headers.pop('Content-Length', None)
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+        validate = validate and request.path.endswith(CONTENT_PATHS)
+        data = response.get_data()
+        encoding = self._encoding(response, len(data))
+        if not validate and encoding is None:
+            return response
+        digest = hashlib.sha1(data).hexdigest()
+        if validate:
+            etag = self._match(digest)
+            if etag is not None:
+                return self.not_modified(etag, response)
+            self._validators(response, _etag(digest, encoding))
+        if encoding is not None:
+            response.set_data(self.compress_body(data, digest, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def register(self, server):
+        """Add the request hooks to the Flask ``server`` (nothing when disabled)."""
+        if not self.enabled:
+            return
+        server.before_request(self.before_request)
+        server.after_request(self.after_request)
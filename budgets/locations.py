@@ -0,0 +1,239 @@
+# ISO 3166-1 alpha-3 codes of the data.csv rows, for the world map.
+#
+# plotly.js matches 'country names' locations with its own regular expressions,
+# which go wrong for the merged and ambiguous names of EDGAR : "Italy, San
+# Marino and the Holy See" matched the Holy See only, "Switzerland and
+# Liechtenstein" Liechtenstein, "Sudan and South Sudan" South Sudan, and
+# "Serbia and Montenegro" nothing. The map uses ISO-3 locations instead, and a
+# merged row is drawn on every country it covers, with the same value.
+#
+# Two rows of data.csv are the Democratic Republic of the Congo; the map draws
+# the first one (with 2016 data), every code is drawn once.
+
+import numpy as np
+
+CODES = {
+    'Afghanistan': ('AFG',),
+    'Albania': ('ALB',),
+    'Algeria': ('DZA',),
+    'Angola': ('AGO',),
+    'Anguilla': ('AIA',),
+    'Antigua and Barbuda': ('ATG',),
+    'Argentina': ('ARG',),
+    'Armenia': ('ARM',),
+    'Aruba': ('ABW',),
+    'Australia': ('AUS',),
+    'Austria': ('AUT',),
+    'Azerbaijan': ('AZE',),
+    'Bahamas': ('BHS',),
+    'Bahrain': ('BHR',),
+    'Bangladesh': ('BGD',),
+    'Barbados': ('BRB',),
+    'Belarus': ('BLR',),
+    'Belgium': ('BEL',),
+    'Belize': ('BLZ',),
+    'Benin': ('BEN',),
+    'Bermuda': ('BMU',),
+    'Bhutan': ('BTN',),
+    'Bolivia': ('BOL',),
+    'Bosnia and Herzegovina': ('BIH',),
+    'Botswana': ('BWA',),
+    'Brazil': ('BRA',),
+    'British Virgin Islands': ('VGB',),
+    'Brunei': ('BRN',),
+    'Bulgaria': ('BGR',),
+    'Burkina Faso': ('BFA',),
+    'Burundi': ('BDI',),
+    'Cambodia': ('KHM',),
+    'Cameroon': ('CMR',),
+    'Canada': ('CAN',),
+    'Cape Verde': ('CPV',),
+    'Cayman Islands': ('CYM',),
+    'Central African Republic': ('CAF',),
+    'Chad': ('TCD',),
+    'Chile': ('CHL',),
+    'China': ('CHN',),
+    'Colombia': ('COL',),
+    'Comoros': ('COM',),
+    'Congo (the Democratic Republic of)': ('COD',),
+    'Congo (the)': ('COG',),
+    'Cook Islands': ('COK',),
+    'Costa Rica': ('CRI',),
+    'Côte d’Ivoire': ('CIV',),
+    'Croatia': ('HRV',),
+    'Cuba': ('CUB',),
+    'Curaçao': ('CUW',),
+    'Cyprus': ('CYP',),
+    'Czechia': ('CZE',),
+    'Democratic Republic of the Congo': ('COD',),
+    'Denmark': ('DNK',),
+    'Djibouti': ('DJI',),
+    'Dominica': ('DMA',),
+    'Dominican Republic': ('DOM',),
+    'Ecuador': ('ECU',),
+    'Egypt': ('EGY',),
+    'El Salvador': ('SLV',),
+    'Equatorial Guinea': ('GNQ',),
+    'Eritrea': ('ERI',),
+    'Estonia': ('EST',),
+    'Ethiopia': ('ETH',),
+    'Falkland Islands': ('FLK',),
+    'Faroes': ('FRO',),
+    'Fiji': ('FJI',),
+    'Finland': ('FIN',),
+    'former Yugoslav Republic of Macedonia, the': ('MKD',),
+    'France and Monaco': ('FRA', 'MCO'),
+    'French Guiana': ('GUF',),
+    'French Polynesia': ('PYF',),
+    'Gabon': ('GAB',),
+    'Georgia': ('GEO',),
+    'Germany': ('DEU',),
+    'Ghana': ('GHA',),
+    'Gibraltar': ('GIB',),
+    'Greece': ('GRC',),
+    'Greenland': ('GRL',),
+    'Grenada': ('GRD',),
+    'Guadeloupe': ('GLP',),
+    'Guatemala': ('GTM',),
+    'Guinea': ('GIN',),
+    'Guinea-Bissau': ('GNB',),
+    'Guyana': ('GUY',),
+    'Haiti': ('HTI',),
+    'Honduras': ('HND',),
+    'Hong Kong': ('HKG',),
+    'Hungary': ('HUN',),
+    'Iceland': ('ISL',),
+    'India': ('IND',),
+    'Indonesia': ('IDN',),
+    'Iran': ('IRN',),
+    'Iraq': ('IRQ',),
+    'Ireland': ('IRL',),
+    'Israel and Palestine, State of': ('ISR', 'PSE'),
+    'Italy, San Marino and the Holy See': ('ITA', 'SMR', 'VAT'),
+    'Jamaica': ('JAM',),
+    'Japan': ('JPN',),
+    'Jordan': ('JOR',),
+    'Kazakhstan': ('KAZ',),
+    'Kenya': ('KEN',),
+    'Kiribati': ('KIR',),
+    'Kuwait': ('KWT',),
+    'Kyrgyzstan': ('KGZ',),
+    'Laos': ('LAO',),
+    'Latvia': ('LVA',),
+    'Lebanon': ('LBN',),
+    'Lesotho': ('LSO',),
+    'Liberia': ('LBR',),
+    'Libya': ('LBY',),
+    'Lithuania': ('LTU',),
+    'Luxembourg': ('LUX',),
+    'Macao': ('MAC',),
+    'Madagascar': ('MDG',),
+    'Malawi': ('MWI',),
+    'Malaysia': ('MYS',),
+    'Maldives': ('MDV',),
+    'Mali': ('MLI',),
+    'Malta': ('MLT',),
+    'Martinique': ('MTQ',),
+    'Mauritania': ('MRT',),
+    'Mauritius': ('MUS',),
+    'Mexico': ('MEX',),
+    'Moldova': ('MDA',),
+    'Mongolia': ('MNG',),
+    'Morocco': ('MAR',),
+    'Mozambique': ('MOZ',),
+    'Myanmar/Burma': ('MMR',),
+    'Namibia': ('NAM',),
+    'Nepal': ('NPL',),
+    'Netherlands': ('NLD',),
+    'New Caledonia': ('NCL',),
+    'New Zealand': ('NZL',),
+    'Nicaragua': ('NIC',),
+    'Niger': ('NER',),
+    'Nigeria': ('NGA',),
+    'North Korea': ('PRK',),
+    'Norway': ('NOR',),
+    'Oman': ('OMN',),
+    'Pakistan': ('PAK',),
+    'Palau': ('PLW',),
+    'Panama': ('PAN',),
+    'Papua New Guinea': ('PNG',),
+    'Paraguay': ('PRY',),
+    'Peru': ('PER',),
+    'Philippines': ('PHL',),
+    'Poland': ('POL',),
+    'Portugal': ('PRT',),
+    'Puerto Rico': ('PRI',),
+    'Qatar': ('QAT',),
+    'Réunion': ('REU',),
+    'Romania': ('ROU',),
+    'Russia': ('RUS',),
+    'Rwanda': ('RWA',),
+    'Saint Helena, Ascension and Tristan da Cunha': ('SHN',),
+    'Saint Kitts and Nevis': ('KNA',),
+    'Saint Lucia': ('LCA',),
+    'Saint Pierre and Miquelon': ('SPM',),
+    'Saint Vincent and the Grenadines': ('VCT',),
+    'Samoa': ('WSM',),
+    'São Tomé and Príncipe': ('STP',),
+    'Saudi Arabia': ('SAU',),
+    'Senegal': ('SEN',),
+    'Serbia and Montenegro': ('SRB', 'MNE'),
+    'Seychelles': ('SYC',),
+    'Sierra Leone': ('SLE',),
+    'Singapore': ('SGP',),
+    'Slovakia': ('SVK',),
+    'Slovenia': ('SVN',),
+    'Solomon Islands': ('SLB',),
+    'Somalia': ('SOM',),
+    'South Africa': ('ZAF',),
+    'South Korea': ('KOR',),
+    'Spain and Andorra': ('ESP', 'AND'),
+    'Sri Lanka': ('LKA',),
+    'Sudan and South Sudan': ('SDN', 'SSD'),
+    'Suriname': ('SUR',),
+    'Swaziland': ('SWZ',),
+    'Sweden': ('SWE',),
+    'Switzerland and Liechtenstein': ('CHE', 'LIE'),
+    'Syria': ('SYR',),
+    'Taiwan': ('TWN',),
+    'Tajikistan': ('TJK',),
+    'Tanzania': ('TZA',),
+    'Thailand': ('THA',),
+    'The Gambia': ('GMB',),
+    'Timor-Leste': ('TLS',),
+    'Togo': ('TGO',),
+    'Tonga': ('TON',),
+    'Trinidad and Tobago': ('TTO',),
+    'Tunisia': ('TUN',),
+    'Turkey': ('TUR',),
+    'Turkmenistan': ('TKM',),
+    'Turks and Caicos Islands': ('TCA',),
+    'Uganda': ('UGA',),
+    'Ukraine': ('UKR',),
+    'United Arab Emirates': ('ARE',),
+    'United Kingdom': ('GBR',),
+    'United States': ('USA',),
+    'Uruguay': ('URY',),
+    'Uzbekistan': ('UZB',),
+    'Vanuatu': ('VUT',),
+    'Venezuela': ('VEN',),
+    'Vietnam': ('VNM',),
+    'Western Sahara': ('ESH',),
+    'Yemen': ('YEM',),
+    'Zambia': ('ZMB',),
+    'Zimbabwe': ('ZWE',),
+}
+
+# rows of data.csv that are not a country and are left off the map
+AGGREGATES = {'World'}
+
+
+def locations(countries):
+    """ISO-3 codes of the map and the row of ``countries`` drawn on each; unknown names are left out."""
+    codes, rows = [], []
+    for row, country in enumerate(countries):
+        for code in CODES.get(country, ()):
+            if code not in codes:
+                codes.append(code)
+                rows.append(row)
+    return codes, np.array(rows, dtype=np.intp)
@@ -0,0 +1,213 @@
+# Per-callback instrumentation and a Prometheus text endpoint.
+#
+# With CALLBACK_METRICS=1 every server side callback is wrapped to record its
+# duration, errors, prevented updates and figure cache hits / misses, and the
+# size of every /_dash-update-component response is recorded per callback. The
+# totals are served at /metrics in the Prometheus text format:
+#
+#     dash_callback_duration_seconds_bucket{callback="emissions-graph.figure",le="0.01"} 42
+#
+# CALLBACK_METRICS_LOG=1 also logs one JSON line per callback call on the
+# `budgets.metrics` logger. When disabled, callbacks are registered unwrapped
+# and no route or request hook is added, so there is no overhead at all.
+#
+# Counters are kept per worker process : scrape every gunicorn worker, or run
+# a single worker with threads, to get the totals of a deployment.
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+from flask import Response, request
+
+ENABLED = os.environ.get('CALLBACK_METRICS', '0') == '1'
+LOG = os.environ.get('CALLBACK_METRICS_LOG', '0') == '1'
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+logger = logging.getLogger(__name__)
+
+
+def callback_id(outputs):
+    """Callback id as sent by the Dash renderer in the `output` field of a request."""
+    if isinstance(outputs, (list, tuple)):
+        return '..' + '...'.join('{}.{}'.format(o.component_id, o.component_property) for o in outputs) + '..'
+    return '{}.{}'.format(outputs.component_id, outputs.component_property)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Callback(object):
+    # totals of a single callback id
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prevented = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.responses = 0
+        self.response_bytes = 0
+
+
+class CallbackMetrics(object):
+    """Counters per callback id, filled by :meth:`instrument` and served by :meth:`register`.
+
+    ``get_cache`` returns the figure cache whose lookups are attributed to the
+    callbacks (a function, so the cache can be replaced at runtime), and
+    ``get_reloads`` the dataset watcher (see reload.py) or None.
+    """
+
+    def __init__(self, enabled=ENABLED, log=LOG, get_cache=None, get_reloads=None):
+        self.enabled = enabled
+        self.log = log
+        self.get_cache = get_cache
+        self.get_reloads = get_reloads
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def _totals(self, name):
+        # called with the lock held
+        totals = self._callbacks.get(name)
+        if totals is None:
+            totals = self._callbacks[name] = _Callback()
+        return totals
+
+    def instrument(self, name, func):
+        """``func`` wrapped to record calls under the callback id ``name``, or ``func`` itself when disabled."""
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = self.get_cache() if self.get_cache is not None else None
+            hits, misses = cache.thread_counts() if cache is not None else (0, 0)
+            outcome = 'ok'
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                outcome = 'prevented'
+                raise
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                if cache is not None:
+                    hits_after, misses_after = cache.thread_counts()
+                    hits, misses = hits_after - hits, misses_after - misses
+                self.record(name, seconds, outcome, hits, misses)
+
+        return wrapper
+
+    def record(self, name, seconds, outcome='ok', cache_hits=0, cache_misses=0):
+        with self._lock:
+            totals = self._totals(name)
+            totals.calls += 1
+            totals.errors += outcome == 'error'
+            totals.prevented += outcome == 'prevented'
+            totals.cache_hits += cache_hits
+            totals.cache_misses += cache_misses
+            totals.seconds += seconds
+            for n, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    totals.buckets[n] += 1
+        if self.log:
+            logger.info(json.dumps({'callback': name, 'seconds': round(seconds, 6), 'outcome': outcome,
+                                    'cache_hits': cache_hits, 'cache_misses': cache_misses}))
+
+    def record_response(self, name, size):
+        with self._lock:
+            totals = self._totals(name)
+            totals.responses += 1
+            totals.response_bytes += size
+        if self.log:
+            logger.info(json.dumps({'callback': name, 'response_bytes': size}))
+
+    def render(self):
+        """All counters in the Prometheus text exposition format."""
+        with self._lock:
+            callbacks = sorted((name, vars(totals).copy()) for name, totals in self._callbacks.items())
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            lines.extend(samples)
+
+        def per_callback(suffix, field):
+            return ['{}{{callback="{}"}} {}'.format(suffix, _label(name), totals[field]) for name, totals in callbacks]
+
+        metric('dash_callback_calls_total', 'counter', 'Callback calls.',
+               per_callback('dash_callback_calls_total', 'calls'))
+        metric('dash_callback_errors_total', 'counter', 'Callback calls that raised an exception.',
+               per_callback('dash_callback_errors_total', 'errors'))
+        metric('dash_callback_prevented_total', 'counter', 'Callback calls that raised PreventUpdate.',
+               per_callback('dash_callback_prevented_total', 'prevented'))
+        metric('dash_callback_cache_hits_total', 'counter', 'Figure cache hits during callback calls.',
+               per_callback('dash_callback_cache_hits_total', 'cache_hits'))
+        metric('dash_callback_cache_misses_total', 'counter', 'Figure cache misses during callback calls.',
+               per_callback('dash_callback_cache_misses_total', 'cache_misses'))
+
+        samples = []
+        for name, totals in callbacks:
+            label = _label(name)
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                samples.append('dash_callback_duration_seconds_bucket{{callback="{}",le="{}"}} {}'.format(label, bound, count))
+            samples.append('dash_callback_duration_seconds_bucket{{callback="{}",le="+Inf"}} {}'.format(label, totals['calls']))
+            samples.append('dash_callback_duration_seconds_sum{{callback="{}"}} {!r}'.format(label, totals['seconds']))
+            samples.append('dash_callback_duration_seconds_count{{callback="{}"}} {}'.format(label, totals['calls']))
+        metric('dash_callback_duration_seconds', 'histogram', 'Time spent in the callback function.', samples)
+
+        samples = []
+        for name, totals in callbacks:
+            label = _label(name)
+            samples.append('dash_callback_response_bytes_sum{{callback="{}"}} {}'.format(label, totals['response_bytes']))
+            samples.append('dash_callback_response_bytes_count{{callback="{}"}} {}'.format(label, totals['responses']))
+        metric('dash_callback_response_bytes', 'summary', 'Size of the /_dash-update-component responses.', samples)
+
+        cache = self.get_cache() if self.get_cache is not None else None
+        if cache is not None:
+            stats = cache.stats()
+            metric('figure_cache_entries', 'gauge', 'Entries in the figure cache.',
+                   ['figure_cache_entries {}'.format(stats['size'])])
+            metric('figure_cache_evictions_total', 'counter', 'Entries evicted from the figure cache.',
+                   ['figure_cache_evictions_total {}'.format(stats['evictions'])])
+
+        watcher = self.get_reloads() if self.get_reloads is not None else None
+        if watcher is not None:
+            stats = watcher.stats()
+            metric('dataset_reloads_total', 'counter', 'Changed datasets swapped in.',
+                   ['dataset_reloads_total {}'.format(stats['reloads'])])
+            metric('dataset_reload_errors_total', 'counter', 'Changed datasets that failed to load or validate.',
+                   ['dataset_reload_errors_total {}'.format(stats['errors'])])
+            if stats['last_seconds'] is not None:
+                metric('dataset_reload_seconds', 'gauge', 'Duration of the last reload.',
+                       ['dataset_reload_seconds {!r}'.format(stats['last_seconds'])])
+
+        return '\n'.join(lines) + '\n'
+
+    def register(self, server, path='/metrics'):
+        """Add the metrics route and the response size hook to the Flask ``server`` (nothing when disabled)."""
+        if not self.enabled:
+            return
+
+        @server.after_request
+        def record_response_size(response):
+            if request.path.endswith('/_dash-update-component') and not response.direct_passthrough:
+                name = (request.get_json(silent=True) or {}).get('output')
+                if name:
+                    self.record_response(name, response.calculate_content_length() or 0)
+            return response
+
+        server.add_url_rule(path, 'metrics', lambda: Response(self.render(), mimetype='text/plain; version=0.0.4'))
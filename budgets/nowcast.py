@@ -0,0 +1,109 @@
+# Estimates of the 2018 and 2019 emissions, the years after the EDGAR data.
+#
+# data.csv copies the 2017 emissions into its 2018 and 2019 columns, which is
+# what the app uses by default (NOWCAST=constant). With NOWCAST=linear or
+# NOWCAST=growth they are replaced at load time by the continuation of the
+# recent trend of every country:
+#
+# - linear : e(t) = e(2017) + b * (t - 2017), the yearly change b in Mton CO2
+# - growth : e(t) = e(2017) * exp(b * (t - 2017)), b fitted on log emissions
+#
+# b is the slope of a weighted least-squares line through the 1970 - 2017
+# emissions, with weights halving every NOWCAST_HALF_LIFE years (default 5)
+# back from 2017, so the last decade dominates without a hard cut-off. The
+# lines of all countries are fitted at once : the weighted normal equations
+# form a stack of 2 x 2 systems, solved in one batched np.linalg.solve call
+# (missing years, and years without emissions for growth, get a zero weight).
+# The trend is continued from the 2017 value rather than from the fitted line,
+# so the nowcast does not jump away from the last observation, and the yearly
+# change is limited to MAX_YEARLY_CHANGE of the 2017 emissions. Countries
+# with fewer than MIN_YEARS usable years keep the copied 2017 value.
+#
+# The estimates are computed once per dataset (at startup and on reload) and
+# stored in `store.recent`, so callbacks, tables and the clientside data use
+# them at no cost per request.
+
+import os
+
+import numpy as np
+
+from budgets.store import HISTORICAL_YEARS, RECENT_YEARS, BudgetStore
+
+METHODS = ['constant', 'linear', 'growth']
+DEFAULT = 'constant'
+
+METHOD = os.environ.get('NOWCAST', DEFAULT)
+HALF_LIFE = float(os.environ.get('NOWCAST_HALF_LIFE', 5))
+
+MIN_YEARS = 3  # usable years needed to fit a trend
+MAX_YEARLY_CHANGE = 0.2  # of the 2017 emissions
+
+
+def check(method):
+    """Raise ValueError for an unknown method."""
+    if method not in METHODS:
+        raise ValueError('unknown nowcast {}, choose from {}'.format(method, ', '.join(METHODS)))
+
+
+def weights(half_life=HALF_LIFE):
+    """Weight of every historical year, 1 for 2017 and halving every ``half_life`` years back."""
+    age = HISTORICAL_YEARS[-1] - np.array(HISTORICAL_YEARS, dtype=np.float64)
+    return 0.5 ** (age / half_life)
+
+
+def trend(values, half_life=HALF_LIFE):
+    """Slope of the weighted least-squares line through every row of ``values`` (countries x historical years).
+
+    Missing values are left out of the fit; rows with fewer than MIN_YEARS
+    values get a nan slope.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = np.array(HISTORICAL_YEARS, dtype=np.float64) - HISTORICAL_YEARS[-1]
+    usable = np.isfinite(values)
+    w = np.where(usable, weights(half_life), 0.0)
+    y = np.where(usable, values, 0.0)
+    # weighted normal equations of y = a + b * x, one 2 x 2 system per row
+    s0, s1, s2 = w.sum(axis=1), (w * x).sum(axis=1), (w * x * x).sum(axis=1)
+    lhs = np.stack([np.stack([s0, s1], axis=-1), np.stack([s1, s2], axis=-1)], axis=-2)
+    rhs = np.stack([(w * y).sum(axis=1), (w * x * y).sum(axis=1)], axis=-1)
+    valid = usable.sum(axis=1) >= MIN_YEARS
+    lhs[~valid] = np.eye(2)  # keeps the batch solvable, the result is dropped below
+    slope = np.linalg.solve(lhs, rhs[..., None])[:, 1, 0]
+    return np.where(valid, slope, np.nan)
+
+
+def estimate(historical, method=METHOD, half_life=HALF_LIFE):
+    """2018 and 2019 emissions of every row of ``historical`` (Mton CO2, 1970 - 2017), shape (n, 2)."""
+    check(method)
+    historical = np.asarray(historical, dtype=np.float64)
+    last = historical[:, -1:]
+    years = np.array(RECENT_YEARS, dtype=np.float64) - HISTORICAL_YEARS[-1]
+    if method == 'constant':
+        return np.repeat(last, len(RECENT_YEARS), axis=1)
+    if method == 'linear':
+        change = trend(historical, half_life)[:, None]
+        change = np.clip(change, -MAX_YEARLY_CHANGE * np.abs(last), MAX_YEARLY_CHANGE * np.abs(last))
+        values = np.maximum(last + change * years, 0.0)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = trend(np.log(np.where(historical > 0, historical, np.nan)), half_life)[:, None]
+        rate = np.clip(rate, np.log1p(-MAX_YEARLY_CHANGE), np.log1p(MAX_YEARLY_CHANGE))
+        values = last * np.exp(rate * years)
+    # no trend : the 2017 value, as in data.csv
+    return np.where(np.isfinite(values), values, last)
+
+
+def apply(store, method=METHOD, half_life=HALF_LIFE):
+    """``store`` with its 2018 and 2019 emissions estimated by ``method`` (the store itself for constant)."""
+    check(method)
+    if method == DEFAULT:
+        return store
+    recent = np.ascontiguousarray(estimate(store.historical, method, half_life))
+    recent.flags.writeable = False
+    return BudgetStore(store.countries, store.historical, store.per_capita, recent, store.population,
+                       store.total_kton_CO2, store.per_capita_CO2, nowcast=method)
+
+
+def tag(method=METHOD, half_life=HALF_LIFE):
+    """Suffix of the dataset version for cached outputs, empty for the default."""
+    return '' if method == DEFAULT else ':nowcast-{}-{:g}'.format(method, half_life)
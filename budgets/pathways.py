@@ -0,0 +1,249 @@
+# Shapes of the future emission pathway from 2020 onwards.
+#
+# Every pathway starts from the (rounded) 2019 emissions e0 and spends the
+# remaining national budget from 2020 onwards:
+#
+# - linear : the original Rahmstorf pathway, e0 - slope * t until depletion (engine.linear_pathway)
+# - exponential : a constant yearly reduction, e(t) = e0 * r ** t. The infinite
+#   geometric series, e0 * r / (1 - r) = B, gives r = B / (B + e0) in closed
+#   form; vectorized Newton steps then solve the series up to 2999,
+#   e0 * r * (1 - r ** 980) / (1 - r) = B. Budgets of 980 years of e0 or more
+#   cannot be spent by 2999 without emissions above e0 : their pathway stays at
+#   e0 (r = 1) and the rest of the budget is left after 2999.
+# - logistic : an S-curve, e(t) = e0 * (1 + exp(-a)) / (1 + exp(s * t - a)), which
+#   stays close to e0 and then drops around t = a / s. The steepness is
+#   s = LOGISTIC_STEEPNESS * e0 / B, so the drop scales with the years of
+#   constant emissions the budget allows, and a is solved in closed form for
+#   the continuous curve, then refined with vectorized Newton steps so the
+#   yearly values add up to B. Budgets without such a curve (less than a year
+#   of emissions, or not spent before 2999) fall back to the exponential shape.
+#
+# Exponential and logistic pathways are cut once they fall below 0.1 % of e0.
+# What the cut off years would have spent is spread over the remaining years
+# in proportion to their values (at most 0.1 % more each), so the pathways
+# keep decreasing, never exceed e0 and add up to B.
+#
+# The parameter solvers work on arrays of any shape (all countries x budgets
+# at once). The logistic Newton steps run on blocks of SOLVER_BLOCK budgets of
+# similar steepness, stop as soon as every budget of the block is solved and
+# leave out the years after the drop whose terms are below exp(-40), so a
+# block only covers the years it needs. `national` and `personal` build the
+# yearly values of one country without Python loops, `national_matrix` and
+# `personal_matrix` those of several countries at once as rows of a nan
+# padded matrix.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from budgets import engine
+
+MAX_YEARS = 980  # pathways are built from 2020 up to 2999
+EXPONENTIAL_CUTOFF = 0.001  # exponential pathways end below 0.1 % of the 2019 emissions
+LOGISTIC_STEEPNESS = 4.0
+NEWTON_STEPS = 6
+RATE_STEPS = 8  # Newton steps of the exponential rate (6 reach the float64 precision)
+MIN_LOG_RATE = 1e-12
+SOLVER_TOLERANCE = 1e-9  # relative difference between the yearly sum of a solved pathway and the budget
+SOLVER_BLOCK = 512  # budgets solved together by logistic_parameters
+NEGLIGIBLE_EXPONENT = 40.0
+
+
+def exponential_rate(emissions_2019, remaining_2020, years=MAX_YEARS):
+    """Yearly factor r of the exponential pathway whose first ``years`` values add up to ``remaining_2020``.
+
+    0 without a budget left, 1 (constant emissions) when ``years`` years of
+    e0 do not spend it. Newton steps on u = -ln(r), starting from the closed
+    form of the infinite series, solve sum(exp(-u * t)) = B / e0.
+    """
+    e0 = np.asarray(emissions_2019, dtype=np.float64)
+    b = np.asarray(remaining_2020, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        k = b / e0
+        # the infinite series sums to more than the first ``years`` values, so this u is above the solution
+        # and the first step goes below it; from there the steps increase u up to the solution
+        u = np.log1p(1 / k)
+        for _ in range(RATE_STEPS):
+            u = np.maximum(u, MIN_LOG_RATE)
+            growth, spent = np.expm1(u), -np.expm1(-u * years)  # exp(u) - 1 and 1 - r ** years, exact for small u
+            total = spent / growth
+            slope = (years * (1 - spent) * growth - (1 + growth) * spent) / growth ** 2
+            u = u - (total - k) / slope
+        r = np.exp(-np.maximum(u, MIN_LOG_RATE))
+        return np.where((b > 0) & (e0 > 0), np.where(k < years, r, 1.0), 0.0)
+
+
+def _logistic_offset(k):
+    # a solving (1 + exp(-a)) * ln(1 + exp(a)) = k, the integral of the continuous S-curve, by Newton's method;
+    # the left side grows from 1 (a -> -inf) to about a, so k <= 1 has no S-curve and gives a very negative a
+    k = np.maximum(k, 1 + 1e-9)
+    a = np.where(k > 2, k, np.log(np.expm1(k - 1)))
+    for _ in range(NEWTON_STEPS):
+        log1pexp = np.logaddexp(0, a)
+        value = (1 + np.exp(-a)) * log1pexp - k
+        a = a - value / (1 - np.exp(-a) * log1pexp)
+    return a
+
+
+def _logistic_sum(e0, s, a, t):
+    # yearly sum of the logistic pathways over ``t``, and the terms g of every year; the years after
+    # s * t - a > NEGLIGIBLE_EXPONENT add less than exp(-NEGLIGIBLE_EXPONENT) each and are left out
+    with np.errstate(invalid='ignore'):
+        last = np.ceil(np.nanmax((a + NEGLIGIBLE_EXPONENT) / s, initial=0))
+    t = t[:int(np.clip(last, 1, t.size))]
+    g = 1 / (1 + np.exp(s[:, None] * t - a[:, None]))
+    return e0 * (1 + np.exp(-a)) * g.sum(axis=1), g
+
+
+def _solve_logistic_block(e0, b, s, a, t):
+    # Newton steps on the yearly sum of one block of (1-d) pathways, the offsets and whether they add up to b
+    for _ in range(NEWTON_STEPS):
+        total, g = _logistic_sum(e0, s, a, t)
+        if np.all(np.abs(total / b - 1) <= SOLVER_TOLERANCE):
+            return a, True
+        slope = e0 * ((1 + np.exp(-a)) * (g * (1 - g)).sum(axis=1) - np.exp(-a) * g.sum(axis=1))
+        a = a - (total - b) / slope
+    total, _ = _logistic_sum(e0, s, a, t)
+    return a, np.abs(total / b - 1) <= SOLVER_TOLERANCE
+
+
+def logistic_parameters(emissions_2019, remaining_2020, steepness=LOGISTIC_STEEPNESS, years=MAX_YEARS):
+    """Steepness s and offset a of the logistic pathways whose first ``years`` values add up to ``remaining_2020``.
+
+    The continuous integral e0 * (1 + exp(-a)) * ln(1 + exp(a)) / s = B gives
+    the starting point (with B + e0 / 2 for the yearly sum), a few Newton steps
+    on the yearly sum itself make it exact.
+    """
+    e0, b = np.broadcast_arrays(np.asarray(emissions_2019, dtype=np.float64),
+                                np.asarray(remaining_2020, dtype=np.float64))
+    shape = e0.shape
+    e0, b = e0.ravel(), b.ravel()
+    s = np.full(e0.shape, np.nan)
+    a = np.full(e0.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # no S-curve without emissions or a budget left, or when the budget lasts beyond ``years`` years
+        # of e0 (every yearly value of the S-curve is below e0)
+        rows = np.flatnonzero((b > 0) & (e0 > 0) & (b < years * e0))
+        # blocks of similar steepness, which need similar numbers of years
+        rows = rows[np.argsort(e0[rows] / b[rows], kind='stable')]
+        s[rows] = steepness * e0[rows] / b[rows]
+        a[rows] = _logistic_offset(steepness * (1 + e0[rows] / (2 * b[rows])))
+        t = np.arange(1, years + 1, dtype=np.float64)
+        for start in range(0, rows.size, SOLVER_BLOCK):
+            block = rows[start:start + SOLVER_BLOCK]
+            offset, solved = _solve_logistic_block(e0[block], b[block], s[block], a[block], t)
+            # no S-curve when the first year alone spends the budget, or when it would not drop within ``years``
+            s[block] = np.where(solved, s[block], np.nan)
+            a[block] = np.where(solved, offset, np.nan)
+    return s.reshape(shape), a.reshape(shape)
+
+
+def _cut(emissions, e0):
+    # rows of decreasing yearly values cut once below EXPONENTIAL_CUTOFF of ``e0``, nan after the cut; the cut off
+    # values are spread over the kept ones in proportion, so every row keeps its sum
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kept = emissions >= EXPONENTIAL_CUTOFF * np.asarray(e0, dtype=np.float64)[..., None]
+        scale = emissions.sum(axis=-1) / np.where(kept, emissions, 0).sum(axis=-1)
+        return np.where(kept, emissions * scale[..., None], np.nan)
+
+
+def _start(budget):
+    return round(float(budget.emissions_2019), 2)
+
+
+class Pathway(object):
+    """Yearly national emissions from 2020 onwards for one Budgets tuple (see engine.compute)."""
+
+    name = ''
+    label = ''
+
+    def national(self, budget):
+        raise NotImplementedError
+
+    def personal(self, budget, population):
+        """Yearly emissions per person (t CO2) from 2020 onwards."""
+        return 1000000 * self.national(budget) / round(float(population), 2)
+
+    def national_matrix(self, budgets, years=MAX_YEARS):
+        """Yearly national emissions from 2020 of every country in ``budgets`` (1-d fields), nan after the pathway."""
+        raise NotImplementedError
+
+    def personal_matrix(self, budgets, population, years=MAX_YEARS):
+        population = np.round(np.asarray(population, dtype=np.float64), 2)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 1000000 * self.national_matrix(budgets, years) / population
+
+
+class Linear(Pathway):
+    name = 'linear'
+    label = 'Linear decrease'
+
+    def national(self, budget):
+        return engine.linear_pathway(budget.emissions_2019, budget.slope, budget.t_depletion)
+
+    def personal(self, budget, population):
+        # same arithmetic as the original personal graph
+        return engine.personal_pathway(budget.emissions_2019, budget.slope, budget.t_depletion, population)
+
+    def national_matrix(self, budgets, years=MAX_YEARS):
+        return engine.linear_pathways(budgets.emissions_2019, budgets.slope, budgets.t_depletion, years)
+
+    def personal_matrix(self, budgets, population, years=MAX_YEARS):
+        return engine.personal_pathways(budgets.emissions_2019, budgets.slope, budgets.t_depletion, population, years)
+
+
+class Exponential(Pathway):
+    name = 'exponential'
+    label = 'Constant yearly reduction'
+
+    def national(self, budget):
+        e0 = _start(budget)
+        r = float(exponential_rate(e0, budget.remaining_2020))
+        if r <= 0:
+            return np.empty(0)
+        emissions = _cut(e0 * r ** np.arange(1, MAX_YEARS + 1, dtype=np.float64), e0)
+        return emissions[np.isfinite(emissions)]
+
+    def national_matrix(self, budgets, years=MAX_YEARS):
+        e0 = np.round(np.asarray(budgets.emissions_2019, dtype=np.float64), 2)
+        r = exponential_rate(e0, budgets.remaining_2020, years)
+        t = np.arange(1, years + 1, dtype=np.float64)
+        return np.where(r[:, None] > 0, _cut(e0[:, None] * r[:, None] ** t, e0), np.nan)
+
+
+class Logistic(Pathway):
+    name = 'logistic'
+    label = 'S-curve'
+
+    def national(self, budget):
+        e0 = _start(budget)
+        s, a = logistic_parameters(e0, budget.remaining_2020)
+        if not np.isfinite(a):
+            # budgets below one year of emissions, or above a few hundred years, have no S-curve
+            return PATHWAYS[Exponential.name].national(budget)
+        t = np.arange(1, MAX_YEARS + 1, dtype=np.float64)
+        with np.errstate(over='ignore'):
+            emissions = _cut(e0 * (1 + np.exp(-a)) / (1 + np.exp(s * t - a)), e0)
+        return emissions[np.isfinite(emissions)]
+
+    def national_matrix(self, budgets, years=MAX_YEARS):
+        e0 = np.round(np.asarray(budgets.emissions_2019, dtype=np.float64), 2)
+        s, a = logistic_parameters(e0, budgets.remaining_2020)
+        t = np.arange(1, years + 1, dtype=np.float64)
+        with np.errstate(over='ignore', invalid='ignore'):
+            emissions = _cut(e0[:, None] * (1 + np.exp(-a[:, None])) / (1 + np.exp(s[:, None] * t - a[:, None])), e0)
+        # same fallback as national()
+        return np.where(np.isfinite(a)[:, None], emissions, PATHWAYS[Exponential.name].national_matrix(budgets, years))
+
+
+PATHWAYS = OrderedDict((pathway.name, pathway) for pathway in [Linear(), Exponential(), Logistic()])
+
+DEFAULT = Linear.name
+
+
+def get(name):
+    """Pathway by name, the default for None, ValueError for unknown names."""
+    try:
+        return PATHWAYS[name or DEFAULT]
+    except (KeyError, TypeError):
+        raise ValueError('unknown pathway {}, choose from {}'.format(name, ', '.join(PATHWAYS)))
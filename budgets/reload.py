@@ -0,0 +1,112 @@
+# Hot reload of the dataset in running workers.
+#
+# `DatasetWatcher` polls the modification time and size of data.csv (and of
+# its binary copy data.npz) from a daemon thread. When either changes, the new
+# dataset is loaded and validated in that thread while the workers keep
+# serving requests from the old one, then handed to `on_reload`, which swaps
+# it in (see app.py). A dataset that fails to load or validate is logged and
+# ignored until the files change again. Every reload logs its duration and is
+# counted in `stats()`.
+#
+# gunicorn --preload forks the workers after the import of app.py, and threads
+# do not survive a fork, so `start()` is called again from every worker and
+# starts one watcher thread per process.
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from budgets.dataset import default_npz_path, load_store
+
+logger = logging.getLogger(__name__)
+
+
+def validate(store):
+    """Raise ValueError when ``store`` cannot replace the dataset of a running app."""
+    if len(store) == 0:
+        raise ValueError('the dataset has no countries')
+    if len(store.index) != len(store):
+        raise ValueError('the dataset has duplicate countries')
+    for name in ('historical', 'per_capita', 'recent', 'population', 'total_kton_CO2', 'per_capita_CO2'):
+        values = getattr(store, name)
+        if values.shape[0] != len(store):
+            raise ValueError('{} has {} rows instead of {}'.format(name, values.shape[0], len(store)))
+    if not np.isfinite(store.historical[:, -1]).any():
+        raise ValueError('the dataset has no emissions for {}'.format(2017))
+
+
+class DatasetWatcher(object):
+    """Reload ``csv_path`` with ``load`` when it changes and pass the validated store to ``on_reload(store)``.
+
+    ``checks`` are more functions raising ValueError for a store that must not
+    be swapped in, after :func:`validate`.
+    """
+
+    def __init__(self, csv_path, on_reload, interval=5.0, load=load_store, checks=()):
+        self.csv_path = csv_path
+        self.npz_path = default_npz_path(csv_path)
+        self.on_reload = on_reload
+        self.interval = interval
+        self.load = load
+        self.checks = list(checks)
+        self.reloads = 0
+        self.errors = 0
+        self.last_seconds = None
+        self._signature = self.signature()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def signature(self):
+        # (mtime, size) of the dataset files, None for a missing file
+        result = []
+        for path in (self.csv_path, self.npz_path):
+            try:
+                stat = os.stat(path)
+                result.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                result.append(None)
+        return tuple(result)
+
+    def check(self):
+        """Reload when the files changed since the last check, returns True when a new store was swapped in."""
+        with self._lock:
+            signature = self.signature()
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            return self.reload()
+
+    def reload(self):
+        start = time.perf_counter()
+        try:
+            store = self.load(self.csv_path)
+            validate(store)
+            for check in self.checks:
+                check(store)
+            self.on_reload(store)
+        except Exception:
+            self.errors += 1
+            logger.exception('dataset %s not reloaded, keeping the current one', self.csv_path)
+            return False
+        self.reloads += 1
+        self.last_seconds = time.perf_counter() - start
+        logger.info('dataset %s reloaded in %.3f s : %d countries', self.csv_path, self.last_seconds, len(store))
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def start(self):
+        """Start the watcher thread of the current process (once per process)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name='dataset-watcher', daemon=True).start()
+
+    def stats(self):
+        return {'reloads': self.reloads, 'errors': self.errors, 'last_seconds': self.last_seconds}
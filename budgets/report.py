@@ -0,0 +1,170 @@
+# Batch report of national and personal budgets for every country.
+#
+#     python -m budgets.report data.csv report --budgets 420 580 1170 1500 --format csv parquet --figures png
+#
+# writes report/budgets.csv (and/or .parquet, needs pyarrow) with one row per
+# country and global budget, and optionally both figures of every row as
+# report/figures/<country>/<budget>-national.<png|svg> and
+# <budget>-personal.<png|svg> (needs kaleido). Countries are split into chunks
+# that worker processes compute, format and render independently, so a run
+# scales with the number of cores; `--budget-range 50 2500 1` reports the
+# whole grid of budgets accepted by the app.
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from budgets import engine, figures
+from budgets.dataset import load_store
+from budgets.export import CANONICAL_BUDGETS, slug
+
+COLUMNS = ['country', 'carbon_budget', 'population', 'country_budget_2016', 'emissions_2017', 'emissions_2019',
+           'remaining_2020', 'years_constant', 'years_linear', 'personal_emissions_2019', 'personal_budget_2020']
+
+_store = None
+
+
+def compute_columns(store, rows, budgets):
+    """Report columns for every (row, budget) pair, countries first, as flat arrays."""
+    result = engine.compute(store, rows[:, None], budgets[None, :])
+    shape = (len(rows), len(budgets))
+    population = store.population[rows][:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = {
+            'carbon_budget': budgets[None, :],
+            'population': population,
+            'country_budget_2016': result.country_budget_2016,
+            'emissions_2017': result.emissions_2017,
+            'emissions_2019': result.emissions_2019,
+            'remaining_2020': result.remaining_2020,
+            'years_constant': result.years_constant,
+            'years_linear': result.years_linear,
+            # tons CO2 per person
+            'personal_emissions_2019': 1000000 * result.emissions_2019 / population,
+            'personal_budget_2020': 1000000 * result.remaining_2020 / population,
+        }
+    columns = {'country': [store.countries[i] for i in rows.tolist() for _ in range(len(budgets))]}
+    columns.update((name, np.broadcast_to(value, shape).ravel()) for name, value in values.items())
+    return columns
+
+
+def _csv(columns):
+    # CSV lines of a chunk, missing values as empty fields
+    names = ['"{}"'.format(country.replace('"', '""')) for country in columns['country']]
+    numbers = [[repr(v) if math.isfinite(v) else '' for v in columns[name].tolist()] for name in COLUMNS[1:]]
+    return ''.join(','.join(fields) + '\n' for fields in zip(names, *numbers))
+
+
+def _init_worker(csv_path):
+    global _store
+    _store = load_store(csv_path)
+    figures.TYPED_ARRAYS = False  # kaleido draws plain lists
+
+
+def _report_chunk(args):
+    # runs in a worker process : CSV text and / or columns of a chunk of countries
+    rows, budgets, formats = args
+    columns = compute_columns(_store, rows, budgets)
+    return columns if 'parquet' in formats else None, _csv(columns) if 'csv' in formats else None
+
+
+def _figures_chunk(args):
+    # runs in a worker process : figure files of a chunk of countries
+    import plotly.io as pio
+
+    rows, budgets, directory, formats = args
+    count = 0
+    for i in rows.tolist():
+        country = _store.countries[i]
+        country_directory = os.path.join(directory, slug(country))
+        os.makedirs(country_directory, exist_ok=True)
+        for carbon_budget in budgets.tolist():
+            budget = engine.compute(_store, i, carbon_budget)
+            for name, figure in (('national', figures.national_figure(_store, i, budget, country)),
+                                 ('personal', figures.personal_figure(_store, i, budget, country))):
+                for fmt in formats:
+                    pio.write_image(figure, os.path.join(country_directory, '{:g}-{}.{}'.format(carbon_budget, name, fmt)),
+                                    format=fmt)
+                    count += 1
+    return count
+
+
+def write_parquet(path, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.table({name: columns[name] for name in COLUMNS}), path)
+
+
+def report(csv_path, output, budgets, formats=('csv',), figure_formats=(), workers=None):
+    """Write the report files to ``output``, returns the number of rows and of figure files."""
+    store = load_store(csv_path)
+    budgets = np.asarray(budgets, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    # a few chunks per worker to balance the load, in country order
+    chunks = [rows for rows in np.array_split(np.arange(len(store)), 4 * workers) if rows.size]
+    os.makedirs(output, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(csv_path,)) as pool:
+        figure_jobs = pool.map(_figures_chunk, [(rows, budgets, os.path.join(output, 'figures'), figure_formats)
+                                                for rows in chunks]) if figure_formats else []
+        results = list(pool.map(_report_chunk, [(rows, budgets, formats) for rows in chunks]))
+        figure_count = sum(figure_jobs)
+
+    if 'csv' in formats:
+        with open(os.path.join(output, 'budgets.csv'), 'w', encoding='utf-8') as f:
+            f.write(','.join(COLUMNS) + '\n')
+            for _, text in results:
+                f.write(text)
+    if 'parquet' in formats:
+        columns = {name: [value for chunk, _ in results for value in chunk[name]] for name in COLUMNS[:1]}
+        columns.update((name, np.concatenate([chunk[name] for chunk, _ in results])) for name in COLUMNS[1:])
+        write_parquet(os.path.join(output, 'budgets.parquet'), columns)
+    return len(store) * len(budgets), figure_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report national and personal budgets for every country.')
+    parser.add_argument('data', nargs='?', default='data.csv', help='dataset, default data.csv')
+    parser.add_argument('output', nargs='?', default='report', help='output directory, default report')
+    parser.add_argument('--budgets', type=float, nargs='+', default=CANONICAL_BUDGETS)
+    parser.add_argument('--budget-range', type=float, nargs=3, metavar=('MIN', 'MAX', 'STEP'),
+                        help='every budget from MIN to MAX (included), instead of --budgets')
+    parser.add_argument('--format', nargs='+', default=['csv'], help='csv and/or parquet')
+    parser.add_argument('--figures', nargs='*', default=[], help='also render the figures as png and/or svg')
+    parser.add_argument('--workers', type=int, help='worker processes, default one per core')
+    args = parser.parse_args()
+
+    for fmt in args.format:
+        if fmt not in ('csv', 'parquet'):
+            parser.error('unknown format {}, choose from csv, parquet'.format(fmt))
+    for fmt in args.figures:
+        if fmt not in ('png', 'svg'):
+            parser.error('unknown figure format {}, choose from png, svg'.format(fmt))
+    if 'parquet' in args.format:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error('--format parquet needs pyarrow (pip install pyarrow)')
+    if args.figures:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error('--figures needs kaleido (pip install kaleido)')
+
+    budgets = args.budgets
+    if args.budget_range:
+        low, high, step = args.budget_range
+        budgets = np.arange(low, high + step / 2, step)
+
+    start = time.perf_counter()
+    rows, figure_count = report(args.data, args.output, budgets, args.format, args.figures, args.workers)
+    print('{} rows, {} figures in {:.2f} s'.format(rows, figure_count, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Columnar, load-time view of the budget dataset.
+#
+# The callbacks in app.py only ever need a handful of scalars and two year
+# ranges for a single country. Instead of scanning `df_budget` with a boolean
+# mask for every value, the dataset is converted once into contiguous float64
+# arrays and a country -> row index map, so a lookup is a dict access plus an
+# array index.
+
+import numpy as np
+
+HISTORICAL_YEARS = list(range(1970, 2018))  # EDGAR emissions, Mton CO2
+PER_CAPITA_YEARS = list(range(1990, 2018))  # per capita emissions, t CO2
+RECENT_YEARS = [2018, 2019]  # assumed equal to 2017 in data.csv, or estimated by nowcast.py
+
+
+def _matrix(df, columns):
+    # contiguous, read-only float64 block so it can be shared safely between threads
+    values = np.ascontiguousarray(df[columns].to_numpy(dtype=np.float64))
+    values.flags.writeable = False
+    return values
+
+
+class BudgetStore(object):
+    """Per-country arrays of the budget dataset, indexed by row.
+
+    Row ``i`` of every array belongs to ``countries[i]``; use :meth:`row` or
+    :meth:`rows` to translate country names into row indices.
+    """
+
+    def __init__(self, countries, historical, per_capita, recent,
+                 population, total_kton_CO2, per_capita_CO2, nowcast=None):
+        self.countries = list(countries)
+        self.index = {country: i for i, country in enumerate(self.countries)}
+        self.historical = historical  # (n, 48) : 1970 - 2017
+        self.per_capita = per_capita  # (n, 28) : capita_1990 - capita_2017
+        self.recent = recent  # (n, 2) : 2018 - 2019
+        self.population = population
+        self.total_kton_CO2 = total_kton_CO2
+        self.per_capita_CO2 = per_capita_CO2
+        self.nowcast = nowcast  # method of nowcast.py that estimated `recent`, None : read from data.csv
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the store from a DataFrame shaped like data.csv."""
+        return cls(
+            countries=df['country'].tolist(),
+            historical=_matrix(df, [str(year) for year in HISTORICAL_YEARS]),
+            per_capita=_matrix(df, ['capita_{}'.format(year) for year in PER_CAPITA_YEARS]),
+            recent=_matrix(df, [str(year) for year in RECENT_YEARS]),
+            population=_matrix(df, ['population'])[:, 0],
+            total_kton_CO2=_matrix(df, ['total_kton_CO2'])[:, 0],
+            per_capita_CO2=_matrix(df, ['per_capita_CO2'])[:, 0],
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        import pandas as pd  # only needed when parsing the CSV, see dataset.py
+        return cls.from_frame(pd.read_csv(path))
+
+    def __len__(self):
+        return len(self.countries)
+
+    def row(self, country):
+        """Row index of a single country, raises KeyError if unknown."""
+        return self.index[country]
+
+    def rows(self, countries):
+        """Integer array of row indices for a sequence of countries."""
+        return np.fromiter((self.index[country] for country in countries),
+                           dtype=np.intp, count=len(countries))
+
+    def emissions(self, i, year):
+        """Emissions (Mton CO2) of row ``i`` in a historical or recent year."""
+        if year in RECENT_YEARS:
+            return float(self.recent[i, year - RECENT_YEARS[0]])
+        return float(self.historical[i, year - HISTORICAL_YEARS[0]])
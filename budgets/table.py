@@ -0,0 +1,139 @@
+# Precomputed country x budget table.
+#
+# The app only accepts integer global budgets from 50 to 2500 Gt CO2, so the
+# engine can be evaluated ahead of time for every (country, budget) pair. The
+# result is written as one float64 .npy array of shape (fields, countries,
+# budgets) next to a small JSON file describing it. The values are those of
+# the engine bit for bit : the figures truncate t_depletion and round to 2
+# decimals, and float32 changed the displayed values (and the number of
+# future bars) of a few percent of the cases. The server memory-maps the
+# array, so a callback becomes an index lookup and all gunicorn workers share
+# the same pages from the OS page cache.
+#
+# Build it with:
+#
+#     python -m budgets.table data.csv budget_table
+#
+# A table is built for one nowcast of the 2018 and 2019 emissions (--nowcast
+# and --nowcast-half-life, see nowcast.py) and only loaded by an app using the
+# same method and half-life.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from budgets import engine, nowcast
+from budgets.store import BudgetStore
+
+MIN_BUDGET = 50
+MAX_BUDGET = 2500
+
+# budget dependent fields of engine.Budgets, the per country emissions come from the store
+FIELDS = ['country_budget_2016', 'remaining_2019', 'remaining_2020', 'years_constant',
+          'slope', 't_depletion', 'years_linear']
+
+
+def build_table(store, min_budget=MIN_BUDGET, max_budget=MAX_BUDGET):
+    """Evaluate the engine for every country and integer budget, shape (fields, countries, budgets)."""
+    budgets = engine.grid(store, np.arange(min_budget, max_budget + 1, dtype=np.float64))
+    return np.stack([getattr(budgets, field) for field in FIELDS]).astype(np.float64)
+
+
+def nowcast_tag(store, half_life=nowcast.HALF_LIFE):
+    """nowcast.tag() of the 2018 and 2019 emissions of ``store``, estimated with ``half_life``."""
+    return nowcast.tag(store.nowcast or nowcast.DEFAULT, half_life)
+
+
+def write_table(path, store, min_budget=MIN_BUDGET, max_budget=MAX_BUDGET, half_life=nowcast.HALF_LIFE):
+    """Write ``<path>.npy`` and ``<path>.json``, returns the table.
+
+    ``half_life`` is the one ``store`` was nowcast with, recorded with the method.
+    """
+    table = build_table(store, min_budget, max_budget)
+    np.save(path + '.npy', table)
+    with open(path + '.json', 'w') as f:
+        json.dump({'fields': FIELDS, 'countries': store.countries,
+                   'min_budget': min_budget, 'max_budget': max_budget,
+                   'dtype': table.dtype.name, 'nowcast': nowcast_tag(store, half_life)}, f)
+    return table
+
+
+class BudgetTable(object):
+    """Memory-mapped table written by :func:`write_table`."""
+
+    def __init__(self, store, values, min_budget, max_budget):
+        self.store = store
+        self.values = values
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+
+    @classmethod
+    def load(cls, path, store, half_life=nowcast.HALF_LIFE):
+        """Map ``<path>.npy``, raises ValueError if it was built from another dataset or nowcast, or in float32.
+
+        The nowcast is the method of ``store`` with ``half_life`` (NOWCAST_HALF_LIFE by default).
+        """
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        if (meta['countries'] != store.countries or meta['fields'] != FIELDS
+                or (meta.get('nowcast') or '') != nowcast_tag(store, half_life)):
+            raise ValueError('budget table {} does not match the loaded dataset and nowcast'.format(path))
+        values = np.load(path + '.npy', mmap_mode='r')
+        if values.dtype != np.float64:
+            raise ValueError('budget table {} holds {} values, rebuild it (python -m budgets.table)'.format(
+                path, values.dtype))
+        return cls(store, values, meta['min_budget'], meta['max_budget'])
+
+    def verify(self, carbon_budget=580):
+        """Raise ValueError if the table values of ``carbon_budget`` differ from the engine on the loaded dataset."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = engine.compute(self.store, np.arange(len(self.store)), carbon_budget)
+        values = self.values[:, :, int(carbon_budget) - self.min_budget]
+        for field, column in zip(FIELDS, values):
+            if not np.array_equal(column, getattr(expected, field), equal_nan=True):
+                raise ValueError('budget table does not match the loaded dataset ({} of a {} Gt budget)'.format(
+                    field, carbon_budget))
+
+    def layer(self, field, carbon_budget):
+        """``field`` of every country for an integer budget in range, or None so the caller can fall back to the engine."""
+        if carbon_budget != int(carbon_budget) or not self.min_budget <= carbon_budget <= self.max_budget:
+            return None
+        return self.values[FIELDS.index(field), :, int(carbon_budget) - self.min_budget].astype(np.float64)
+
+    def lookup(self, i, carbon_budget):
+        """Budgets of row ``i`` for an integer budget in range, or None so the caller can fall back to the engine."""
+        if carbon_budget != int(carbon_budget) or not self.min_budget <= carbon_budget <= self.max_budget:
+            return None
+        values = self.values[:, i, int(carbon_budget) - self.min_budget].astype(np.float64)
+        return engine.Budgets(
+            emissions_2017=self.store.historical[i, -1],
+            emissions_2019=np.round(self.store.recent[i, 1], 2),
+            **dict(zip(FIELDS, values)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute budgets for every country and global budget.')
+    parser.add_argument('data', help='dataset, e.g. data.csv')
+    parser.add_argument('output', help='output path without extension, writes <output>.npy and <output>.json')
+    parser.add_argument('--min-budget', type=int, default=MIN_BUDGET)
+    parser.add_argument('--max-budget', type=int, default=MAX_BUDGET)
+    parser.add_argument('--nowcast', default=nowcast.METHOD, choices=nowcast.METHODS,
+                        help='2018 and 2019 emissions used by the app (NOWCAST), default {}'.format(nowcast.METHOD))
+    parser.add_argument('--nowcast-half-life', type=float, default=nowcast.HALF_LIFE,
+                        help='half-life of the nowcast weights used by the app (NOWCAST_HALF_LIFE), default {:g}'.format(
+                            nowcast.HALF_LIFE))
+    args = parser.parse_args()
+
+    store = nowcast.apply(BudgetStore.from_csv(args.data), args.nowcast, args.nowcast_half_life)
+    start = time.perf_counter()
+    table = write_table(args.output, store, args.min_budget, args.max_budget, args.nowcast_half_life)
+    elapsed = time.perf_counter() - start
+    print('{} fields x {} countries x {} budgets in {:.3f} s, {:.1f} MB'.format(
+        table.shape[0], table.shape[1], table.shape[2], elapsed, os.path.getsize(args.output + '.npy') / 1e6))
+
+
+if __name__ == '__main__':
+    main()
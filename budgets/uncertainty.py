@@ -0,0 +1,101 @@
+# Monte Carlo uncertainty of national budgets.
+#
+# The global budget is only known with a large uncertainty, and the 2018 and
+# 2019 emissions are copied from 2017 (or estimated, see nowcast.py). `sample`
+# draws the global budget from a log-normal distribution around the selected
+# value (the spread of the IPCC SR1.5 budgets) and optionally perturbs the
+# 2018 / 2019 emissions with a yearly growth rate, then evaluates the engine
+# for all samples at once.
+# `summarize` reduces the samples to percentiles of the depletion years and
+# percentile bands of the linear national pathway, drawn as fan bands on the
+# national graph.
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from budgets import engine
+
+SAMPLES = 100000
+PERCENTILES = (5, 17, 50, 83, 95)  # 90 % and 66 % ranges around the median
+
+# SR1.5 : 1.5 °C budgets of 840 / 580 / 420 Gt CO2 for a 33 / 50 / 67 % chance,
+# i.e. a log-normal spread of ln(840 / 420) / (2 * z(0.67))
+BUDGET_SIGMA = math.log(840 / 420) / (2 * 0.4399)
+EMISSIONS_GROWTH_SD = 0.02  # yearly growth of national emissions after 2017, standard deviation
+
+MAX_YEARS = 980  # bands are computed from 2020 up to 2999, like the displayed pathways
+BAND_YEARS = 64  # percentiles are evaluated in at most this many years and interpolated in between
+
+Uncertainty = namedtuple('Uncertainty', [
+    'percentiles',  # PERCENTILES
+    'depletion_constant',  # year the budget is depleted at constant emissions, per percentile
+    'depletion_linear',  # year the budget is depleted when linearly decreasing emissions, per percentile
+    'bands',  # national emissions from 2020 onwards, shape (percentiles, years)
+])
+
+
+def sample(store, i, carbon_budget, samples=SAMPLES, vary_emissions=True, seed=0, allocation=None):
+    """Budgets of country row ``i`` for ``samples`` draws of the global budget (and 2018 / 2019 emissions)."""
+    rng = np.random.default_rng(seed)
+    carbon_budgets = carbon_budget * np.exp(BUDGET_SIGMA * rng.standard_normal(samples))
+    emissions_2018, emissions_2019 = store.recent[i]
+    if vary_emissions:
+        growth = 1 + EMISSIONS_GROWTH_SD * rng.standard_normal((2, samples))
+        emissions_2018 = emissions_2018 * growth[0]
+        emissions_2019 = emissions_2019 * growth[0] * growth[1]
+    allocate = allocation.country_budget_2016 if allocation is not None else engine.country_budget_2016
+    with np.errstate(divide='ignore', invalid='ignore'):  # countries without emissions data give nan
+        return engine.from_budget_2016(allocate(store, i, carbon_budgets),
+                                       store.historical[i, -2], store.historical[i, -1], emissions_2018, emissions_2019)
+
+
+def _percentiles(values, percentiles):
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.full(len(percentiles), np.nan)
+    return np.percentile(values, percentiles)
+
+
+def pathway_bands(budgets, percentiles=PERCENTILES, max_years=MAX_YEARS):
+    """Percentiles of the yearly emissions from 2020 of every sampled linear pathway, shape (percentiles, years).
+
+    A sample emits ``emissions_2019 - slope * t`` in year 2019 + t until
+    ``t_depletion`` and nothing afterwards (see engine.linear_pathway). The
+    bands end when the highest percentile reaches zero. Percentiles over all
+    samples are taken in at most BAND_YEARS evenly spaced years, which keeps
+    long pathways fast; the bands are smooth and interpolated in between.
+    """
+    start = np.round(budgets.emissions_2019, 2)
+    slope = np.round(budgets.slope, 2)
+    years = np.floor(budgets.t_depletion)  # t = 1 .. years - 1 have emissions
+    valid = np.isfinite(years)
+    if not valid.any():
+        return np.empty((len(percentiles), 0))
+    start, slope, years = start[valid], slope[valid], years[valid]
+
+    horizon = int(np.clip(np.percentile(years, max(percentiles)) - 1, 0, max_years))
+    if horizon == 0:
+        return np.empty((len(percentiles), 0))
+    t = np.unique(np.round(np.linspace(1, horizon, min(horizon, BAND_YEARS))))
+    # (years, samples), so every percentile is taken over a contiguous row
+    emissions = np.where(t[:, None] < years[None, :], start[None, :] - slope[None, :] * t[:, None], 0.0)
+    evaluated = np.percentile(emissions, percentiles, axis=1)
+    every_year = np.arange(1, horizon + 1, dtype=np.float64)
+    return np.array([np.interp(every_year, t, band) for band in evaluated])
+
+
+def summarize(budgets, percentiles=PERCENTILES, max_years=MAX_YEARS):
+    """Depletion year percentiles and pathway bands of sampled budgets."""
+    return Uncertainty(
+        percentiles=percentiles,
+        depletion_constant=2020 + _percentiles(budgets.years_constant, percentiles),
+        depletion_linear=2020 + _percentiles(budgets.years_linear, percentiles),
+        bands=pathway_bands(budgets, percentiles, max_years),
+    )
+
+
+def analyze(store, i, carbon_budget, samples=SAMPLES, vary_emissions=True, seed=0, allocation=None):
+    """Monte Carlo summary of country row ``i`` around ``carbon_budget``."""
+    return summarize(sample(store, i, carbon_budget, samples, vary_emissions, seed, allocation))
@@ -0,0 +1,16 @@
+# The app and the command line tools read data.csv from the repository root.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope='session')
+def store():
+    from budgets.dataset import load_store
+    return load_store(os.path.join(ROOT, 'data.csv'))
@@ -0,0 +1,54 @@
+# /api/budgets through the Flask test client.
+
+import json
+
+import pytest
+
+from budgets import api, engine
+
+
+@pytest.fixture(scope='module')
+def client():
+    import app
+    return app.create_app('combined', coalescer=None).server.test_client()
+
+
+def test_rows_match_engine(client, store):
+    response = client.get('/api/budgets?countries=Belgium;Germany&budgets=420,580,1170')
+    assert response.status_code == 200
+    rows = json.loads(response.data)
+    assert [(row['country'], row['carbon_budget']) for row in rows] == [
+        (country, budget) for country in ('Belgium', 'Germany') for budget in (420, 580, 1170)]
+    for row in rows:
+        expected = engine.compute(store, store.index[row['country']], row['carbon_budget'])
+        assert row['remaining_2020'] == pytest.approx(float(expected.remaining_2020))
+
+
+def test_chunks_cover_every_country(client, store, monkeypatch):
+    monkeypatch.setattr(api, 'CHUNK_ROWS', 7)  # 3 countries per chunk of 2 budgets
+    response = client.get('/api/budgets?format=csv&budgets=420,580')
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1 + 2 * len(store)
+    assert lines[-1].startswith('"{}",580.0,'.format(store.countries[-1]))
+
+
+@pytest.mark.parametrize('body', [
+    {'countries': [['Belgium']], 'budgets': [580]},
+    {'countries': ['Belgium'], 'budgets': [True]},
+    {'countries': ['Belgium'], 'budgets': [[580]]},
+    {'countries': ['Belgium'], 'budgets': ['a lot']},
+    {'countries': ['Belgium'], 'budgets': [float('inf')]},
+    {'countries': 'Belgium', 'budgets': [580]},
+    ['Belgium'],
+])
+def test_invalid_json_is_a_bad_request(client, body):
+    response = client.post('/api/budgets', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_grid_size_is_limited(client, store, monkeypatch):
+    monkeypatch.setattr(api, 'MAX_ROWS', 2 * len(store))
+    assert client.get('/api/budgets?budgets=420,580').status_code == 200
+    assert client.get('/api/budgets?budgets=420,580,1170').status_code == 400
+    assert client.get('/api/budgets?countries=Belgium&budgets=420,580,1170').status_code == 200
@@ -0,0 +1,58 @@
+# budgets/build.py on small raw EDGAR and World Bank files (tests/data), against data.csv.
+
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from budgets import build
+from budgets.dataset import default_npz_path
+from budgets.store import HISTORICAL_YEARS, RECENT_YEARS
+from conftest import ROOT
+
+DATA = os.path.join(ROOT, 'tests', 'data')
+
+
+def run_build(directory):
+    output = os.path.join(str(directory), 'data.csv')
+    build.build(os.path.join(DATA, 'edgar.csv'), os.path.join(DATA, 'population.csv'), output,
+                names_path=os.path.join(DATA, 'names.csv'), chunksize=3, edgar_year_prefix='Y_')
+    return output
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return {row['country']: row for row in csv.DictReader(f)}
+
+
+@pytest.fixture(scope='module')
+def built(tmp_path_factory):
+    return run_build(tmp_path_factory.mktemp('build'))
+
+
+def test_build_is_reproducible(built, tmp_path):
+    again = run_build(tmp_path)
+    for path, other in ((built, again), (default_npz_path(built), default_npz_path(again))):
+        with open(path, 'rb') as f, open(other, 'rb') as g:
+            assert f.read() == g.read()
+
+
+def test_build_joins_and_adds_up_countries(built):
+    # sector rows added up, France and Monaco joined through names.csv, rows without a match dropped
+    assert list(read(built)) == ['Afghanistan', 'Belgium', 'France and Monaco', 'Germany']
+
+
+def test_historical_columns_match_data_csv(built):
+    rows, expected = read(built), read(os.path.join(ROOT, 'data.csv'))
+    for country, row in rows.items():
+        for year in HISTORICAL_YEARS + RECENT_YEARS + ['population']:
+            assert float(row[str(year)]) == float(expected[country][str(year)]), (country, year)
+
+
+def test_2016_totals_are_derived_from_edgar(built):
+    # unlike the sheet values of data.csv (see the README)
+    for row in read(built).values():
+        assert float(row['total_kton_CO2']) == pytest.approx(1000 * float(row['2016']))
+        assert float(row['per_capita_CO2']) == float(row['capita_2016'])
+        assert float(row['capita_2016']) == np.round(1e6 * float(row['2016']) / float(row['population']), 2)
@@ -0,0 +1,23 @@
+# assets/budgets.js against the Python engine, for every country (needs node).
+
+import shutil
+
+import pytest
+
+from budgets import clientside, nowcast
+
+BUDGETS = [50, 420, 580, 1170, 1500, 2500]
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+def test_budgets_js_matches_engine(store):
+    failures, count = clientside.compare(store, BUDGETS)
+    assert count == len(store) * len(BUDGETS)
+    assert failures == []
+
+
+@pytest.mark.parametrize('method', ['linear', 'growth'])
+def test_budgets_js_matches_engine_with_nowcast(store, method):
+    failures, _ = clientside.compare(nowcast.apply(store, method), [580])
+    assert failures == []
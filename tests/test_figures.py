@@ -0,0 +1,16 @@
+# Figure builders (budgets/figures.py).
+
+import pytest
+
+from budgets import engine, figures, pathways, uncertainty
+
+
+@pytest.mark.parametrize('name', list(pathways.PATHWAYS))
+def test_uncertainty_bands_follow_the_linear_pathway_only(store, name):
+    i = store.row('Belgium')
+    budget = engine.compute(store, i, 580)
+    spread = uncertainty.analyze(store, i, 580, samples=1000)
+    pathway = pathways.get(name) if name != pathways.DEFAULT else None
+    traces = figures.national_figure(store, i, budget, 'Belgium', spread, pathway)['data']
+    bands = [trace for trace in traces if trace['name'] not in ('Historical', 'Recent', 'Future')]
+    assert bool(bands) == (pathway is None)
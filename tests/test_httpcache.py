@@ -0,0 +1,47 @@
+# ETags, 304 responses and compression (budgets/httpcache.py) through the Flask test client.
+
+import gzip
+
+import pytest
+
+from budgets import httpcache
+
+API = '/api/budgets?budgets=420,580,1170'
+
+
+@pytest.fixture(scope='module')
+def client():
+    import app
+    dash_app = app.create_app('combined', coalescer=None)
+    httpcache.HTTPCache(enabled=True, get_version=lambda: app.dataset.version).register(dash_app.server)
+    return dash_app.server.test_client()
+
+
+@pytest.mark.parametrize('path', ['/_dash-layout', API])
+@pytest.mark.parametrize('encoding', httpcache.encodings() + [None])
+def test_revalidation_is_an_empty_304(client, path, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(path, headers=headers)
+    response.get_data()
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    revalidated = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == etag
+    assert client.get(path, headers=dict(headers, **{'If-None-Match': '"other"'})).status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/_dash-layout', API])
+@pytest.mark.parametrize('encoding', httpcache.encodings())
+def test_compressed_bodies_are_smaller(client, path, encoding):
+    identity = client.get(path).get_data()
+    response = client.get(path, headers={'Accept-Encoding': encoding})
+    body = response.get_data()
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(body) < len(identity)
+    if encoding == 'gzip':
+        assert gzip.decompress(body) == identity
+    else:
+        assert httpcache.brotli.decompress(body) == identity
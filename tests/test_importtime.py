@@ -0,0 +1,18 @@
+# The heavy modules stay out of `import app` in the default configuration (see benchmarks/importtime.py).
+
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+DEFERRED = ['pandas', 'plotly.graph_objs']
+
+
+@pytest.mark.parametrize('module', DEFERRED)
+def test_import_app_defers(module):
+    code = 'import sys, app; print({!r} in sys.modules)'.format(module)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == 'False'
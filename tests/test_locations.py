@@ -0,0 +1,49 @@
+# ISO-3 locations of the world map (budgets/locations.py).
+
+import os
+import re
+
+import pytest
+from dash import dcc
+
+from budgets import figures, locations
+
+
+@pytest.fixture(scope='module')
+def plotly_codes():
+    # the ISO-3 codes plotly.js knows, keys of the country table in its bundle
+    with open(os.path.join(os.path.dirname(dcc.__file__), 'plotly.min.js'), encoding='utf-8') as f:
+        table = re.search(r'\{AFG:"afghan".*?\}', f.read()).group(0)
+    return set(re.findall(r'\b([A-Z]{3}):"', table))
+
+
+def test_every_country_has_a_valid_code(store, plotly_codes):
+    for country in store.countries:
+        if country in locations.AGGREGATES:
+            continue
+        codes = locations.CODES.get(country, ())
+        assert codes, country
+        assert set(codes) <= plotly_codes, country
+
+
+def test_merged_rows_cover_every_country(store):
+    codes, rows = locations.locations(store.countries)
+    drawn = dict(zip(codes, (store.countries[row] for row in rows)))
+    assert len(drawn) == len(codes)
+    for code in ('ITA', 'SMR', 'VAT'):
+        assert drawn[code] == 'Italy, San Marino and the Holy See'
+    for code, country in (('ESP', 'Spain and Andorra'), ('CHE', 'Switzerland and Liechtenstein'),
+                          ('SDN', 'Sudan and South Sudan'), ('SSD', 'Sudan and South Sudan'),
+                          ('SRB', 'Serbia and Montenegro'), ('MNE', 'Serbia and Montenegro')):
+        assert drawn[code] == country
+
+
+def test_world_map_values_follow_the_locations(store):
+    values = [float(n) for n in range(len(store))]
+    figure = figures.world_map_figure(store.countries, values, 580, 'years_constant')
+    trace = figure['data'][0]
+    assert trace['locationmode'] == 'ISO-3'
+    assert len(trace['locations']) == len(trace['z']) == len(trace['text'])
+    for code, country, z in zip(trace['locations'], trace['text'], trace['z']):
+        assert z == store.index[country]
+        assert code in locations.CODES[country]
@@ -0,0 +1,65 @@
+# Every pathway shape spends the remaining budget, for one country and as a matrix.
+
+import numpy as np
+import pytest
+
+from budgets import engine, pathways
+
+BUDGETS = [50, 420, 580, 1170, 2500]
+
+
+@pytest.mark.parametrize('name', ['exponential', 'logistic'])
+def test_national_adds_up_to_remaining_budget(store, name):
+    pathway = pathways.get(name)
+    for i in range(len(store)):
+        for carbon_budget in BUDGETS:
+            budget = engine.compute(store, i, carbon_budget)
+            values = pathway.national(budget)
+            if values.size:
+                # budgets of more than MAX_YEARS years of the 2019 emissions are not spent by 2999
+                spent = min(float(budget.remaining_2020), pathways.MAX_YEARS * round(float(budget.emissions_2019), 2))
+                assert values.size <= pathways.MAX_YEARS
+                assert values.sum() == pytest.approx(spent, rel=1e-6)
+
+
+@pytest.mark.parametrize('name', ['exponential', 'logistic'])
+def test_matrix_matches_national(store, name):
+    pathway = pathways.get(name)
+    rows = np.arange(len(store))
+    budgets = engine.compute(store, rows, 2500)
+    matrix = pathway.national_matrix(budgets)
+    for i in rows:
+        values = pathway.national(engine.compute(store, i, 2500))
+        np.testing.assert_allclose(matrix[i, :values.size], values, rtol=1e-5)
+        assert np.isnan(matrix[i, values.size:]).all()
+
+
+@pytest.mark.parametrize('name', ['exponential', 'logistic'])
+@pytest.mark.parametrize('carbon_budget', [50, 2500])
+def test_pathways_decrease_from_2019(store, name, carbon_budget):
+    pathway = pathways.get(name)
+    budgets = engine.compute(store, np.arange(len(store)), carbon_budget)
+    e0 = np.round(budgets.emissions_2019, 2)
+    matrix = pathway.national_matrix(budgets)
+    for i in range(len(store)):
+        values = pathway.national(engine.compute(store, i, carbon_budget))
+        if values.size:
+            assert values[0] <= e0[i] and values[-1] <= e0[i]
+            assert (np.diff(values) <= 0).all(), store.countries[i]
+    with np.errstate(invalid='ignore'):
+        assert not (matrix > e0[:, None] * (1 + 1e-12)).any()
+        assert not (np.diff(matrix, axis=1) > 0).any()
+
+
+def test_logistic_parameters_of_a_grid(store):
+    budgets = engine.compute(store, np.arange(len(store))[:, None], np.array(BUDGETS, dtype=np.float64)[None, :])
+    e0 = np.round(budgets.emissions_2019, 2)
+    s, a = pathways.logistic_parameters(e0, budgets.remaining_2020)
+    assert s.shape == a.shape == e0.shape
+    solved = np.isfinite(a)
+    assert solved.any()
+    t = np.arange(1, pathways.MAX_YEARS + 1, dtype=np.float64)
+    with np.errstate(over='ignore'):
+        emissions = e0[solved][:, None] * (1 + np.exp(-a[solved]))[:, None] / (
+            1 + np.exp(s[solved][:, None] * t - a[solved][:, None]))
+    np.testing.assert_allclose(emissions.sum(axis=1), budgets.remaining_2020[solved], rtol=pathways.SOLVER_TOLERANCE * 2)
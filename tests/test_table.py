@@ -0,0 +1,22 @@
+# Precomputed budget table (budgets/table.py).
+
+import pytest
+
+from budgets import nowcast
+from budgets.table import BudgetTable, write_table
+
+
+def test_table_records_the_nowcast_half_life(store, tmp_path):
+    linear = nowcast.apply(store, 'linear', 5)
+    path = str(tmp_path / 'budget_table')
+    write_table(path, linear, 570, 590, half_life=5)
+    assert BudgetTable.load(path, linear, half_life=5).lookup(linear.row('Belgium'), 580) is not None
+    for other, half_life in ((linear, 10), (store, 5)):
+        with pytest.raises(ValueError):
+            BudgetTable.load(path, other, half_life=half_life)
+
+
+def test_constant_table_ignores_the_half_life(store, tmp_path):
+    path = str(tmp_path / 'budget_table')
+    write_table(path, store, 570, 590, half_life=5)
+    BudgetTable.load(path, store, half_life=10)